@@ -7,3 +7,7 @@ class ApiConfig(AppConfig):
 
     name = 'api'
     verbose_name = 'API'
+
+    def ready(self):
+        """Connect signal receivers."""
+        from . import signals  # noqa: F401
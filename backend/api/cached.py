@@ -0,0 +1,118 @@
+"""Cached.py."""
+import math
+import random
+import time
+from functools import partial
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+from django.http import Http404
+
+MISSING = '__missing__'
+WAIT_STEP = 0.05
+
+
+def _cache(alias):
+    """Return the Django cache backend of the alias."""
+    return caches[alias]
+
+
+def _lock_key(key):
+    """Return the key of the recomputation lock of a key."""
+    return f'{key}:lock'
+
+
+def _acquire(cache, key):
+    """Try to become the only caller recomputing the key."""
+    return cache.add(_lock_key(key), 1, settings.CACHE_LOCK_TIMEOUT)
+
+
+def _release(cache, key):
+    """Let other callers recompute the key again."""
+    cache.delete(_lock_key(key))
+
+
+def _store(cache, key, compute, ttl, version):
+    """Compute a value and store it with its cost and expiry."""
+    started = time.monotonic()
+    value = compute()
+    delta = time.monotonic() - started
+    cache.set(key, (value, delta, time.time() + ttl, version),
+              ttl + settings.CACHE_STALE_TTL)
+    return value
+
+
+def _expired(entry, version):
+    """Tell whether an entry should be recomputed now.
+
+    Entries are refreshed a little before they expire, the earlier the
+    longer they took to compute, so one caller usually recomputes a hot
+    key while the others still read it.
+    """
+    value, delta, expires, stored_version = entry
+    if stored_version != version:
+        return True
+    early = -delta * settings.CACHE_EARLY_BETA * math.log(
+        1 - random.random())
+    return time.time() + early >= expires
+
+
+def fetch(key, compute, ttl, version=None, alias='default'):
+    """Return the cached result of compute() protected from stampedes.
+
+    Only the caller holding the key's lock recomputes it; the others get
+    the stale value meanwhile, or wait for the first value of a cold key.
+    An entry stored for another version counts as expired.
+    """
+    cache = _cache(alias)
+    entry = cache.get(key)
+    if entry is not None:
+        if not _expired(entry, version) or not _acquire(cache, key):
+            return entry[0]
+        try:
+            return _store(cache, key, compute, ttl, version)
+        finally:
+            _release(cache, key)
+    deadline = time.monotonic() + settings.CACHE_LOCK_TIMEOUT
+    while not _acquire(cache, key):
+        if time.monotonic() > deadline:
+            return _store(cache, key, compute, ttl, version)
+        time.sleep(WAIT_STEP)
+        entry = cache.get(key)
+        if entry is not None and entry[3] == version:
+            return entry[0]
+    try:
+        return _store(cache, key, compute, ttl, version)
+    finally:
+        _release(cache, key)
+
+
+def missing_key(model, pk):
+    """Return the key marking a missing object."""
+    return f'missing:{model._meta.label_lower}:{pk}'
+
+
+def get_or_404(key, load, alias='default'):
+    """Return load() or raise Http404, remembering misses for a while."""
+    cache = _cache(alias)
+    if cache.get(key) == MISSING:
+        raise Http404
+    value = load()
+    if value is None:
+        cache.set(key, MISSING, settings.CACHE_NEGATIVE_TTL)
+        raise Http404
+    return value
+
+
+def get_object_or_404(queryset, pk, alias='default'):
+    """Return the object with the primary key, caching misses."""
+    return get_or_404(
+        missing_key(queryset.model, pk),
+        lambda: queryset.filter(pk=pk).first(), alias)
+
+
+def forget_missing(model, pk, alias='default'):
+    """Drop the miss of an object once its creation commits."""
+    transaction.on_commit(
+        partial(_cache(alias).delete, missing_key(model, pk)))
@@ -0,0 +1,246 @@
+"""Compiled.py."""
+from collections import defaultdict
+from operator import itemgetter
+
+from django.conf import settings
+from django.db.models import Count, OuterRef, Subquery
+from recipes.models import Cart, Favorite, IngredientInRecipe, Recipe
+from rest_framework.exceptions import ValidationError
+from users import caches
+
+from . import writebehind
+from .serializers import (CustomUserSerializer, RecipeReadSerializer,
+                          RecipeShortenedSerializer,
+                          RevealIngredientsInRecipeSerializer,
+                          SubscribeSerializer, TagsSerializer)
+
+AUTHOR_COLUMNS = (
+    'author_id', 'author__email', 'author__username', 'author__first_name',
+    'author__last_name',
+)
+
+RECIPE_COLUMNS = ('id', 'name', 'image', 'text', 'cooking_time',
+                  *AUTHOR_COLUMNS)
+
+FIELD_COLUMNS = {
+    'id': ('id',),
+    'author': AUTHOR_COLUMNS,
+    'tags': (),
+    'ingredients': (),
+    'is_favorited': (),
+    'is_in_shopping_cart': (),
+    'name': ('name',),
+    'image': ('image',),
+    'text': ('text',),
+    'cooking_time': ('cooking_time',),
+}
+
+COMPACT_FIELDS = ('id', 'tags', 'name', 'image', 'cooking_time')
+
+TRUE_VALUES = ('1', 'true', 'yes')
+
+MIRRORED = {
+    CustomUserSerializer: (
+        'email', 'id', 'username', 'first_name', 'last_name',
+        'is_subscribed'),
+    TagsSerializer: ('id', 'name', 'color', 'slug'),
+    RevealIngredientsInRecipeSerializer: (
+        'id', 'name', 'measurement_unit', 'amount'),
+    RecipeReadSerializer: (
+        'id', 'author', 'tags', 'ingredients', 'is_favorited',
+        'is_in_shopping_cart', 'name', 'image', 'text', 'cooking_time'),
+    RecipeShortenedSerializer: ('id', 'name', 'image', 'cooking_time'),
+    SubscribeSerializer: (
+        'email', 'id', 'username', 'first_name', 'last_name',
+        'is_subscribed', 'recipes', 'recipes_count', 'author'),
+}
+
+NESTED = {
+    RecipeReadSerializer: (
+        CustomUserSerializer, TagsSerializer,
+        RevealIngredientsInRecipeSerializer),
+    SubscribeSerializer: (RecipeShortenedSerializer,),
+}
+
+RECIPE_FIELDS = MIRRORED[RecipeReadSerializer]
+
+_image_storage = Recipe._meta.get_field('image').storage
+
+
+def enabled(serializer_class):
+    """Tell whether the fast path still mirrors the serializer's fields."""
+    return settings.FAST_SERIALIZERS and all(
+        tuple(checked.Meta.fields) == MIRRORED[checked]
+        for checked in (serializer_class, *NESTED.get(serializer_class, ()))
+    )
+
+
+def image_url(request, name):
+    """Return the image URL the way ImageField renders it."""
+    if not name:
+        return None
+    return request.build_absolute_uri(_image_storage.url(name))
+
+
+def _names(value):
+    """Split a comma separated list of field names."""
+    if not value:
+        return set()
+    return {name.strip() for name in value.split(',') if name.strip()}
+
+
+def recipe_fields(request):
+    """Return the recipe fields the reader asked for, in document order."""
+    params = request.query_params
+    known = RECIPE_FIELDS
+    requested = _names(params.get('fields'))
+    omitted = _names(params.get('omit'))
+    unknown = (requested | omitted) - set(known)
+    if unknown:
+        raise ValidationError({'fields': 'Unknown fields: {}'.format(
+            ', '.join(sorted(unknown)))})
+    if requested:
+        wanted = requested
+    elif params.get('compact', '').lower() in TRUE_VALUES:
+        wanted = set(COMPACT_FIELDS)
+    else:
+        wanted = set(known)
+    wanted = (wanted - omitted) | {'id'}
+    return tuple(field for field in known if field in wanted)
+
+
+def columns(fields):
+    """Return the recipe columns the fields are rendered from."""
+    return tuple(dict.fromkeys(
+        column for field in fields for column in FIELD_COLUMNS[field]))
+
+
+def _user_ids(request, model, field, ids):
+    """Return which of the ids the reader has linked through the model."""
+    user = request.user
+    if not user.is_authenticated or not ids:
+        return set()
+    pending = writebehind.changes(model, user)
+    return writebehind.overlay(set(model.objects.filter(
+        user=user, **{f'{field}__in': ids},
+    ).values_list(field, flat=True)), pending)
+
+
+def _tags(recipe_ids):
+    """Return the tags of every recipe ordered by name."""
+    tags = defaultdict(list)
+    rows = Recipe.tags.through.objects.filter(
+        recipe_id__in=recipe_ids,
+    ).order_by('tag__name').values_list(
+        'recipe_id', 'tag_id', 'tag__name', 'tag__color', 'tag__slug')
+    for recipe_id, tag_id, name, color, slug in rows:
+        tags[recipe_id].append(
+            {'id': tag_id, 'name': name, 'color': color, 'slug': slug})
+    return tags
+
+
+def _ingredients(recipe_ids):
+    """Return the ingredient rows of every recipe."""
+    ingredients = defaultdict(list)
+    rows = IngredientInRecipe.objects.filter(
+        recipe_id__in=recipe_ids,
+    ).order_by('id').values_list(
+        'recipe_id', 'id', 'ingredient__name',
+        'ingredient__measurement_unit', 'amount')
+    for recipe_id, row_id, name, measurement_unit, amount in rows:
+        ingredients[recipe_id].append({
+            'id': row_id,
+            'name': name,
+            'measurement_unit': measurement_unit,
+            'amount': amount,
+        })
+    return ingredients
+
+
+def recipes(rows, request, fields=RECIPE_FIELDS):
+    """Render rows exactly like RecipeReadSerializer, limited to fields."""
+    recipe_ids = [row['id'] for row in rows]
+    render = {
+        'id': itemgetter('id'),
+        'name': itemgetter('name'),
+        'text': itemgetter('text'),
+        'cooking_time': itemgetter('cooking_time'),
+        'image': lambda row: image_url(request, row['image']),
+    }
+    if 'author' in fields:
+        followed = set()
+        if request.user.is_authenticated:
+            followed = caches.following(request.user.id)
+        render['author'] = lambda row: {
+            'email': row['author__email'],
+            'id': row['author_id'],
+            'username': row['author__username'],
+            'first_name': row['author__first_name'],
+            'last_name': row['author__last_name'],
+            'is_subscribed': row['author_id'] in followed,
+        }
+    if 'tags' in fields:
+        tags = _tags(recipe_ids)
+        render['tags'] = lambda row: tags[row['id']]
+    if 'ingredients' in fields:
+        ingredients = _ingredients(recipe_ids)
+        render['ingredients'] = lambda row: ingredients[row['id']]
+    if 'is_favorited' in fields:
+        favorited = _user_ids(request, Favorite, 'recipe_id', recipe_ids)
+        render['is_favorited'] = lambda row: row['id'] in favorited
+    if 'is_in_shopping_cart' in fields:
+        in_cart = _user_ids(request, Cart, 'recipe_id', recipe_ids)
+        render['is_in_shopping_cart'] = lambda row: row['id'] in in_cart
+    renderers = [(field, render[field]) for field in fields]
+    return [
+        {field: renderer(row) for field, renderer in renderers}
+        for row in rows
+    ]
+
+
+def recipes_limit(request):
+    """Return the recipes_limit parameter, or False if it is unusable."""
+    limit = request.GET.get('recipes_limit')
+    if not limit:
+        return None
+    if not limit.isdigit():
+        return False
+    return int(limit)
+
+
+def subscriptions(authors, request, limit=None):
+    """Render users exactly like SubscribeSerializer."""
+    author_ids = [author.id for author in authors]
+    recipes = Recipe.objects.filter(author_id__in=author_ids)
+    if limit is not None:
+        recipes = recipes.filter(id__in=Subquery(
+            Recipe.objects.filter(
+                author_id=OuterRef('author_id')).values('id')[:limit]))
+    shortened = defaultdict(list)
+    for row in recipes.values('id', 'name', 'image', 'cooking_time',
+                              'author_id'):
+        shortened[row['author_id']].append({
+            'id': row['id'],
+            'name': row['name'],
+            'image': image_url(request, row['image']),
+            'cooking_time': row['cooking_time'],
+        })
+    counts = dict(Recipe.objects.filter(
+        author_id__in=author_ids,
+    ).order_by().values('author_id').annotate(
+        total=Count('id')).values_list('author_id', 'total'))
+    # SubscribeSerializer reads is_subscribed from an 'author' attribute
+    # and skips the 'author' field; users have neither.
+    return [
+        {
+            'email': author.email,
+            'id': author.id,
+            'username': author.username,
+            'first_name': author.first_name,
+            'last_name': author.last_name,
+            'is_subscribed': False,
+            'recipes': shortened[author.id],
+            'recipes_count': counts.get(author.id, 0),
+        }
+        for author in authors
+    ]
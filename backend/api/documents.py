@@ -0,0 +1,108 @@
+"""Documents.py."""
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from recipes.models import Cart, Favorite, Recipe, RecipeDocument
+from users.models import Follow
+
+from . import cached, writebehind
+from .serializers import (CustomUserSerializer, RecipeDocumentSerializer,
+                          RecipeReadSerializer,
+                          RevealIngredientsInRecipeSerializer, TagsSerializer)
+
+User = get_user_model()
+
+BATCH_SIZE = 500
+
+
+@transaction.atomic
+def rebuild(recipe_ids):
+    """Store fresh documents of the recipes and return their data."""
+    recipes = Recipe.objects.filter(id__in=recipe_ids).select_related(
+        'author').prefetch_related('tags')
+    documents = {
+        recipe.id: RecipeDocumentSerializer(recipe).data
+        for recipe in recipes
+    }
+    RecipeDocument.objects.filter(recipe_id__in=recipe_ids).delete()
+    RecipeDocument.objects.bulk_create(
+        [RecipeDocument(recipe_id=recipe_id, data=data)
+         for recipe_id, data in documents.items()],
+        ignore_conflicts=True,
+    )
+    return documents
+
+
+def invalidate(recipes):
+    """Drop the documents of the recipes, given as ids or a queryset."""
+    RecipeDocument.objects.filter(recipe__in=recipes).delete()
+
+
+def rebuild_missing():
+    """Build documents for every recipe that has none, in batches."""
+    while True:
+        recipe_ids = list(Recipe.objects.filter(
+            document__isnull=True).values_list('id', flat=True)[:BATCH_SIZE])
+        if not recipe_ids:
+            return
+        rebuild(recipe_ids)
+
+
+def _flags(user, recipe_id, author_id):
+    """Look up the reader dependent fields in a single query."""
+    if not user.is_authenticated:
+        return {
+            'is_favorited': False,
+            'is_in_shopping_cart': False,
+            'is_subscribed': False,
+        }
+    favorites = writebehind.changes(Favorite, user)
+    cart = writebehind.changes(Cart, user)
+    flags = User.objects.filter(pk=user.pk).values(
+        is_favorited=Exists(Favorite.objects.filter(
+            user=OuterRef('pk'), recipe_id=recipe_id)),
+        is_in_shopping_cart=Exists(Cart.objects.filter(
+            user=OuterRef('pk'), recipe_id=recipe_id)),
+        is_subscribed=Exists(Follow.objects.filter(
+            user=OuterRef('pk'), author_id=author_id)),
+    ).get()
+    flags['is_favorited'] = favorites.get(recipe_id, flags['is_favorited'])
+    flags['is_in_shopping_cart'] = cart.get(
+        recipe_id, flags['is_in_shopping_cart'])
+    return flags
+
+
+def _pick(data, serializer_class):
+    """Restore the serializer key order lost by the JSON column."""
+    return {field: data[field] for field in serializer_class.Meta.fields}
+
+
+def _data(recipe_id):
+    """Return the stored document, building it if needed."""
+    data = RecipeDocument.objects.filter(
+        recipe_id=recipe_id).values_list('data', flat=True).first()
+    if data is None:
+        return rebuild([recipe_id]).get(recipe_id)
+    return data
+
+
+def read(request, recipe_id):
+    """Return the RecipeReadSerializer output for the reader."""
+    data = cached.get_or_404(
+        cached.missing_key(Recipe, recipe_id), partial(_data, recipe_id))
+    flags = _flags(request.user, recipe_id, data['author']['id'])
+    document = {}
+    for field in RecipeReadSerializer.Meta.fields:
+        document[field] = flags[field] if field in flags else data[field]
+    document['author'] = _pick(data['author'], CustomUserSerializer)
+    document['author']['is_subscribed'] = flags['is_subscribed']
+    document['tags'] = [_pick(tag, TagsSerializer) for tag in data['tags']]
+    document['ingredients'] = [
+        _pick(ingredient, RevealIngredientsInRecipeSerializer)
+        for ingredient in data['ingredients']
+    ]
+    if document['image']:
+        document['image'] = request.build_absolute_uri(document['image'])
+    return document
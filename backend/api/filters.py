@@ -1,7 +1,12 @@
 """Filters.py."""
 from django.contrib.auth import get_user_model
+from django.db.models import Case, When
+from django.utils.translation import gettext_lazy as _
 from django_filters.rest_framework import BooleanFilter, FilterSet, filters
 from recipes.models import Ingredients, Recipe, Tag
+from recipes.scores import ORDERINGS
+
+from . import search
 
 User = get_user_model()
 
@@ -17,6 +22,10 @@ class RecipeFilter(FilterSet):
     is_favorited = BooleanFilter(method='filter_is_favorited')
     is_in_shopping_cart = BooleanFilter(
         method='filter_is_in_shopping_cart')
+    ordering = filters.ChoiceFilter(
+        choices=(('popular', _('Popular')), ('trending', _('Trending'))),
+        method='filter_ordering',
+    )
 
     class Meta:
         """Defines the model to be filtered."""
@@ -38,11 +47,18 @@ class RecipeFilter(FilterSet):
             return queryset.filter(shopping_cart__user=user)
         return queryset
 
+    def filter_ordering(self, queryset, name, value):
+        """Order by a precomputed score, newest first among equals."""
+        field = ORDERINGS[value]
+        return queryset.filter(**{f'{field}__isnull': False}).order_by(
+            f'-{field}', '-id')
+
 
 class IngredientFilter(FilterSet):
     """Defines a filter that filters instances of the Ingredients model."""
 
     name = filters.CharFilter(field_name='name', lookup_expr='istartswith')
+    search = filters.CharFilter(method='filter_search')
     ordering = filters.OrderingFilter(fields=('name',))
 
     class Meta:
@@ -50,3 +66,10 @@ class IngredientFilter(FilterSet):
 
         model = Ingredients
         fields = ['name']
+
+    def filter_search(self, queryset, name, value):
+        """Find names despite typos, wrong layout or transliteration."""
+        ids = search.search(value)
+        return queryset.filter(id__in=ids).order_by(Case(
+            *[When(id=ingredient_id, then=position)
+              for position, ingredient_id in enumerate(ids)]))
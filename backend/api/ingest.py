@@ -0,0 +1,148 @@
+"""Ingest.py."""
+from contextlib import ExitStack
+
+from django.db import DatabaseError, connection, transaction
+from django.utils.translation import gettext_lazy as _
+from jobs.queue import enqueue_many
+from recipes import outbox, versions
+from recipes.models import (ImageUpload, IngredientInRecipe, Ingredients,
+                            OutboxEvent, Recipe, RecipeScore, Tag)
+
+from . import cached, documents, uploads
+from .serializers import RecipeIngestSerializer
+
+BATCH_SIZE = 100
+
+
+def _missing(wanted, known):
+    """Return the referenced ids that do not exist, sorted."""
+    return sorted(set(wanted) - known)
+
+
+def _check_references(items, author):
+    """Check tags, ingredients and uploads of valid items with set lookups.
+
+    Returns the errors by item index and the uploads by token.
+    """
+    tag_ids = set(Tag.objects.filter(id__in={
+        tag for index, data in items for tag in data['tags']
+    }).values_list('id', flat=True))
+    ingredient_ids = set(Ingredients.objects.filter(id__in={
+        ingredient['id'] for index, data in items
+        for ingredient in data['ingredients']
+    }).values_list('id', flat=True))
+    image_uploads = ImageUpload.objects.filter(
+        user=author, complete=True, token__in={
+            data['image_upload'] for index, data in items
+            if 'image_upload' in data
+        }).in_bulk(field_name='token')
+    errors = {}
+    used = set()
+    for index, data in items:
+        item_errors = {}
+        missing = _missing(data['tags'], tag_ids)
+        if missing:
+            item_errors['tags'] = [_('Tags not found: {ids}').format(
+                ids=', '.join(map(str, missing)))]
+        missing = _missing(
+            [ingredient['id'] for ingredient in data['ingredients']],
+            ingredient_ids)
+        if missing:
+            item_errors['ingredients'] = [
+                _('Ingredients not found: {ids}').format(
+                    ids=', '.join(map(str, missing)))]
+        token = data.get('image_upload')
+        if token is not None:
+            if token not in image_uploads or token in used:
+                item_errors['image_upload'] = [_('Upload not found')]
+            used.add(token)
+        if item_errors:
+            errors[index] = item_errors
+    return errors, image_uploads
+
+
+def _insert_recipes(recipes):
+    """Insert recipes, with the bookkeeping their save signals would do."""
+    if not connection.features.can_return_rows_from_bulk_insert:
+        for recipe in recipes:
+            recipe.save()
+        return
+    for recipe, version in zip(recipes, versions.allocate(len(recipes))):
+        recipe.version = version
+    Recipe.objects.bulk_create(recipes)
+    RecipeScore.objects.bulk_create(
+        [RecipeScore(recipe=recipe) for recipe in recipes])
+    outbox.record_many(
+        [outbox.change(recipe, OutboxEvent.CREATED) for recipe in recipes])
+
+
+@transaction.atomic
+def _insert(batch, author, image_uploads):
+    """Insert one batch of checked items and return the new recipe ids."""
+    with ExitStack() as stack:
+        recipes = []
+        for data in batch:
+            image = data.get('image')
+            if 'image_upload' in data:
+                image = stack.enter_context(
+                    uploads.opened(image_uploads[data['image_upload']]))
+            recipes.append(Recipe(
+                author=author, name=data['name'], text=data['text'],
+                cooking_time=data['cooking_time'], image=image))
+        _insert_recipes(recipes)
+    recipe_ids = [recipe.id for recipe in recipes]
+    Recipe.tags.through.objects.bulk_create([
+        Recipe.tags.through(recipe_id=recipe.id, tag_id=tag_id)
+        for recipe, data in zip(recipes, batch) for tag_id in data['tags']
+    ])
+    IngredientInRecipe.objects.bulk_create([
+        IngredientInRecipe(
+            recipe_id=recipe.id, ingredient_id=ingredient['id'],
+            amount=ingredient['amount'])
+        for recipe, data in zip(recipes, batch)
+        for ingredient in data['ingredients']
+    ])
+    outbox.record_created(
+        Recipe.tags.through.objects.filter(recipe_id__in=recipe_ids))
+    outbox.record_created(
+        IngredientInRecipe.objects.filter(recipe_id__in=recipe_ids))
+    documents.rebuild(recipe_ids)
+    for recipe_id in recipe_ids:
+        cached.forget_missing(Recipe, recipe_id)
+    enqueue_many('recipes.optimize_image',
+                 [{'recipe_id': recipe_id} for recipe_id in recipe_ids])
+    return recipe_ids
+
+
+def ingest(items, author):
+    """Create recipes of the author in batches and report every item.
+
+    Each result holds the item index and either the new recipe id or
+    the validation errors of the item.
+    """
+    results = [None] * len(items)
+    valid = []
+    for index, item in enumerate(items):
+        serializer = RecipeIngestSerializer(data=item)
+        if serializer.is_valid():
+            valid.append((index, serializer.validated_data))
+        else:
+            results[index] = {'index': index, 'errors': serializer.errors}
+    errors, image_uploads = _check_references(valid, author)
+    for index, item_errors in errors.items():
+        results[index] = {'index': index, 'errors': item_errors}
+    accepted = [(index, data) for index, data in valid if index not in errors]
+    for start in range(0, len(accepted), BATCH_SIZE):
+        batch = accepted[start:start + BATCH_SIZE]
+        try:
+            recipe_ids = _insert(
+                [data for index, data in batch], author, image_uploads)
+        except DatabaseError as error:
+            for index, data in batch:
+                results[index] = {
+                    'index': index, 'errors': {'non_field_errors': [
+                        str(error)]}}
+            continue
+        for (index, data), recipe_id in zip(batch, recipe_ids):
+            results[index] = {'index': index, 'id': recipe_id}
+    return results
@@ -0,0 +1,60 @@
+"""Links.py."""
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Exists, OuterRef
+from recipes import outbox, shopping, versions
+from recipes.models import Cart, Recipe
+
+User = get_user_model()
+
+ADDED = 'added'
+EXISTS = 'exists'
+REMOVED = 'removed'
+ABSENT = 'absent'
+NOT_FOUND = 'not_found'
+
+
+def lock_links(user):
+    """Serialize link changes of one user.
+
+    Statuses and outbox events are then taken from reads no concurrent
+    toggle can invalidate, and the cart summary stays exact.
+    """
+    User.objects.select_for_update().get(pk=user.pk)
+
+
+@transaction.atomic
+def link_recipes(model, user, recipe_ids):
+    """Link recipes to the user with a single insert statement."""
+    lock_links(user)
+    recipes = Recipe.objects.filter(id__in=recipe_ids).annotate(
+        linked=Exists(model.objects.filter(user=user, recipe=OuterRef('pk')))
+    ).in_bulk()
+    added = [recipe.id for recipe in recipes.values() if not recipe.linked]
+    model.objects.bulk_create(
+        [model(user=user, recipe_id=recipe_id, version=version)
+         for recipe_id, version in zip(added, versions.allocate(len(added)))],
+        ignore_conflicts=True,
+    )
+    outbox.record_created(
+        model.objects.filter(user=user, recipe_id__in=added))
+    if model is Cart:
+        shopping.add_recipes(user.id, added)
+    statuses = {
+        recipe_id: NOT_FOUND if recipe_id not in recipes
+        else EXISTS if recipes[recipe_id].linked else ADDED
+        for recipe_id in recipe_ids
+    }
+    return recipes, statuses
+
+
+@transaction.atomic
+def unlink_recipes(model, user, recipe_ids):
+    """Unlink recipes from the user, deleting exactly the rows locked."""
+    lock_links(user)
+    links = dict(model.objects.select_for_update().filter(
+        user=user, recipe_id__in=recipe_ids).values_list('recipe_id', 'pk'))
+    if links:
+        model.objects.filter(pk__in=list(links.values())).delete()
+    return {recipe_id: REMOVED if recipe_id in links else ABSENT
+            for recipe_id in recipe_ids}
@@ -0,0 +1,170 @@
+"""Localcache.py."""
+import logging
+import os
+import select
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from django.db import connection, connections, transaction
+
+logger = logging.getLogger(__name__)
+
+CLEAR = '*'
+HEARTBEAT = 30
+RECONNECT_DELAY = 5
+
+_caches = {}
+_handlers = {}
+_listener_lock = threading.Lock()
+_listener_pid = None
+
+
+class LocalCache:
+    """Bounded LRU cache of one worker kept coherent across workers.
+
+    Writers call invalidate(), which drops the key here and, on Postgres,
+    sends NOTIFY on the cache channel when the transaction commits; every
+    worker listens on the channels of all caches and drops the key too.
+    """
+
+    def __init__(self, name):
+        """Create the cache sized by LOCAL_CACHES[name]."""
+        options = settings.LOCAL_CACHES[name]
+        self.name = name
+        self.channel = f'cache_{name}'
+        self.max_size = options['MAX_SIZE']
+        self.ttl = options['TTL']
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._generation = 0
+        _caches[self.channel] = self
+
+    def get(self, key, default=None):
+        """Return a fresh cached value or the default."""
+        _start_listener()
+        key = str(key)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return default
+            value, expires = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                return default
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, generation=None):
+        """Store a value unless the cache was invalidated since generation."""
+        key = str(key)
+        with self._lock:
+            if generation is not None and generation != self._generation:
+                return
+            self._entries[key] = (value, time.monotonic() + self.ttl)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def get_or_set(self, key, load):
+        """Return the cached value, loading and storing it on a miss.
+
+        A value loaded while an invalidation arrived is returned but not
+        stored, since it may predate the write.
+        """
+        missing = object()
+        value = self.get(key, missing)
+        if value is not missing:
+            return value
+        generation = self._generation
+        value = load()
+        if value is not None:
+            self.set(key, value, generation)
+        return value
+
+    def discard(self, key=CLEAR):
+        """Drop a key, or every key, from this worker."""
+        with self._lock:
+            self._generation += 1
+            if key == CLEAR:
+                self._entries.clear()
+            else:
+                self._entries.pop(str(key), None)
+
+    def invalidate(self, key=CLEAR):
+        """Drop a key, or every key, in all workers once the write commits."""
+        key = str(key)
+        self.discard(key)
+        transaction.on_commit(lambda: self.discard(key))
+        if connection.vendor == 'postgresql':
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT pg_notify(%s, %s)', [self.channel, key])
+
+
+def subscribe(channel, handler):
+    """Call the handler with the payload of every notification on channel."""
+    _handlers[channel] = handler
+    _start_listener()
+
+
+def clear_all():
+    """Drop every entry of every cache of this worker."""
+    for cache in _caches.values():
+        cache.discard()
+
+
+def _start_listener():
+    """Start the invalidation listener once in every worker process."""
+    global _listener_pid
+    if _listener_pid == os.getpid():
+        return
+    with _listener_lock:
+        if _listener_pid == os.getpid():
+            return
+        _listener_pid = os.getpid()
+        if connections['default'].vendor != 'postgresql':
+            return
+        threading.Thread(
+            target=_listen_forever, name='localcache-listener',
+            daemon=True).start()
+
+
+def _listen_forever():
+    """Keep a LISTEN connection open, reconnecting after failures."""
+    while True:
+        try:
+            _listen()
+        except Exception:
+            logger.exception('Cache invalidation listener failed')
+        time.sleep(RECONNECT_DELAY)
+
+
+def _listen():
+    """Apply notifications of all cache channels as they arrive."""
+    wrapper = connections['default']
+    raw = wrapper.get_new_connection(wrapper.get_connection_params())
+    try:
+        raw.autocommit = True
+        listening = set()
+        # Writes made while no connection was listening are unknown.
+        clear_all()
+        while True:
+            with raw.cursor() as cursor:
+                for channel in (set(_caches) | set(_handlers)) - listening:
+                    cursor.execute(f'LISTEN {channel}')
+                    listening.add(channel)
+            if select.select([raw], [], [], HEARTBEAT) == ([], [], []):
+                with raw.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+                continue
+            raw.poll()
+            while raw.notifies:
+                notify = raw.notifies.pop(0)
+                cache = _caches.get(notify.channel)
+                if cache is not None:
+                    cache.discard(notify.payload)
+                elif notify.channel in _handlers:
+                    _handlers[notify.channel](notify.payload)
+    finally:
+        raw.close()
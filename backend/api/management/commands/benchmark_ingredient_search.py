@@ -0,0 +1,82 @@
+"""Benchmark_ingredient_search.py."""
+import random
+import time
+
+from api import search
+from django.core.management import BaseCommand, CommandError
+from django.db import connection
+from recipes.models import Ingredients
+
+TO_LATIN_LAYOUT = str.maketrans(search.CYRILLIC, search.LATIN)
+TO_TRANSLIT = {}
+for latin, cyrillic in search.TRANSLITERATION:
+    TO_TRANSLIT.setdefault(cyrillic, latin)
+
+
+class Command(BaseCommand):
+    """Measure fuzzy ingredient search latency and recall on the catalog."""
+
+    help = 'Ingredient search benchmark'
+
+    def add_arguments(self, parser):
+        """Add command arguments."""
+        parser.add_argument('--queries', type=int, default=500)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def typo(self, word, rng):
+        """Drop or swap a letter in the middle of the word."""
+        position = rng.randrange(1, len(word) - 1)
+        if rng.random() < 0.5:
+            return word[:position] + word[position + 1:]
+        return (word[:position - 1] + word[position] + word[position - 1]
+                + word[position + 1:])
+
+    def queries(self, names, count, rng):
+        """Build (kind, query, expected name) samples from the catalog."""
+        samples = []
+        words = [(name, search.normalize(name).split()[0]) for name in names]
+        words = [(name, word) for name, word in words if len(word) >= 5]
+        for name, word in rng.sample(words, min(count, len(words))):
+            samples.extend((
+                ('prefix', word[:rng.randint(3, len(word))], name),
+                ('typo', self.typo(word, rng), name),
+                ('layout', word.translate(TO_LATIN_LAYOUT), name),
+                ('translit', ''.join(
+                    TO_TRANSLIT.get(char, char) for char in word), name),
+            ))
+        return samples
+
+    def run(self, label, find, samples, names):
+        """Time every query and report percentiles and recall by kind."""
+        timings = []
+        recall = {}
+        for kind, query, name in samples:
+            started = time.perf_counter()
+            ids = find(query)
+            timings.append(time.perf_counter() - started)
+            top = {names[ingredient_id] for ingredient_id in ids[:10]}
+            hits, total = recall.get(kind, (0, 0))
+            recall[kind] = (hits + (name in top), total + 1)
+        timings.sort()
+        p50 = timings[len(timings) // 2] * 1000
+        p95 = timings[int(len(timings) * 0.95)] * 1000
+        self.stdout.write(
+            f'{label}: {len(timings)} queries, '
+            f'p50 {p50:.2f} ms, p95 {p95:.2f} ms')
+        for kind, (hits, total) in recall.items():
+            self.stdout.write(f'  {kind}: {hits / total:.0%} found in top 10')
+
+    def handle(self, *args, **options):
+        """Run the sample queries against every available backend."""
+        names = dict(Ingredients.objects.values_list('id', 'name'))
+        if not names:
+            raise CommandError('The ingredient catalog is empty, import it')
+        rng = random.Random(options['seed'])
+        samples = self.queries(list(names.values()), options['queries'], rng)
+        index = search.memory_index()
+        self.run(
+            'memory',
+            lambda query: index.search(search.variants(query), 50),
+            samples, names)
+        if connection.vendor == 'postgresql':
+            self.run('postgres', search.search, samples, names)
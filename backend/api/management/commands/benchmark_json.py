@@ -0,0 +1,87 @@
+"""Benchmark_json.py."""
+import base64
+import io
+import json
+import timeit
+
+from api.parsers import FastJSONParser
+from api.renderers import FastJSONRenderer
+from api.serializers import RecipeReadSerializer
+from django.contrib.auth.models import AnonymousUser
+from django.core.management import BaseCommand, CommandError
+from django.test import RequestFactory
+from recipes.models import Recipe
+from rest_framework.parsers import JSONParser
+from rest_framework.renderers import JSONRenderer
+
+
+class Command(BaseCommand):
+    """Compare the stock and the orjson based JSON layer on real recipes."""
+
+    help = 'JSON rendering and parsing benchmark'
+
+    def add_arguments(self, parser):
+        """Add command arguments."""
+        parser.add_argument('--recipes', type=int, default=50)
+        parser.add_argument('--rounds', type=int, default=200)
+
+    def report(self, name, stock, fast, rounds):
+        """Print per-call timings of both implementations."""
+        self.stdout.write(
+            f'{name}: stock {stock / rounds * 1000:.3f} ms, '
+            f'fast {fast / rounds * 1000:.3f} ms, '
+            f'x{stock / fast:.1f}'
+        )
+
+    def handle(self, *args, **options):
+        """Render a recipe page and parse a recipe upload many times."""
+        rounds = options['rounds']
+        recipes = list(Recipe.objects.all()[:options['recipes']])
+        if not recipes:
+            raise CommandError('No recipes to benchmark, create some first')
+        request = RequestFactory().get('/api/recipes/')
+        request.user = AnonymousUser()
+        page = {
+            'count': len(recipes),
+            'next': None,
+            'previous': None,
+            'results': RecipeReadSerializer(
+                recipes, many=True, context={'request': request}).data,
+        }
+        stock, fast = JSONRenderer(), FastJSONRenderer()
+        body = stock.render(page, 'application/json')
+        if fast.render(page, 'application/json') != body:
+            raise CommandError('Renderers produce different output')
+        self.report(
+            f'render {len(recipes)} recipes ({len(body)} bytes)',
+            timeit.timeit(lambda: stock.render(page), number=rounds),
+            timeit.timeit(lambda: fast.render(page), number=rounds),
+            rounds,
+        )
+
+        recipe = recipes[0]
+        with recipe.image.open('rb') as image:
+            encoded = base64.b64encode(image.read()).decode()
+        upload = json.dumps({
+            'name': recipe.name,
+            'text': recipe.text,
+            'cooking_time': recipe.cooking_time,
+            'tags': [tag.id for tag in recipe.tags.all()],
+            'ingredients': [
+                {'id': item.ingredient_id, 'amount': item.amount}
+                for item in recipe.ingredients_in_recipe.all()
+            ],
+            'image': f'data:image/png;base64,{encoded}',
+        }, ensure_ascii=False).encode()
+        stock, fast = JSONParser(), FastJSONParser()
+        if (fast.parse(io.BytesIO(upload))
+                != stock.parse(io.BytesIO(upload))):
+            raise CommandError('Parsers produce different output')
+        self.report(
+            f'parse recipe upload ({len(upload)} bytes)',
+            timeit.timeit(lambda: stock.parse(io.BytesIO(upload)),
+                          number=rounds),
+            timeit.timeit(lambda: fast.parse(io.BytesIO(upload)),
+                          number=rounds),
+            rounds,
+        )
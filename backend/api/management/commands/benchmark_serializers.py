@@ -0,0 +1,75 @@
+"""Benchmark_serializers.py."""
+import time
+
+from api import compiled
+from api.renderers import FastJSONRenderer
+from api.serializers import RecipeReadSerializer, SubscribeSerializer
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from django.test import RequestFactory
+from recipes.models import Recipe
+from rest_framework.request import Request
+
+User = get_user_model()
+
+
+class Command(BaseCommand):
+    """Compare the compiled read path with the DRF serializers."""
+
+    help = 'Read serializers benchmark'
+
+    def add_arguments(self, parser):
+        """Add command arguments."""
+        parser.add_argument('--limit', type=int, default=50)
+        parser.add_argument('--rounds', type=int, default=20)
+        parser.add_argument('--user', help='Username to read as')
+
+    def measure(self, name, stock, fast, rounds):
+        """Check both paths render the same bytes and time them."""
+        renderer = FastJSONRenderer()
+        expected, actual = renderer.render(stock()), renderer.render(fast())
+        if expected != actual:
+            raise CommandError(f'{name}: outputs differ')
+        timings = []
+        for build in (stock, fast):
+            started = time.process_time()
+            for _ in range(rounds):
+                renderer.render(build())
+            timings.append((time.process_time() - started) / rounds)
+        self.stdout.write(
+            f'{name} ({len(expected)} bytes): '
+            f'serializers {timings[0] * 1000:.2f} ms, '
+            f'compiled {timings[1] * 1000:.2f} ms CPU, '
+            f'x{timings[0] / timings[1]:.1f}')
+
+    def handle(self, *args, **options):
+        """Render a recipe page and a subscriptions page both ways."""
+        user = User.objects.filter(
+            username=options['user']).first() if options['user'] else (
+            User.objects.filter(follower__isnull=False).first())
+        if user is None:
+            raise CommandError('No user to read as')
+        request = Request(RequestFactory().get(
+            '/api/users/subscriptions/', {'recipes_limit': 3}))
+        request.user = user
+        context = {'request': request}
+        limit = options['limit']
+        queryset = Recipe.objects.all()
+        self.measure(
+            f'recipes x{limit}',
+            lambda: RecipeReadSerializer(
+                queryset[:limit], many=True, context=context).data,
+            lambda: compiled.recipes(
+                list(queryset.values(*compiled.RECIPE_COLUMNS)[:limit]),
+                request),
+            options['rounds'],
+        )
+        authors = User.objects.filter(
+            following__user=user).order_by('id')[:limit]
+        self.measure(
+            'subscriptions',
+            lambda: SubscribeSerializer(
+                authors, many=True, context=context).data,
+            lambda: compiled.subscriptions(list(authors), request, 3),
+            options['rounds'],
+        )
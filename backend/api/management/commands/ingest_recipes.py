@@ -0,0 +1,63 @@
+"""Ingest_recipes.py."""
+import os
+from itertools import islice
+
+import orjson
+from api import ingest
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+
+User = get_user_model()
+
+
+def read_items(path):
+    """Yield recipes of a JSON array or of a file with one per line."""
+    with open(path, 'rb') as f:
+        head = f.read(64).lstrip()
+        f.seek(0)
+        if head.startswith(b'['):
+            yield from orjson.loads(f.read())
+            return
+        for line in f:
+            if line.strip():
+                yield orjson.loads(line)
+
+
+class Command(BaseCommand):
+    """Load recipes of one author from a JSON or NDJSON file."""
+
+    help = 'Bulk load recipes'
+
+    def add_arguments(self, parser):
+        """Add command arguments."""
+        parser.add_argument('path', help='JSON array or NDJSON file')
+        parser.add_argument(
+            '--author', required=True, help='Username of the author')
+        parser.add_argument(
+            '--chunk', type=int, default=1000,
+            help='Recipes validated and reported at a time')
+
+    def handle(self, *args, **options):
+        """Ingest the file chunk by chunk and report failed items."""
+        author = User.objects.filter(username=options['author']).first()
+        if author is None:
+            raise CommandError(f'No user {options["author"]}')
+        if not os.path.isfile(options['path']):
+            raise CommandError(f'No file {options["path"]}')
+        items = read_items(options['path'])
+        offset = created = failed = 0
+        while True:
+            chunk = list(islice(items, options['chunk']))
+            if not chunk:
+                break
+            for result in ingest.ingest(chunk, author):
+                if 'id' in result:
+                    created += 1
+                    continue
+                failed += 1
+                self.stderr.write(
+                    f'item {offset + result["index"]}: '
+                    f'{orjson.dumps(result["errors"]).decode()}')
+            offset += len(chunk)
+        self.stdout.write(self.style.SUCCESS(
+            f'{created} recipes created, {failed} failed'))
@@ -0,0 +1,99 @@
+"""Profile_startup.py."""
+import json
+import os
+import subprocess
+import sys
+from collections import defaultdict
+
+from django.conf import settings
+from django.core.management import BaseCommand, CommandError
+
+PROBE = '''
+import json, sys, time
+started = time.perf_counter()
+import django
+django.setup()
+from django.core.wsgi import get_wsgi_application
+from api import warmup
+application = get_wsgi_application()
+ready = time.perf_counter()
+if sys.argv[2] == 'warm':
+    warmup.warm_up(application)
+warm = time.perf_counter()
+response = application.get_response(warmup._request(sys.argv[1]))
+done = time.perf_counter()
+second = time.perf_counter()
+application.get_response(warmup._request(sys.argv[1]))
+print(json.dumps({
+    'status': response.status_code,
+    'setup': ready - started,
+    'warm_up': warm - ready,
+    'first_response': done - warm,
+    'next_response': time.perf_counter() - second,
+}))
+'''
+
+
+class Command(BaseCommand):
+    """Report import times and time to first response of a cold process."""
+
+    help = 'Startup profile'
+
+    def add_arguments(self, parser):
+        """Add command arguments."""
+        parser.add_argument('--path', default='/api/tags/')
+        parser.add_argument('--top', type=int, default=20)
+
+    def probe(self, path, mode, importtime=False):
+        """Start a fresh interpreter and return its timings and stderr."""
+        command = [sys.executable]
+        if importtime:
+            command += ['-X', 'importtime']
+        command += ['-c', PROBE, path, mode]
+        result = subprocess.run(
+            command, cwd=settings.BASE_DIR, env=os.environ.copy(),
+            capture_output=True, text=True)
+        if result.returncode:
+            raise CommandError(result.stderr)
+        return json.loads(result.stdout.splitlines()[-1]), result.stderr
+
+    def imports(self, stderr):
+        """Parse -X importtime output into per module and package times."""
+        modules = []
+        packages = defaultdict(int)
+        for line in stderr.splitlines():
+            if not line.startswith('import time:'):
+                continue
+            own, cumulative, name = line[len('import time:'):].split('|')
+            if not own.strip().isdigit():
+                continue
+            module = name.strip()
+            modules.append((int(cumulative), int(own), module))
+            packages[module.split('.')[0]] += int(own)
+        return sorted(modules, reverse=True), packages
+
+    def handle(self, *args, **options):
+        """Profile a cold start with and without the warm-up."""
+        path = options['path']
+        timings, stderr = self.probe(path, 'cold', importtime=True)
+        modules, packages = self.imports(stderr)
+        self.stdout.write(
+            f'Imports: {len(modules)} modules, '
+            f'{sum(packages.values()) / 1000:.0f} ms')
+        self.stdout.write('Slowest imports (cumulative / self, ms):')
+        for cumulative, own, module in modules[:options['top']]:
+            self.stdout.write(
+                f'  {cumulative / 1000:8.1f} {own / 1000:8.1f}  {module}')
+        self.stdout.write('Import time by package (ms):')
+        ranked = sorted(packages.items(), key=lambda item: -item[1])
+        for package, own in ranked[:options['top']]:
+            self.stdout.write(f'  {own / 1000:8.1f}  {package}')
+        cold, _ = self.probe(path, 'cold')
+        warm, _ = self.probe(path, 'warm')
+        for label, result in (('cold', cold), ('warm', warm)):
+            self.stdout.write(
+                f'{label}: status {result["status"]}, '
+                f'setup {result["setup"] * 1000:.0f} ms, '
+                f'warm-up {result["warm_up"] * 1000:.0f} ms, '
+                f'first response {result["first_response"] * 1000:.1f} ms, '
+                f'next response {result["next_response"] * 1000:.1f} ms')
@@ -0,0 +1,23 @@
+"""Parsers.py."""
+import codecs
+import io
+
+import orjson
+from django.conf import settings
+from rest_framework.parsers import JSONParser
+
+
+class FastJSONParser(JSONParser):
+    """JSON parser backed by orjson with the stock parser as a fallback."""
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        """Parse UTF-8 bodies with orjson and anything else as before."""
+        parser_context = parser_context or {}
+        encoding = parser_context.get('encoding', settings.DEFAULT_CHARSET)
+        if codecs.lookup(encoding).name != 'utf-8':
+            return super().parse(stream, media_type, parser_context)
+        body = stream.read()
+        try:
+            return orjson.loads(body)
+        except orjson.JSONDecodeError:
+            return super().parse(io.BytesIO(body), media_type, parser_context)
@@ -0,0 +1,200 @@
+"""Profiling.py."""
+import json
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+from recipes.models import RequestProfile
+
+FOLDED = 'folded'
+QUERIES = 'json'
+
+
+def path(token, kind):
+    """Return where one file of a stored profile is kept."""
+    return os.path.join(settings.PROFILES_DIR, f'{token.hex}.{kind}')
+
+
+def trigger(request):
+    """Tell why the request should be profiled, if it should at all."""
+    if request.META.get(settings.PROFILE_HEADER) or request.GET.get(
+            settings.PROFILE_QUERY_PARAM):
+        return RequestProfile.REQUESTED
+    rate = settings.PROFILE_SAMPLE_RATE
+    if rate and random.randrange(rate) == 0:
+        return RequestProfile.SAMPLED
+    return None
+
+
+def _frame_name(frame):
+    """Return a flamegraph frame name for a Python frame."""
+    module = frame.f_globals.get('__name__', '?')
+    return f'{module}.{frame.f_code.co_name}'.replace(';', ':')
+
+
+def _statement(sql):
+    """Return a short single-line flamegraph frame for an SQL statement."""
+    text = ' '.join(sql.split()).replace(';', ':')
+    return f'SQL {text[:80]}'
+
+
+class Profile:
+    """Stack samples and queries of one request's dispatch."""
+
+    def __init__(self, request, reason):
+        """Prepare to sample the calling thread below the caller's frame."""
+        self.reason = reason
+        self.method = request.method
+        self.path = request.get_full_path()[:255]
+        self.root = sys._getframe(2)
+        self.thread = threading.get_ident()
+        self.samples = Counter()
+        self.queries = []
+        self.query = None
+        self.cancelled = False
+        self.done = threading.Event()
+        self.exits = ExitStack()
+
+    def __enter__(self):
+        """Start sampling and recording queries."""
+        for connection in connections.all():
+            self.exits.enter_context(connection.execute_wrapper(self.record))
+        self.sampler = threading.Thread(target=self.sample, daemon=True)
+        self.started = time.perf_counter()
+        self.sampler.start()
+        return self
+
+    def __exit__(self, *exc_info):
+        """Stop sampling and recording queries."""
+        self.duration = time.perf_counter() - self.started
+        self.stop()
+
+    def stop(self):
+        """Stop the sampler thread and the query recording."""
+        self.done.set()
+        self.exits.close()
+        self.sampler.join()
+
+    def cancel(self):
+        """Drop the profile of a request nobody is allowed to see."""
+        self.cancelled = True
+        self.stop()
+
+    def stack(self):
+        """Return the profiled thread's stack from the dispatch down."""
+        frame = sys._current_frames().get(self.thread)
+        names = []
+        while frame is not None and frame is not self.root:
+            names.append(_frame_name(frame))
+            frame = frame.f_back
+        names.reverse()
+        if self.query:
+            names.append(_statement(self.query))
+        return ';'.join(names)
+
+    def sample(self):
+        """Count the stacks of the profiled thread until stopped."""
+        interval = settings.PROFILE_INTERVAL
+        while not self.done.wait(interval):
+            stack = self.stack()
+            if stack:
+                self.samples[stack] += 1
+
+    def record(self, execute, sql, params, many, context):
+        """Run a query and remember its statement and timing."""
+        self.query = sql
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.queries.append({
+                'sql': sql,
+                'many': many,
+                'alias': context['connection'].alias,
+                'started': round((started - self.started) * 1000, 3),
+                'duration': round((time.perf_counter() - started) * 1000, 3),
+            })
+            self.query = None
+
+    def save(self, user, status):
+        """Write the flamegraph and query files and list them in admin."""
+        profile = RequestProfile(
+            reason=self.reason,
+            method=self.method,
+            path=self.path,
+            user=user if user.is_authenticated else None,
+            status=status,
+            duration=round(self.duration * 1000, 3),
+            samples=sum(self.samples.values()),
+            queries=len(self.queries),
+            query_time=round(sum(
+                query['duration'] for query in self.queries), 3),
+        )
+        os.makedirs(settings.PROFILES_DIR, exist_ok=True)
+        with open(path(profile.token, FOLDED), 'w') as folded:
+            for stack, count in self.samples.most_common():
+                folded.write(f'{stack} {count}\n')
+        with open(path(profile.token, QUERIES), 'w') as queries:
+            json.dump({
+                'method': self.method,
+                'path': self.path,
+                'status': status,
+                'duration': profile.duration,
+                'interval': settings.PROFILE_INTERVAL * 1000,
+                'queries': self.queries,
+            }, queries, indent=2)
+        profile.save()
+        prune()
+        return profile
+
+
+def remove(token):
+    """Delete the files of a profile."""
+    for kind in (FOLDED, QUERIES):
+        try:
+            os.remove(path(token, kind))
+        except FileNotFoundError:
+            pass
+
+
+def prune():
+    """Keep only the PROFILES_KEEP most recent profiles."""
+    stale = RequestProfile.objects.order_by('-created').values_list(
+        'pk', flat=True)[settings.PROFILES_KEEP:]
+    RequestProfile.objects.filter(pk__in=list(stale)).delete()
+
+
+class ProfiledViewMixin:
+    """Profile the whole dispatch of a view when asked to."""
+
+    profile = None
+
+    def dispatch(self, request, *args, **kwargs):
+        """Dispatch under the profiler only when a trigger is present."""
+        reason = trigger(request)
+        if reason is None:
+            return super().dispatch(request, *args, **kwargs)
+        with Profile(request, reason) as self.profile:
+            response = super().dispatch(request, *args, **kwargs)
+        profile = self.profile
+        if not profile.cancelled and (
+                profile.reason == RequestProfile.SAMPLED
+                or self.request.user.is_staff):
+            saved = profile.save(self.request.user, response.status_code)
+            if self.request.user.is_staff:
+                response['X-Profile-Id'] = str(saved.token)
+        return response
+
+    def perform_authentication(self, request):
+        """Stop profiling requests of readers who may not ask for it."""
+        super().perform_authentication(request)
+        profile = self.profile
+        if (profile and profile.reason == RequestProfile.REQUESTED
+                and not request.user.is_staff):
+            profile.cancel()
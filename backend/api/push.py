@@ -0,0 +1,74 @@
+"""Push.py."""
+from functools import partial
+
+import orjson
+from django.db import connection, transaction
+from recipes.models import OutboxEvent
+
+from .streams import CHANNEL, hub
+
+MAX_PAYLOAD = 7900
+
+
+def messages(events):
+    """Return the stream messages describing outbox events."""
+    result = []
+    for item in events:
+        data = item.data
+        if item.topic in ('favorite', 'cart'):
+            result.append({
+                'user': data['user'],
+                'event': item.topic,
+                'data': {'recipe': data['recipe'], 'action': item.action},
+            })
+        elif item.topic == 'follow':
+            result.append({
+                'user': data['user'],
+                'event': 'follow',
+                'data': {'author': data['author'], 'action': item.action},
+            })
+            result.append({
+                'user': data['author'],
+                'event': 'follower',
+                'data': {'user': data['user'], 'action': item.action},
+            })
+        elif item.topic == 'recipe' and item.action == OutboxEvent.CREATED:
+            result.append({
+                'author': data['author'],
+                'event': 'recipe',
+                'data': {'recipe': item.object_id, 'author': data['author']},
+            })
+    return result
+
+
+def payloads(items):
+    """Split messages into NOTIFY payloads below the size limit."""
+    chunk, size = [], 2
+    for message in items:
+        encoded = orjson.dumps(message)
+        if chunk and size + len(encoded) + 1 > MAX_PAYLOAD:
+            yield b'[' + b','.join(chunk) + b']'
+            chunk, size = [], 2
+        chunk.append(encoded)
+        size += len(encoded) + 1
+    if chunk:
+        yield b'[' + b','.join(chunk) + b']'
+
+
+def publish(events):
+    """Deliver messages of outbox events to streams once they commit.
+
+    On Postgres NOTIFY is part of the transaction, so every worker gets
+    the messages on commit and none on rollback. Elsewhere only the
+    streams of this process are reached.
+    """
+    items = messages(events)
+    if not items:
+        return
+    if connection.vendor != 'postgresql':
+        transaction.on_commit(partial(hub.dispatch_threadsafe, items))
+        return
+    with connection.cursor() as cursor:
+        for payload in payloads(items):
+            cursor.execute(
+                'SELECT pg_notify(%s, %s)', [CHANNEL, payload.decode()])
@@ -0,0 +1,168 @@
+"""Search.py."""
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.db import connection, transaction
+from recipes.models import Ingredients
+
+from . import snapshots
+
+LATIN = "qwertyuiop[]asdfghjkl;'zxcvbnm,.`"
+CYRILLIC = 'йцукенгшщзхъфывапролджэячсмитьбюё'
+LAYOUT = str.maketrans(LATIN + LATIN.upper(), CYRILLIC + CYRILLIC.upper())
+
+TRANSLITERATION = (
+    ('shch', 'щ'), ('sch', 'щ'), ('yo', 'ё'), ('zh', 'ж'), ('kh', 'х'),
+    ('ts', 'ц'), ('ch', 'ч'), ('sh', 'ш'), ('yu', 'ю'), ('ya', 'я'),
+    ('ye', 'е'), ('a', 'а'), ('b', 'б'), ('c', 'к'), ('d', 'д'), ('e', 'е'),
+    ('f', 'ф'), ('g', 'г'), ('h', 'х'), ('i', 'и'), ('j', 'й'), ('k', 'к'),
+    ('l', 'л'), ('m', 'м'), ('n', 'н'), ('o', 'о'), ('p', 'п'), ('q', 'к'),
+    ('r', 'р'), ('s', 'с'), ('t', 'т'), ('u', 'у'), ('v', 'в'), ('w', 'в'),
+    ('x', 'кс'), ('y', 'ы'), ('z', 'з'), ("'", 'ь'),
+)
+
+SEARCH_SQL = '''
+SELECT id FROM (
+    SELECT id, name,
+           {prefix} AS is_prefix,
+           GREATEST({similarity}) AS rank
+    FROM {table}
+    WHERE {prefix} OR {fuzzy}
+) AS found
+ORDER BY is_prefix DESC, rank DESC, name
+LIMIT %s
+'''
+NAME = "replace(lower(name), 'ё', 'е')"
+
+_lock = threading.Lock()
+_index = None
+
+
+def normalize(text):
+    """Lowercase the text and fold ё so spelling variants match."""
+    return ' '.join(text.lower().replace('ё', 'е').split())
+
+
+def transliterate(text):
+    """Spell Latin transliteration in Cyrillic letters."""
+    result = []
+    position = 0
+    while position < len(text):
+        for latin, cyrillic in TRANSLITERATION:
+            if text.startswith(latin, position):
+                result.append(cyrillic)
+                position += len(latin)
+                break
+        else:
+            result.append(text[position])
+            position += 1
+    return ''.join(result)
+
+
+def variants(query):
+    """Return the query as typed, with the layout fixed and transliterated."""
+    query = normalize(query)
+    if not query:
+        return []
+    candidates = [query]
+    if any('a' <= char <= 'z' for char in query):
+        candidates.append(normalize(query.translate(LAYOUT)))
+        candidates.append(normalize(transliterate(query)))
+    return list(dict.fromkeys(candidates))
+
+
+def trigrams(text):
+    """Return pg_trgm style trigrams of every word of the text."""
+    result = set()
+    for word in text.split():
+        padded = f'  {word} '
+        result.update(
+            padded[index:index + 3] for index in range(len(padded) - 2))
+    return result
+
+
+class MemoryIndex:
+    """Trigram index of the ingredient catalog kept in process memory."""
+
+    def __init__(self, version, rows):
+        """Index (id, name) rows of the catalog."""
+        self.version = version
+        self.names = {}
+        self.postings = {}
+        for ingredient_id, name in rows:
+            name = normalize(name)
+            self.names[ingredient_id] = name
+            for trigram in trigrams(name):
+                self.postings.setdefault(trigram, []).append(ingredient_id)
+
+    def search(self, queries, limit):
+        """Return ids of prefix matches first, then of similar names."""
+        threshold = settings.INGREDIENT_SEARCH_THRESHOLD
+        ranks = {}
+        for query in queries:
+            wanted = trigrams(query)
+            hits = Counter()
+            for trigram in wanted:
+                hits.update(self.postings.get(trigram, ()))
+            for ingredient_id, count in hits.items():
+                rank = count / len(wanted)
+                if rank >= threshold:
+                    ranks[ingredient_id] = max(
+                        rank, ranks.get(ingredient_id, 0))
+            for ingredient_id, name in self.names.items():
+                if name.startswith(query):
+                    ranks[ingredient_id] = 2 + ranks.get(ingredient_id, 0)
+        found = sorted(
+            ranks, key=lambda key: (-ranks[key], self.names[key]))
+        return found[:limit]
+
+
+def memory_index():
+    """Return the catalog index, rebuilding it when the catalog changed."""
+    global _index
+    version = snapshots.get('ingredients').version
+    with _lock:
+        index = _index
+    if index is None or index.version != version:
+        index = MemoryIndex(
+            version, Ingredients.objects.values_list('id', 'name'))
+        with _lock:
+            _index = index
+    return index
+
+
+def _escape_like(text):
+    """Escape LIKE wildcards typed by the user."""
+    return (text.replace('\\', '\\\\').replace('%', '\\%')
+            .replace('_', '\\_'))
+
+
+@transaction.atomic
+def _search_postgres(queries, limit):
+    """Rank ingredients with the pg_trgm word similarity index."""
+    prefix = ' OR '.join([f'{NAME} LIKE %s'] * len(queries))
+    fuzzy = ' OR '.join([f'%s <%% {NAME}'] * len(queries))
+    similarity = ', '.join([f'word_similarity(%s, {NAME})'] * len(queries))
+    sql = SEARCH_SQL.format(
+        prefix=f'({prefix})', similarity=similarity, fuzzy=fuzzy,
+        table=Ingredients._meta.db_table)
+    prefixes = [f'{_escape_like(query)}%' for query in queries]
+    params = [*prefixes, *queries, *prefixes, *queries, limit]
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)",
+            [str(settings.INGREDIENT_SEARCH_THRESHOLD)])
+        cursor.execute(sql, params)
+        return [row[0] for row in cursor.fetchall()]
+
+
+def search(query, limit=None):
+    """Return ids of ingredients matching a possibly misspelled query."""
+    limit = limit or settings.INGREDIENT_SEARCH_LIMIT
+    queries = variants(query)
+    if not queries:
+        return []
+    if connection.vendor == 'postgresql':
+        return _search_postgres(queries, limit)
+    return memory_index().search(queries, limit)
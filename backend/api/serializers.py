@@ -1,17 +1,25 @@
 """Serializers.py."""
+from django.conf import settings
 from django.db import transaction
 from django.utils.translation import gettext_lazy as _
 from djoser.serializers import UserCreateSerializer, UserSerializer
 from drf_extra_fields.fields import Base64ImageField
-from recipes.models import IngredientInRecipe, Ingredients, Recipe, Tag
+from recipes import outbox, shopping
+from recipes.models import (Cart, CartItem, Favorite, ImageUpload,
+                            IngredientInRecipe, Ingredients, Recipe, Tag)
+from recipes.units import humanize
 from rest_framework import status
 from rest_framework.exceptions import ValidationError
 from rest_framework.fields import SerializerMethodField
-from rest_framework.relations import PrimaryKeyRelatedField
-from rest_framework.serializers import (IntegerField, ModelSerializer,
-                                        ReadOnlyField)
+from rest_framework.relations import PrimaryKeyRelatedField, SlugRelatedField
+from rest_framework.serializers import (CharField, IntegerField, ListField,
+                                        ModelSerializer, ReadOnlyField,
+                                        Serializer, UUIDField)
+from users import caches
 from users.models import Follow, User
 
+from . import batch, uploads, writebehind
+
 
 class CustomUserCreateSerializer(UserCreateSerializer):
     """User Create model seralizer."""
@@ -53,8 +61,7 @@ class CustomUserSerializer(UserSerializer):
         request = self.context.get('request')
         if not request or request.user.is_anonymous:
             return False
-        return Follow.objects.filter(user=self.context['request'].user,
-                                     author=obj).exists()
+        return obj.id in caches.following(request.user.id)
 
 
 class RecipeShortenedSerializer(ModelSerializer):
@@ -74,6 +81,62 @@ class RecipeShortenedSerializer(ModelSerializer):
         )
 
 
+class ImageUploadSerializer(ModelSerializer):
+    """Recipe image upload session."""
+
+    offset = ReadOnlyField(source='received')
+
+    class Meta:
+        """ImageUploadSerializer Meta."""
+
+        model = ImageUpload
+        fields = ('token', 'filename', 'size', 'offset', 'complete')
+        read_only_fields = ('token', 'complete')
+
+    def validate_size(self, value):
+        """Reject empty and oversized uploads up front."""
+        if not 0 < value <= settings.RECIPE_UPLOAD_MAX_SIZE:
+            raise ValidationError(_('Unsupported upload size'))
+        return value
+
+
+class RecipeIdsSerializer(Serializer):
+    """List of recipe ids for bulk favorite and cart changes."""
+
+    recipes = ListField(
+        child=IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=500,
+    )
+
+    def validate_recipes(self, value):
+        """Drop repeated ids keeping the original order."""
+        return list(dict.fromkeys(value))
+
+
+class BatchSerializer(Serializer):
+    """Relative GET requests to answer in one round trip."""
+
+    requests = ListField(
+        child=CharField(max_length=2000),
+        allow_empty=False,
+    )
+
+    def validate_requests(self, value):
+        """Accept a bounded number of batchable API paths."""
+        if len(value) > settings.BATCH_MAX_REQUESTS:
+            raise ValidationError(
+                f'At most {settings.BATCH_MAX_REQUESTS} requests per batch')
+        errors = {
+            index: reason for index, reason in enumerate(
+                batch.check(path) for path in value)
+            if reason
+        }
+        if errors:
+            raise ValidationError(errors)
+        return value
+
+
 class SubscribeSerializer(ModelSerializer):
     """Follow model subscribe serialization."""
 
@@ -210,9 +273,13 @@ class RecipeReadSerializer(ModelSerializer):
     author = CustomUserSerializer(read_only=True)
 
     def __init__(self, *args, **kwargs):
-        """Init."""
+        """Init, keeping only the given fields if any."""
         self.request = kwargs['context']['request']
+        fields = kwargs.pop('fields', None)
         super().__init__(*args, **kwargs)
+        if fields is not None:
+            for name in set(self.fields) - set(fields):
+                self.fields.pop(name)
 
     class Meta:
         """RecipeReadSerializer Meta."""
@@ -243,6 +310,9 @@ class RecipeReadSerializer(ModelSerializer):
         user = self.request.user
         if not user.is_authenticated:
             return False
+        pending = writebehind.changes(Favorite, user)
+        if obj.id in pending:
+            return pending[obj.id]
         return user.favorites.filter(recipe=obj).exists()
 
     def get_is_in_shopping_cart(self, obj):
@@ -250,9 +320,49 @@ class RecipeReadSerializer(ModelSerializer):
         user = self.context.get('request').user
         if not user.is_authenticated:
             return False
+        pending = writebehind.changes(Cart, user)
+        if obj.id in pending:
+            return pending[obj.id]
         return user.shopping_cart.filter(recipe=obj).exists()
 
 
+class CartItemSerializer(ModelSerializer):
+    """Shopping cart summary serialization."""
+
+    class Meta:
+        """CartItemSerializer Meta."""
+
+        model = CartItem
+        fields = (
+            'name',
+            'measurement_unit',
+            'amount',
+        )
+
+    def to_representation(self, instance):
+        """Show large amounts in the bigger unit."""
+        data = super().to_representation(instance)
+        unit, amount = humanize(instance.measurement_unit, instance.amount)
+        data.update(measurement_unit=unit, amount=amount)
+        return data
+
+
+class RecipeDocumentSerializer(RecipeReadSerializer):
+    """Recipe read representation without the reader dependent fields."""
+
+    def __init__(self, *args, **kwargs):
+        """Init without a request, the document is shared by all readers."""
+        super(RecipeReadSerializer, self).__init__(*args, **kwargs)
+
+    class Meta(RecipeReadSerializer.Meta):
+        """RecipeDocumentSerializer Meta."""
+
+        fields = tuple(
+            field for field in RecipeReadSerializer.Meta.fields
+            if field not in ('is_favorited', 'is_in_shopping_cart')
+        )
+
+
 class IngredientInRecipeWriteSerializer(ModelSerializer):
     """IngredientInRecipe Write serialization."""
 
@@ -272,7 +382,13 @@ class RecipeWriteSerializer(ModelSerializer):
                                   many=True)
     author = CustomUserSerializer(read_only=True)
     ingredients = IngredientInRecipeWriteSerializer(many=True)
-    image = Base64ImageField()
+    image = Base64ImageField(required=False)
+    image_upload = SlugRelatedField(
+        slug_field='token',
+        queryset=ImageUpload.objects.filter(complete=True),
+        required=False,
+        write_only=True,
+    )
 
     class Meta:
         """RecipeWriteSerializer Meta."""
@@ -285,10 +401,27 @@ class RecipeWriteSerializer(ModelSerializer):
             'author',
             'name',
             'image',
+            'image_upload',
             'text',
             'cooking_time'
         )
 
+    def validate_image_upload(self, upload):
+        """Accept only uploads made by the author."""
+        if upload.user_id != self.context['request'].user.id:
+            raise ValidationError(_('Upload not found'))
+        return upload
+
+    def validate(self, data):
+        """Require exactly one way of passing the image."""
+        given = ('image' in data) + ('image_upload' in data)
+        if given > 1:
+            raise ValidationError(
+                _('Pass either image or image_upload, not both'))
+        if not given and not self.partial:
+            raise ValidationError({'image': _('This field is required.')})
+        return data
+
     def validate_ingredients(self, ingredients):
         """Validate a list of ingredients."""
         ids_seen = set()
@@ -323,13 +456,17 @@ class RecipeWriteSerializer(ModelSerializer):
                 amount=ingredient['amount']
             ) for ingredient in ingredients]
         )
+        outbox.record_created(recipe.ingredients_in_recipe.all())
 
     @transaction.atomic
     def create(self, validated_data):
         """Recipe creation."""
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
-        recipe = Recipe.objects.create(**validated_data)
+        with uploads.opened(validated_data.pop('image_upload', None)) as image:
+            if image is not None:
+                validated_data['image'] = image
+            recipe = Recipe.objects.create(**validated_data)
         recipe.tags.set(tags)
         self.ingredients_amounts(recipe=recipe,
                                  ingredients=ingredients)
@@ -340,12 +477,17 @@ class RecipeWriteSerializer(ModelSerializer):
         """Recipe update."""
         tags = validated_data.pop('tags')
         ingredients = validated_data.pop('ingredients')
-        instance = super().update(instance, validated_data)
+        old_totals = shopping.recipe_totals([instance.id])[instance.id]
+        with uploads.opened(validated_data.pop('image_upload', None)) as image:
+            if image is not None:
+                validated_data['image'] = image
+            instance = super().update(instance, validated_data)
         instance.tags.clear()
         instance.tags.set(tags)
         instance.ingredients.clear()
         self.ingredients_amounts(recipe=instance,
                                  ingredients=ingredients)
+        shopping.recipe_changed(instance.id, old_totals)
         instance.save()
         return instance
 
@@ -355,3 +497,17 @@ class RecipeWriteSerializer(ModelSerializer):
         context = {'request': request}
         return RecipeReadSerializer(instance,
                                     context=context).data
+
+
+class RecipeIngestSerializer(RecipeWriteSerializer):
+    """Recipe of a bulk load, with references checked by the caller."""
+
+    tags = ListField(child=IntegerField())
+    image_upload = UUIDField(required=False, write_only=True)
+
+    class Meta(RecipeWriteSerializer.Meta):
+        """RecipeIngestSerializer Meta."""
+
+    def validate_image_upload(self, token):
+        """Leave the upload lookup to the batch."""
+        return token
@@ -0,0 +1,67 @@
+"""Shopping_list.py."""
+import io
+import os
+import time
+
+from django.conf import settings
+
+from .serializers import CartItemSerializer
+
+PDF_STYLE = '''
+<style>
+@font-face {{ font-family: shopping; src: url("{font}"); }}
+body {{ font-family: shopping; font-size: 12pt; }}
+</style>
+'''
+
+
+def html(user):
+    """Render the shopping list of the user as HTML list items."""
+    items = CartItemSerializer(user.cart_items.all(), many=True).data
+    return ''.join(
+        f'<li>{item["name"]} '
+        f'({item["measurement_unit"]}) '
+        f'- {item["amount"]}</li><br>'
+        for item in items
+    )
+
+
+def pdf(user):
+    """Render the shopping list of the user as a PDF document."""
+    from xhtml2pdf import pisa  # slow to import, needed by workers only
+    document = html(user)
+    font = settings.SHOPPING_LIST_FONT
+    if os.path.exists(font):
+        document = PDF_STYLE.format(font=font) + document
+    buffer = io.BytesIO()
+    pisa.CreatePDF(document, dest=buffer, path=font, encoding='utf-8')
+    return buffer.getvalue()
+
+
+def stored(filename):
+    """Return where a rendered PDF is kept, outside the public media."""
+    return os.path.join(settings.SHOPPING_LISTS_DIR, filename)
+
+
+def save_pdf(user, filename):
+    """Render the user's PDF and store it atomically under the filename."""
+    os.makedirs(settings.SHOPPING_LISTS_DIR, exist_ok=True)
+    path = stored(filename)
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(pdf(user))
+    os.replace(tmp_path, path)
+
+
+def prune():
+    """Delete PDFs older than SHOPPING_LISTS_EXPIRY."""
+    if not os.path.isdir(settings.SHOPPING_LISTS_DIR):
+        return
+    expired = time.time() - settings.SHOPPING_LISTS_EXPIRY
+    with os.scandir(settings.SHOPPING_LISTS_DIR) as entries:
+        for entry in entries:
+            try:
+                if entry.stat().st_mtime < expired:
+                    os.remove(entry.path)
+            except FileNotFoundError:
+                pass
@@ -0,0 +1,126 @@
+"""Signals.py."""
+from functools import partial
+
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+from jobs.queue import enqueue_unique
+from recipes import outbox, versions
+from recipes.models import (IngredientInRecipe, Ingredients, OutboxEvent,
+                            Recipe, RequestProfile, Tag)
+
+from . import cached, documents, profiling, push, snapshots
+
+User = get_user_model()
+
+PROFILE_FIELDS = {'email', 'username', 'first_name', 'last_name'}
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tags_changed(sender, **kwargs):
+    """Regenerate the tags snapshot."""
+    snapshots.schedule_rebuild('tags')
+
+
+@receiver((post_save, post_delete), sender=Ingredients)
+def ingredients_changed(sender, **kwargs):
+    """Regenerate the ingredients snapshot."""
+    snapshots.schedule_rebuild('ingredients')
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_saved(sender, instance, created, **kwargs):
+    """Drop the document of a changed recipe."""
+    documents.invalidate([instance.id])
+    if created:
+        cached.forget_missing(Recipe, instance.id)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_changed(sender, instance, action, pk_set, **kwargs):
+    """Drop documents of recipes whose tags changed."""
+    if not action.startswith('post_'):
+        return
+    if isinstance(instance, Recipe):
+        documents.invalidate([instance.id])
+    else:
+        documents.invalidate(Recipe.objects.filter(tags=instance))
+        if pk_set:
+            documents.invalidate(pk_set)
+
+
+@receiver((post_save, post_delete), sender=IngredientInRecipe)
+def recipe_ingredients_changed(sender, instance, **kwargs):
+    """Drop the document of a recipe whose ingredients changed."""
+    documents.invalidate([instance.recipe_id])
+
+
+@receiver(post_save, sender=Tag)
+def tag_saved(sender, instance, created, **kwargs):
+    """Refresh documents showing the tag."""
+    if not created:
+        documents.invalidate(Recipe.objects.filter(tags=instance))
+        versions.touch(Recipe.objects.filter(tags=instance))
+        enqueue_unique('api.rebuild_documents')
+
+
+@receiver(post_save, sender=Ingredients)
+def ingredient_saved(sender, instance, created, **kwargs):
+    """Refresh documents listing the ingredient."""
+    if not created:
+        documents.invalidate(Recipe.objects.filter(ingredients=instance))
+        versions.touch(Recipe.objects.filter(ingredients=instance))
+        enqueue_unique('api.rebuild_documents')
+
+
+@receiver(pre_save, sender=User)
+def author_saving(sender, instance, update_fields, **kwargs):
+    """Tell whether the save changes what documents show of the author."""
+    fields = PROFILE_FIELDS if update_fields is None else (
+        PROFILE_FIELDS & set(update_fields))
+    instance._profile_changed = (
+        bool(fields) and not instance._state.adding
+        and User.objects.filter(pk=instance.pk).exclude(
+            **{field: getattr(instance, field) for field in fields}
+        ).exists())
+
+
+@receiver(post_save, sender=User)
+def author_saved(sender, instance, created, **kwargs):
+    """Refresh documents of an author whose profile changed."""
+    if created:
+        cached.forget_missing(User, instance.id)
+    if created or not getattr(instance, '_profile_changed', False):
+        return
+    documents.invalidate(Recipe.objects.filter(author=instance))
+    versions.touch(Recipe.objects.filter(author=instance))
+    enqueue_unique('api.rebuild_documents')
+
+
+@receiver(pre_delete, sender=Tag)
+def tag_deleted(sender, instance, **kwargs):
+    """Refresh documents and sync versions of recipes losing the tag."""
+    # Tag links go with the tag without m2m_changed being sent.
+    documents.invalidate(Recipe.objects.filter(tags=instance))
+    versions.touch(Recipe.objects.filter(tags=instance))
+    enqueue_unique('api.rebuild_documents')
+
+
+@receiver(pre_delete, sender=Ingredients)
+def ingredient_deleted(sender, instance, **kwargs):
+    """Move recipes losing the ingredient forward for sync clients."""
+    versions.touch(Recipe.objects.filter(ingredients=instance))
+
+
+@receiver(post_delete, sender=RequestProfile)
+def profile_deleted(sender, instance, **kwargs):
+    """Remove the files of a deleted profile."""
+    transaction.on_commit(partial(profiling.remove, instance.token))
+
+
+@receiver(outbox.recorded, sender=OutboxEvent)
+def events_recorded(sender, events, **kwargs):
+    """Push changes of favorites, carts and follows to event streams."""
+    push.publish(events)
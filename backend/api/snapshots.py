@@ -0,0 +1,169 @@
+"""Snapshots.py."""
+import gzip
+import hashlib
+import os
+import re
+import threading
+from functools import partial
+
+import brotli
+from django.conf import settings
+from django.db import transaction
+from django.http import HttpResponse, HttpResponseNotModified
+from django.utils.cache import patch_vary_headers
+from recipes.models import Ingredients, Tag
+from rest_framework.settings import api_settings
+
+from .serializers import IngredientsSerializer, TagsSerializer
+
+SOURCES = {
+    'tags': (Tag, TagsSerializer),
+    'ingredients': (Ingredients, IngredientsSerializer),
+}
+
+ENCODINGS = (
+    ('br', re.compile(r'\bbr\b'), '.br'),
+    ('gzip', re.compile(r'\bgzip\b'), '.gz'),
+)
+
+_lock = threading.Lock()
+_loaded = {}
+
+
+class Snapshot:
+    """Pre-rendered list response together with its compressed copies."""
+
+    def __init__(self, version, stamp, bodies):
+        """Init."""
+        self.version = version
+        self.stamp = stamp
+        self.bodies = bodies
+
+    @property
+    def etag(self):
+        """Return the quoted ETag of the snapshot."""
+        return f'"{self.version}"'
+
+
+def _directory():
+    """Return the directory the snapshots are stored in."""
+    return settings.SNAPSHOTS_DIR
+
+
+def _pointer(name):
+    """Return the path of the file holding the current version."""
+    return os.path.join(_directory(), f'{name}.version')
+
+
+def _body_path(name, version, suffix=''):
+    """Return the path of one stored body of the snapshot."""
+    return os.path.join(_directory(), f'{name}-{version}.json{suffix}')
+
+
+def _write(path, content):
+    """Write a file atomically so readers never see a partial body."""
+    tmp_path = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_path, 'wb') as f:
+        f.write(content)
+    os.replace(tmp_path, path)
+
+
+def render(name):
+    """Serialize the whole table exactly as the list endpoint would."""
+    model, serializer_class = SOURCES[name]
+    renderer = api_settings.DEFAULT_RENDERER_CLASSES[0]()
+    data = serializer_class(model.objects.all(), many=True).data
+    return renderer.render(data, renderer.media_type)
+
+
+def rebuild(name):
+    """Render the snapshot, compress it and publish it on disk."""
+    body = render(name)
+    version = hashlib.sha256(body).hexdigest()[:16]
+    bodies = {
+        '': body,
+        '.gz': gzip.compress(body, compresslevel=9, mtime=0),
+        '.br': brotli.compress(body, mode=brotli.MODE_TEXT),
+    }
+    os.makedirs(_directory(), exist_ok=True)
+    for suffix, content in bodies.items():
+        _write(_body_path(name, version, suffix), content)
+    _write(_pointer(name), version.encode())
+    for filename in os.listdir(_directory()):
+        if (filename.startswith(f'{name}-')
+                and not filename.startswith(f'{name}-{version}.')):
+            try:
+                os.remove(os.path.join(_directory(), filename))
+            except FileNotFoundError:
+                pass
+    snapshot = Snapshot(version, os.stat(_pointer(name)).st_mtime_ns, bodies)
+    with _lock:
+        _loaded[name] = snapshot
+    return snapshot
+
+
+def get(name):
+    """Return the current snapshot, reloading it when another worker wrote."""
+    try:
+        stamp = os.stat(_pointer(name)).st_mtime_ns
+    except FileNotFoundError:
+        return rebuild(name)
+    with _lock:
+        snapshot = _loaded.get(name)
+    if snapshot is not None and snapshot.stamp == stamp:
+        return snapshot
+    try:
+        with open(_pointer(name), 'rb') as f:
+            version = f.read().decode()
+        bodies = {}
+        for suffix in ('', '.gz', '.br'):
+            with open(_body_path(name, version, suffix), 'rb') as f:
+                bodies[suffix] = f.read()
+    except FileNotFoundError:
+        return rebuild(name)
+    snapshot = Snapshot(version, stamp, bodies)
+    with _lock:
+        _loaded[name] = snapshot
+    return snapshot
+
+
+def _pending(connection, name):
+    """Tell whether the open transaction already rebuilds the snapshot."""
+    return any(
+        isinstance(func, partial) and func.func is rebuild
+        and func.args == (name,)
+        for _, func, *_ in connection.run_on_commit)
+
+
+def schedule_rebuild(name):
+    """Rebuild the snapshot once the current transaction commits.
+
+    Callbacks of a rolled back transaction or savepoint are dropped by
+    Django, so only a rebuild still due in this transaction is reused.
+    """
+    connection = transaction.get_connection()
+    if connection.in_atomic_block and _pending(connection, name):
+        return
+    transaction.on_commit(partial(rebuild, name))
+
+
+def response(request, name):
+    """Serve a snapshot picking the best encoding the client accepts."""
+    snapshot = get(name)
+    if request.META.get('HTTP_IF_NONE_MATCH') == snapshot.etag:
+        result = HttpResponseNotModified()
+    else:
+        accept = request.META.get('HTTP_ACCEPT_ENCODING', '')
+        suffix = ''
+        result = HttpResponse(content_type='application/json')
+        for encoding, pattern, candidate in ENCODINGS:
+            if pattern.search(accept):
+                suffix = candidate
+                result['Content-Encoding'] = encoding
+                break
+        result.content = snapshot.bodies[suffix]
+    result['ETag'] = snapshot.etag
+    result['Cache-Control'] = (
+        f'public, max-age={settings.SNAPSHOTS_MAX_AGE}')
+    patch_vary_headers(result, ('Accept-Encoding',))
+    return result
@@ -0,0 +1,320 @@
+"""Streams.py."""
+import asyncio
+import logging
+from collections import defaultdict
+from urllib.parse import parse_qs
+
+import orjson
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import signing
+from django.db import close_old_connections, connections
+from rest_framework.exceptions import AuthenticationFailed
+from users import caches
+
+logger = logging.getLogger(__name__)
+
+User = get_user_model()
+
+CHANNEL = 'push'
+SALT = 'api.streams'
+RECONNECT_DELAY = 5
+RESYNC = 'resync'
+CLOSE = None
+
+
+class Stream:
+    """Event stream of one connected client."""
+
+    def __init__(self, user_id, authors):
+        """Create the stream of a user following the given authors."""
+        self.user_id = user_id
+        self.authors = set(authors)
+        self.queue = asyncio.Queue(settings.PUSH_QUEUE_SIZE)
+
+    def push(self, message):
+        """Queue a message, asking a client that lags behind to resync."""
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            self.close(RESYNC)
+
+    def close(self, reason=CLOSE):
+        """Drop queued messages and end the stream with the reason."""
+        while not self.queue.empty():
+            self.queue.get_nowait()
+        self.queue.put_nowait(reason)
+
+
+class Hub:
+    """Streams of one worker, indexed by user and by followed author."""
+
+    def __init__(self):
+        """Create an empty hub."""
+        self.loop = None
+        self.listener = None
+        self.users = defaultdict(set)
+        self.followers = defaultdict(set)
+
+    def add(self, stream):
+        """Route the messages of the stream's user to it."""
+        self.loop = asyncio.get_running_loop()
+        self.users[stream.user_id].add(stream)
+        for author_id in stream.authors:
+            self.followers[author_id].add(stream)
+        if self.listener is None and (
+                connections['default'].vendor == 'postgresql'):
+            self.listener = self.loop.create_task(listen_forever(self))
+
+    def remove(self, stream):
+        """Stop routing messages to the stream."""
+        _discard(self.users, stream.user_id, stream)
+        for author_id in stream.authors:
+            _discard(self.followers, author_id, stream)
+
+    def follow(self, stream, author_id, following):
+        """Start or stop routing an author's recipes to the stream."""
+        if following:
+            stream.authors.add(author_id)
+            self.followers[author_id].add(stream)
+        else:
+            stream.authors.discard(author_id)
+            _discard(self.followers, author_id, stream)
+
+    def dispatch(self, messages):
+        """Push messages to the streams they are addressed to."""
+        for message in messages:
+            if 'author' in message:
+                targets = self.followers.get(message['author'], ())
+            else:
+                targets = self.users.get(message['user'], ())
+            for stream in list(targets):
+                if message['event'] == 'follow':
+                    self.follow(
+                        stream, message['data']['author'],
+                        message['data']['action'] != 'deleted')
+                stream.push(message)
+
+    def dispatch_threadsafe(self, messages):
+        """Dispatch messages published by a thread of this worker."""
+        if self.loop is not None and not self.loop.is_closed():
+            self.loop.call_soon_threadsafe(self.dispatch, messages)
+
+    def close_all(self, reason=CLOSE):
+        """End every stream of the worker."""
+        for streams in list(self.users.values()):
+            for stream in list(streams):
+                stream.close(reason)
+
+
+def _discard(index, key, stream):
+    """Remove a stream from an index entry, dropping empty entries."""
+    streams = index.get(key)
+    if streams is not None:
+        streams.discard(stream)
+        if not streams:
+            del index[key]
+
+
+hub = Hub()
+
+
+def _connect():
+    """Open a LISTEN connection outside Django's connection handling."""
+    wrapper = connections['default']
+    raw = wrapper.get_new_connection(wrapper.get_connection_params())
+    raw.autocommit = True
+    with raw.cursor() as cursor:
+        cursor.execute(f'LISTEN {CHANNEL}')
+    return raw
+
+
+async def listen_forever(hub):
+    """Keep a LISTEN connection open, reconnecting after failures."""
+    connected_before = False
+    while True:
+        try:
+            raw = await sync_to_async(_connect, thread_sensitive=False)()
+        except Exception:
+            logger.exception('Push listener cannot connect')
+            await asyncio.sleep(RECONNECT_DELAY)
+            continue
+        if connected_before:
+            # Messages sent while no connection was listening are lost.
+            hub.close_all(RESYNC)
+        connected_before = True
+        try:
+            await listen(hub, raw)
+        except Exception:
+            logger.exception('Push listener failed')
+        finally:
+            raw.close()
+        await asyncio.sleep(RECONNECT_DELAY)
+
+
+async def listen(hub, raw):
+    """Dispatch notifications as they arrive on the connection."""
+    loop = asyncio.get_running_loop()
+    readable = asyncio.Event()
+    loop.add_reader(raw.fileno(), readable.set)
+    try:
+        while True:
+            try:
+                await asyncio.wait_for(
+                    readable.wait(), settings.PUSH_HEARTBEAT)
+            except asyncio.TimeoutError:
+                with raw.cursor() as cursor:
+                    cursor.execute('SELECT 1')
+            readable.clear()
+            raw.poll()
+            while raw.notifies:
+                notify = raw.notifies.pop(0)
+                hub.dispatch(orjson.loads(notify.payload))
+    finally:
+        loop.remove_reader(raw.fileno())
+
+
+def ticket(user):
+    """Return a short-lived ticket opening the user's event stream."""
+    return signing.dumps(user.id, salt=SALT)
+
+
+def _ticket_user(value):
+    """Return the active user a valid ticket was issued to."""
+    try:
+        user_id = signing.loads(
+            value, salt=SALT, max_age=settings.PUSH_TICKET_MAX_AGE)
+    except signing.BadSignature:
+        return None
+    return User.objects.filter(id=user_id, is_active=True).first()
+
+
+def _subscribe(key, value):
+    """Return the user of a token or ticket and the authors they follow."""
+    close_old_connections()
+    try:
+        if key:
+            user = caches.CachedTokenAuthentication(
+            ).authenticate_credentials(key)[0]
+        else:
+            user = _ticket_user(value)
+        if user is None:
+            return None, ()
+        return user, caches.following(user.id)
+    except AuthenticationFailed:
+        return None, ()
+    finally:
+        close_old_connections()
+
+
+def _credentials(scope):
+    """Return the token of the Authorization header or the query ticket.
+
+    Tokens are never taken from the query string, which ends up in logs.
+    """
+    for name, value in scope['headers']:
+        if name == b'authorization':
+            keyword, _, key = value.decode('latin-1').partition(' ')
+            if keyword == 'Token' and key:
+                return key, None
+    query = parse_qs(scope['query_string'].decode('latin-1'))
+    return None, query.get('ticket', [None])[0]
+
+
+async def _respond(send, status, data):
+    """Send a complete JSON response."""
+    await send({
+        'type': 'http.response.start',
+        'status': status,
+        'headers': [(b'content-type', b'application/json')],
+    })
+    await send({'type': 'http.response.body', 'body': orjson.dumps(data)})
+
+
+async def _send(send, body, more_body=True):
+    """Send a part of the event stream."""
+    await send({
+        'type': 'http.response.body', 'body': body, 'more_body': more_body})
+
+
+def _frame(message):
+    """Encode a message as a server-sent event."""
+    return b'event: %s\ndata: %s\n\n' % (
+        message['event'].encode(), orjson.dumps(message['data']))
+
+
+async def _wait_disconnect(receive, stream):
+    """End the stream once the client goes away."""
+    while True:
+        message = await receive()
+        if message['type'] == 'http.disconnect':
+            stream.close()
+            return
+
+
+async def serve(scope, receive, send):
+    """Stream the events of the authenticated user as server-sent events."""
+    if scope['method'] != 'GET':
+        return await _respond(send, 405, {'detail': 'Method not allowed.'})
+    key, value = _credentials(scope)
+    user = None
+    if key or value:
+        user, authors = await sync_to_async(_subscribe)(key, value)
+    if user is None:
+        return await _respond(
+            send, 401, {'detail': 'Invalid or missing token or ticket.'})
+    stream = Stream(user.id, authors)
+    hub.add(stream)
+    watcher = asyncio.ensure_future(_wait_disconnect(receive, stream))
+    try:
+        await send({
+            'type': 'http.response.start',
+            'status': 200,
+            'headers': [
+                (b'content-type', b'text/event-stream'),
+                (b'cache-control', b'no-cache'),
+                (b'x-accel-buffering', b'no'),
+            ],
+        })
+        await _send(send, b'retry: %d\n\n' % settings.PUSH_RETRY)
+        while True:
+            try:
+                message = await asyncio.wait_for(
+                    stream.queue.get(), settings.PUSH_HEARTBEAT)
+            except asyncio.TimeoutError:
+                await _send(send, b': ping\n\n')
+                continue
+            if message is CLOSE:
+                break
+            if message == RESYNC:
+                return await _send(
+                    send, b'event: resync\ndata: {}\n\n', more_body=False)
+            await _send(send, _frame(message))
+        await _send(send, b'', more_body=False)
+    finally:
+        watcher.cancel()
+        hub.remove(stream)
+
+
+async def lifespan(receive, send):
+    """Answer lifespan events, ending every stream on shutdown."""
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            hub.close_all()
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
+
+
+def router(application):
+    """Serve the event stream and pass everything else to Django."""
+    async def route(scope, receive, send):
+        if scope['type'] == 'lifespan':
+            return await lifespan(receive, send)
+        if scope['type'] == 'http' and scope['path'] == settings.PUSH_PATH:
+            return await serve(scope, receive, send)
+        return await application(scope, receive, send)
+    return route
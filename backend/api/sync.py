@@ -0,0 +1,141 @@
+"""Sync.py."""
+from datetime import timedelta
+
+from django.conf import settings
+from django.core import signing
+from django.db.models import Q
+from django.utils import timezone
+from recipes.models import Cart, Favorite, Recipe, SyncTombstone
+from users.models import Follow
+
+from . import compiled
+from .serializers import RecipeReadSerializer
+
+SALT = 'api.sync'
+
+SECTIONS = {
+    SyncTombstone.RECIPE: 'recipes',
+    SyncTombstone.FAVORITE: 'favorites',
+    SyncTombstone.CART: 'shopping_cart',
+    SyncTombstone.FOLLOW: 'subscriptions',
+}
+
+
+class TokenExpired(Exception):
+    """Sync token older than the kept tombstones."""
+
+
+def _sources(user):
+    """Return (section, rows, stamp field, key field) of every change feed.
+
+    Changes are ordered by (version, source position, id); the position
+    in this tuple breaks ties between rows sharing a version.
+    """
+    return (
+        ('recipes', Recipe.objects.all(), 'updated_at', 'id'),
+        ('favorites', Favorite.objects.filter(user=user),
+         'created', 'recipe_id'),
+        ('shopping_cart', Cart.objects.filter(user=user),
+         'created', 'recipe_id'),
+        ('subscriptions', Follow.objects.filter(user=user),
+         'created', 'author_id'),
+        (None, SyncTombstone.objects.filter(
+            Q(user_id=None) | Q(user_id=user.id)), 'deleted', 'object_id'),
+    )
+
+
+def encode(user, cursor):
+    """Return the opaque token of a position in the change feed."""
+    return signing.dumps(
+        {'u': user.id, 'c': list(cursor)}, salt=SALT, compress=True)
+
+
+def decode(user, token):
+    """Return the feed position of a token issued to the user."""
+    if not token:
+        return (0, 0, 0)
+    try:
+        data = signing.loads(
+            token, salt=SALT, max_age=settings.SYNC_TOKEN_MAX_AGE)
+    except signing.SignatureExpired as error:
+        raise TokenExpired('Sync token expired') from error
+    if data['u'] != user.id:
+        raise signing.BadSignature('Sync token belongs to another user')
+    return tuple(data['c'])
+
+
+def _after(cursor, rank):
+    """Return the filter of rows of a source past the cursor."""
+    version, cursor_rank, row_id = cursor
+    if rank > cursor_rank:
+        return Q(version__gte=version)
+    if rank < cursor_rank:
+        return Q(version__gt=version)
+    return Q(version__gt=version) | Q(version=version, id__gt=row_id)
+
+
+def _changes(user, cursor, limit):
+    """Return the next changes of every source merged in feed order."""
+    changes = []
+    for rank, (section, rows, stamp, key) in enumerate(_sources(user)):
+        fields = ['version', 'id', stamp, key]
+        if section is None:
+            fields.append('kind')
+        for row in rows.filter(_after(cursor, rank)).order_by(
+                'version', 'id').values_list(*fields)[:limit + 1]:
+            version, row_id, changed, value = row[:4]
+            removed = section is None
+            changes.append((
+                (version, rank, row_id), changed,
+                SECTIONS[row[4]] if removed else section, value, removed))
+    changes.sort(key=lambda change: change[0])
+    return changes
+
+
+def _recipes(request, ids):
+    """Render recipes the way the recipe endpoints do."""
+    recipes = Recipe.objects.filter(id__in=ids).order_by('version', 'id')
+    if compiled.enabled(RecipeReadSerializer):
+        return compiled.recipes(
+            list(recipes.values(*compiled.RECIPE_COLUMNS)), request)
+    return RecipeReadSerializer(
+        recipes, many=True, context={'request': request}).data
+
+
+def collect(request, token):
+    """Return the changes seen by the user since the token."""
+    user = request.user
+    cursor = decode(user, token)
+    limit = settings.SYNC_LIMIT
+    changes = _changes(user, cursor, limit)
+    batch = changes[:limit]
+    # Versions are taken before commit, so a recent change may still be
+    # preceded by a transaction in flight; the token stops short of it
+    # and such changes are sent again on the next call.
+    settled = timezone.now() - timedelta(seconds=settings.SYNC_SETTLE)
+    next_cursor = cursor
+    for position, changed, *_ in batch:
+        if changed > settled:
+            break
+        next_cursor = position
+    state = {section: {} for section in SECTIONS.values()}
+    for _, _, section, value, removed in batch:
+        state[section][value] = not removed
+    result = {
+        'token': encode(user, next_cursor),
+        'more': len(changes) > limit and next_cursor != cursor,
+        'recipes': _recipes(request, [
+            key for key, present in state['recipes'].items() if present]),
+        'deleted_recipes': [
+            key for key, present in state['recipes'].items()
+            if not present],
+    }
+    for section in ('favorites', 'shopping_cart', 'subscriptions'):
+        result[section] = {
+            'added': [
+                key for key, present in state[section].items() if present],
+            'removed': [
+                key for key, present in state[section].items()
+                if not present],
+        }
+    return result
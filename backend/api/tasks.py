@@ -0,0 +1,40 @@
+"""Tasks.py."""
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from jobs.queue import enqueue_unique, register
+
+from . import documents, shopping_list, snapshots, uploads
+
+User = get_user_model()
+
+
+@register('api.render_shopping_list', queue='reports')
+def render_shopping_list(user_id, filename):
+    """Render the shopping list PDF of a user into the private directory."""
+    shopping_list.save_pdf(User.objects.get(id=user_id), filename)
+
+
+@register('api.prune_shopping_lists')
+def prune_shopping_lists():
+    """Delete expired shopping list PDFs and schedule the next pruning."""
+    enqueue_unique('api.prune_shopping_lists',
+                   delay=settings.SHOPPING_LISTS_EXPIRY)
+    shopping_list.prune()
+
+
+@register('api.rebuild_snapshot')
+def rebuild_snapshot(snapshot):
+    """Regenerate a reference data snapshot."""
+    snapshots.rebuild(snapshot)
+
+
+@register('api.rebuild_documents')
+def rebuild_documents():
+    """Build documents of recipes that lost them."""
+    documents.rebuild_missing()
+
+
+@register('api.prune_uploads')
+def prune_uploads():
+    """Delete abandoned image uploads."""
+    uploads.prune()
@@ -0,0 +1,144 @@
+"""Uploads.py."""
+import os
+from contextlib import contextmanager
+from datetime import timedelta
+from functools import partial
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.move import file_move_safe
+from django.core.files.uploadhandler import (StopUpload,
+                                             TemporaryFileUploadHandler)
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, UnidentifiedImageError
+from recipes.models import ImageUpload
+
+CHUNK_SIZE = 64 * 1024
+
+
+class UploadError(Exception):
+    """Upload data that cannot be accepted."""
+
+
+class InvalidImage(UploadError):
+    """Complete upload that turned out not to be an image."""
+
+
+class LimitedUploadHandler(TemporaryFileUploadHandler):
+    """Stream multipart files to disk until RECIPE_UPLOAD_MAX_SIZE."""
+
+    def __init__(self, *args, **kwargs):
+        """Start counting the bytes of the request's files."""
+        super().__init__(*args, **kwargs)
+        self.total = 0
+        self.exceeded = False
+
+    def receive_data_chunk(self, raw_data, start):
+        """Write a chunk, stopping the upload once the limit is passed."""
+        self.total += len(raw_data)
+        if self.total > settings.RECIPE_UPLOAD_MAX_SIZE:
+            self.exceeded = True
+            raise StopUpload(connection_reset=True)
+        return super().receive_data_chunk(raw_data, start)
+
+
+def path(upload):
+    """Return where the received bytes of an upload are kept."""
+    return os.path.join(settings.UPLOADS_DIR, f'{upload.token.hex}.part')
+
+
+def start(user, filename, size):
+    """Create an empty upload session of the given size."""
+    upload = ImageUpload.objects.create(
+        user=user, filename=os.path.basename(filename), size=size)
+    os.makedirs(settings.UPLOADS_DIR, exist_ok=True)
+    with open(path(upload), 'wb'):
+        pass
+    return upload
+
+
+def verify(upload):
+    """Mark a fully received upload complete if it holds an image."""
+    try:
+        with Image.open(path(upload)) as image:
+            image.verify()
+    except (UnidentifiedImageError, OSError, SyntaxError) as error:
+        discard(upload.pk)
+        raise InvalidImage('Upload is not a valid image') from error
+    upload.complete = True
+    upload.save(update_fields=('complete',))
+
+
+def adopt(user, uploaded):
+    """Take over a file Django already streamed to a temporary file."""
+    if uploaded.size > settings.RECIPE_UPLOAD_MAX_SIZE:
+        raise UploadError('Upload is too large')
+    upload = ImageUpload.objects.create(
+        user=user, filename=os.path.basename(uploaded.name),
+        size=uploaded.size, received=uploaded.size)
+    os.makedirs(settings.UPLOADS_DIR, exist_ok=True)
+    file_move_safe(uploaded.temporary_file_path(), path(upload),
+                   allow_overwrite=True)
+    verify(upload)
+    return upload
+
+
+def append(upload, stream, offset, length):
+    """Write the next part of an upload read from a request stream.
+
+    The upload row stays locked while the part is written, so a
+    concurrent part for the same offset waits and is then refused.
+    """
+    with transaction.atomic():
+        upload = ImageUpload.objects.select_for_update().get(pk=upload.pk)
+        if offset != upload.received:
+            raise UploadError(f'Expected offset {upload.received}')
+        if length > upload.size - offset:
+            raise UploadError('Part goes past the declared size')
+        written = 0
+        with open(path(upload), 'r+b') as f:
+            f.seek(offset)
+            while written < length:
+                chunk = stream.read(min(CHUNK_SIZE, length - written))
+                if not chunk:
+                    break
+                f.write(chunk)
+                written += len(chunk)
+        upload.received = offset + written
+        upload.save(update_fields=('received',))
+    if upload.received == upload.size:
+        verify(upload)
+    return upload
+
+
+def discard(upload_id):
+    """Delete an upload together with its data."""
+    upload = ImageUpload.objects.filter(pk=upload_id).first()
+    if upload is None:
+        return
+    try:
+        os.remove(path(upload))
+    except FileNotFoundError:
+        pass
+    upload.delete()
+
+
+@contextmanager
+def opened(upload):
+    """Open a complete upload as a File and drop it once the data is saved."""
+    if upload is None:
+        yield None
+        return
+    with open(path(upload), 'rb') as f:
+        yield File(f, name=upload.filename)
+    transaction.on_commit(partial(discard, upload.pk))
+
+
+def prune():
+    """Delete uploads that were never finished or used in time."""
+    expired = ImageUpload.objects.filter(
+        created__lt=timezone.now() - timedelta(
+            seconds=settings.UPLOADS_EXPIRY))
+    for upload_id in expired.values_list('pk', flat=True).iterator():
+        discard(upload_id)
@@ -2,7 +2,9 @@
 from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
-from .views import IngredientsViewSet, RecipeViewSet, TagsViewSet
+from .views import (BatchViewSet, EventTicketViewSet, ImageUploadViewSet,
+                    IngredientsViewSet, RecipeViewSet, SyncViewSet,
+                    TagsViewSet)
 
 app_name = 'api'
 
@@ -11,6 +13,11 @@ router = DefaultRouter()
 router.register('recipes', RecipeViewSet)
 router.register('ingredients', IngredientsViewSet)
 router.register('tags', TagsViewSet)
+router.register('uploads', ImageUploadViewSet, basename='uploads')
+router.register('sync', SyncViewSet, basename='sync')
+router.register('batch', BatchViewSet, basename='batch')
+router.register('event-tickets', EventTicketViewSet,
+                basename='event-tickets')
 
 urlpatterns = [
     path('', include(router.urls)),
@@ -1,28 +1,62 @@
 """API views.py."""
-from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import HttpResponse
-from django.shortcuts import get_object_or_404
+import uuid
+from functools import partial
+
+from django.conf import settings
+from django.core import signing
+from django.db import transaction
+from django.http import FileResponse, Http404, HttpResponse
 from django_filters.rest_framework import DjangoFilterBackend
-from recipes.models import (Cart, Favorite, IngredientInRecipe, Ingredients,
-                            Recipe, Tag)
+from jobs.models import Job
+from jobs.queue import enqueue, enqueue_unique
+from recipes import versions
+from recipes.models import (Cart, Favorite, ImageUpload, Ingredients, Recipe,
+                            Tag)
 from rest_framework import status
 from rest_framework.decorators import action
-from rest_framework.permissions import SAFE_METHODS, IsAuthenticated
+from rest_framework.permissions import (SAFE_METHODS, IsAdminUser,
+                                        IsAuthenticated)
 from rest_framework.response import Response
-from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
+from rest_framework.viewsets import (GenericViewSet, ModelViewSet,
+                                     ReadOnlyModelViewSet)
 
+from . import (batch, cached, compiled, documents, ingest, shopping_list,
+               snapshots, streams, sync, uploads, writebehind)
 from .filters import IngredientFilter, RecipeFilter
+from .links import (ADDED, EXISTS, NOT_FOUND, REMOVED, link_recipes,
+                    unlink_recipes)
 from .pagination import CustomPagination
 from .permissions import IsAdminOrReadOnly, IsAuthorOrReadOnly
-from .serializers import (IngredientsSerializer, RecipeReadSerializer,
+from .profiling import ProfiledViewMixin
+from .serializers import (BatchSerializer, CartItemSerializer,
+                          ImageUploadSerializer, IngredientsSerializer,
+                          RecipeIdsSerializer, RecipeReadSerializer,
                           RecipeShortenedSerializer, RecipeWriteSerializer,
                           TagsSerializer)
 
-User = get_user_model()
 
+def to_id(pk):
+    """Convert a lookup value into an integer id or respond with 404."""
+    try:
+        return int(pk)
+    except (TypeError, ValueError):
+        raise Http404
+
+
+class SnapshotListMixin:
+    """Serve the unfiltered list from a pre-rendered snapshot."""
+
+    snapshot_name = None
 
-class IngredientsViewSet(ReadOnlyModelViewSet):
+    def list(self, request, *args, **kwargs):
+        """Return the snapshot unless the list is filtered."""
+        if request.query_params or request.accepted_renderer.format != 'json':
+            return super().list(request, *args, **kwargs)
+        return snapshots.response(request, self.snapshot_name)
+
+
+class IngredientsViewSet(ProfiledViewMixin, SnapshotListMixin,
+                         ReadOnlyModelViewSet):
     """Ingredients ViewSet with read only endpoints."""
 
     queryset = Ingredients.objects.all()
@@ -30,18 +64,21 @@ class IngredientsViewSet(ReadOnlyModelViewSet):
     permission_classes = (IsAdminOrReadOnly,)
     filterset_class = IngredientFilter
     pagination_class = None
+    snapshot_name = 'ingredients'
 
 
-class TagsViewSet(ReadOnlyModelViewSet):
+class TagsViewSet(ProfiledViewMixin, SnapshotListMixin,
+                  ReadOnlyModelViewSet):
     """Tags ViewSet with read only endpoints."""
 
     queryset = Tag.objects.all()
     serializer_class = TagsSerializer
     permission_classes = (IsAdminOrReadOnly,)
     pagination_class = None
+    snapshot_name = 'tags'
 
 
-class RecipeViewSet(ModelViewSet):
+class RecipeViewSet(ProfiledViewMixin, ModelViewSet):
     """Recipe ViewSet with read only endpoints."""
 
     queryset = Recipe.objects.all()
@@ -50,9 +87,64 @@ class RecipeViewSet(ModelViewSet):
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
 
+    settled_actions = (
+        'favorite_bulk', 'shopping_cart_bulk', 'download_shopping_cart')
+    settled_filters = ('is_favorited', 'is_in_shopping_cart')
+
+    def initial(self, request, *args, **kwargs):
+        """Save buffered toggles of the reader before reads needing them."""
+        super().initial(request, *args, **kwargs)
+        if self.action in self.settled_actions or (
+                self.action == 'list'
+                and not set(request.query_params).isdisjoint(
+                    self.settled_filters)):
+            writebehind.settle(request.user)
+
+    def list(self, request, *args, **kwargs):
+        """Render the page from plain rows when the fast path applies."""
+        fields = compiled.recipe_fields(request)
+        if not compiled.enabled(RecipeReadSerializer):
+            return super().list(request, *args, **kwargs)
+        if request.user.is_anonymous and set(request.query_params) <= {
+                'page', 'limit', 'fields', 'omit', 'compact'}:
+            key = 'recipes:list:{}:{}:{}:{}:{}'.format(
+                request.scheme, request.get_host(),
+                request.query_params.get('page', ''),
+                request.query_params.get('limit', ''), ','.join(fields))
+            return Response(cached.fetch(
+                key, partial(self.compiled_page, request, fields),
+                settings.RECIPE_PAGE_CACHE_TTL,
+                version=versions.recipes_version()))
+        return Response(self.compiled_page(request, fields))
+
+    def compiled_page(self, request, fields=compiled.RECIPE_FIELDS):
+        """Return the paginated list data rendered from plain rows."""
+        queryset = self.filter_queryset(self.get_queryset())
+        page = self.paginate_queryset(
+            queryset.values(*compiled.columns(fields)))
+        return self.get_paginated_response(
+            compiled.recipes(page, request, fields)).data
+
+    def retrieve(self, request, *args, **kwargs):
+        """Serve the stored document with the reader's flags."""
+        return Response(documents.read(request, to_id(kwargs['pk'])))
+
+    @transaction.atomic
     def perform_create(self, serializer):
         """Save data submitted by serializer."""
-        serializer.save(author=self.request.user)
+        recipe = serializer.save(author=self.request.user)
+        documents.rebuild([recipe.id])
+        enqueue('recipes.optimize_image', recipe_id=recipe.id)
+
+    @transaction.atomic
+    def perform_update(self, serializer):
+        """Save changes and optimize a new image in the background."""
+        new_image = not serializer.validated_data.keys().isdisjoint(
+            ('image', 'image_upload'))
+        recipe = serializer.save()
+        documents.rebuild([recipe.id])
+        if new_image:
+            enqueue('recipes.optimize_image', recipe_id=recipe.id)
 
     def get_serializer_class(self):
         """Check request method."""
@@ -60,6 +152,41 @@ class RecipeViewSet(ModelViewSet):
             return RecipeReadSerializer
         return RecipeWriteSerializer
 
+    def get_serializer(self, *args, **kwargs):
+        """Limit list documents to the fields the reader asked for."""
+        if self.action == 'list':
+            kwargs.setdefault(
+                'fields', compiled.recipe_fields(self.request))
+        return super().get_serializer(*args, **kwargs)
+
+    @action(
+        detail=False,
+        methods=['POST'],
+        permission_classes=(IsAdminUser,)
+    )
+    def bulk(self, request):
+        """Create many recipes of the current user with a few inserts."""
+        items = request.data
+        if not isinstance(items, list):
+            return Response({'errors': 'Expected a list of recipes'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        if len(items) > settings.RECIPE_INGEST_MAX_ITEMS:
+            return Response(
+                {'errors': f'At most {settings.RECIPE_INGEST_MAX_ITEMS} '
+                           f'recipes per request'},
+                status=status.HTTP_400_BAD_REQUEST)
+        results = ingest.ingest(items, request.user)
+        created = sum('id' in result for result in results)
+        if created == len(results):
+            code = status.HTTP_201_CREATED
+        elif created:
+            code = status.HTTP_207_MULTI_STATUS
+        else:
+            code = status.HTTP_400_BAD_REQUEST
+        return Response({'created': created,
+                         'failed': len(results) - created,
+                         'results': results}, status=code)
+
     @action(
         detail=True,
         methods=['POST', 'DELETE'],
@@ -68,11 +195,7 @@ class RecipeViewSet(ModelViewSet):
     def favorite(self, request, pk):
         """Start custom favorite action."""
         if request.method == 'POST':
-            if not Favorite.objects.filter(
-                user=request.user, recipe__id=pk
-                    ).exists():
-                return self.add_to(Favorite, request.user, pk)
-            return self.delete_from(Favorite, request.user, pk)
+            return self.add_to(Favorite, request.user, pk, toggle=True)
         return self.delete_from(Favorite, request.user, pk)
 
     @action(
@@ -86,50 +209,243 @@ class RecipeViewSet(ModelViewSet):
             return self.add_to(Cart, request.user, pk)
         return self.delete_from(Cart, request.user, pk)
 
-    def add_to(self, model, user, pk):
+    @action(
+        detail=False,
+        methods=['POST', 'DELETE'],
+        url_path='favorite',
+        permission_classes=(IsAuthenticated,)
+    )
+    def favorite_bulk(self, request):
+        """Add or remove many recipes from favorites."""
+        return self.change_many(Favorite, request)
+
+    @action(
+        detail=False,
+        methods=['GET', 'POST', 'DELETE'],
+        url_path='shopping_cart',
+        permission_classes=(IsAuthenticated,)
+    )
+    def shopping_cart_bulk(self, request):
+        """Preview the cart or add and remove many recipes at once."""
+        if request.method == 'GET':
+            serializer = CartItemSerializer(
+                request.user.cart_items.all(), many=True)
+            return Response(serializer.data)
+        return self.change_many(Cart, request)
+
+    def change_many(self, model, request):
+        """Apply a bulk change and report the outcome for every recipe."""
+        serializer = RecipeIdsSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = serializer.validated_data['recipes']
+        if request.method == 'POST':
+            _, statuses = link_recipes(model, request.user, recipe_ids)
+        else:
+            statuses = unlink_recipes(model, request.user, recipe_ids)
+        return Response(
+            {'results': [{'id': recipe_id, 'status': statuses[recipe_id]}
+                         for recipe_id in recipe_ids]},
+            status=status.HTTP_200_OK)
+
+    def add_to(self, model, user, pk, toggle=False):
         """Add object method."""
-        if model.objects.filter(user=user, recipe__id=pk).exists():
+        recipe_id = to_id(pk)
+        if writebehind.enabled():
+            recipe, linked = writebehind.state(model, user, recipe_id)
+            if recipe is None:
+                raise Http404
+            if not linked:
+                writebehind.change(model, user, recipe, True)
+            outcome = EXISTS if linked else ADDED
+        else:
+            recipes, statuses = link_recipes(model, user, [recipe_id])
+            if statuses[recipe_id] == NOT_FOUND:
+                raise Http404
+            recipe, outcome = recipes[recipe_id], statuses[recipe_id]
+        if outcome == EXISTS:
+            if toggle:
+                return self.delete_from(model, user, pk)
             return Response({'errors': 'Рецепт уже добавлен!'},
                             status=status.HTTP_400_BAD_REQUEST)
-        recipe = get_object_or_404(Recipe, id=pk)
-        model.objects.create(user=user, recipe=recipe)
         serializer = RecipeShortenedSerializer(recipe)
         return Response(serializer.data, status=status.HTTP_201_CREATED)
 
     def delete_from(self, model, user, pk):
         """Delete object method."""
-        recipe_query = model.objects.filter(user=user, recipe__id=pk)
-        if recipe_query.exists():
-            recipe_query.delete()
+        recipe_id = to_id(pk)
+        if writebehind.enabled():
+            recipe, linked = writebehind.state(model, user, recipe_id)
+            if linked:
+                writebehind.change(model, user, recipe, False)
+            removed = linked
+        else:
+            removed = unlink_recipes(
+                model, user, [recipe_id])[recipe_id] == REMOVED
+        if removed:
             return Response(status=status.HTTP_204_NO_CONTENT)
         return Response({'error': 'Recipe has already been deleted!'},
                         status=status.HTTP_400_BAD_REQUEST)
 
     @action(detail=False, permission_classes=[IsAuthenticated])
     def download_shopping_cart(self, request):
-        """Download shopping cart as HTML."""
-        user = request.user
-        if not user.shopping_cart.exists():
+        """Download shopping cart as HTML or PDF."""
+        if request.query_params.get('type') == 'pdf':
+            return self.shopping_cart_pdf(request)
+        if not request.user.cart_items.exists():
             return Response(status=status.HTTP_400_BAD_REQUEST)
-        ingredients = IngredientInRecipe.objects.filter(
-            recipe__shopping_cart__user=request.user
-        ).values(
-            'ingredient__name',
-            'ingredient__measurement_unit',
-            'recipe__name'
-        ).annotate(amount=Sum('amount'))
-        ingredients_list = sorted(ingredients, key=lambda x: x['recipe__name'])
-        shopping_list = [
-            f'{ingredient["recipe__name"]}\n'
-            f'<li>{ingredient["ingredient__name"]} '
-            f'({ingredient["ingredient__measurement_unit"]}) '
-            f'- {ingredient["amount"]}</li><br>'
-            for ingredient in ingredients_list
-        ]
-        html = ''.join(shopping_list)
         response = HttpResponse(content_type='text/html')
-        response.write(html)
+        response.write(shopping_list.html(request.user))
         filename = 'shoppinglist.html'
         disposition = f'attachment; filename="{filename}"'
         response['Content-Disposition'] = disposition
         return response
+
+    def shopping_cart_pdf(self, request):
+        """Render the PDF in the background and serve it when ready."""
+        job_id = request.query_params.get('job')
+        if job_id is None:
+            if not request.user.cart_items.exists():
+                return Response(status=status.HTTP_400_BAD_REQUEST)
+            job = enqueue('api.render_shopping_list',
+                          user_id=request.user.id,
+                          filename=f'{uuid.uuid4().hex}.pdf')
+            enqueue_unique('api.prune_shopping_lists',
+                           delay=settings.SHOPPING_LISTS_EXPIRY)
+            return Response({'job': job.id, 'status': job.status},
+                            status=status.HTTP_202_ACCEPTED)
+        job = Job.objects.filter(
+            id=to_id(job_id),
+            name='api.render_shopping_list',
+            payload__user_id=request.user.id,
+        ).first()
+        if job is None:
+            raise Http404
+        if job.status == Job.DONE:
+            try:
+                document = open(
+                    shopping_list.stored(job.payload['filename']), 'rb')
+            except FileNotFoundError:
+                raise Http404
+            return FileResponse(document, as_attachment=True,
+                                filename='shoppinglist.pdf')
+        if job.status == Job.FAILED:
+            return Response({'job': job.id, 'status': job.status},
+                            status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response({'job': job.id, 'status': job.status},
+                        status=status.HTTP_202_ACCEPTED)
+
+
+class ImageUploadViewSet(ProfiledViewMixin, GenericViewSet):
+    """Recipe images sent as multipart files or in resumable parts."""
+
+    serializer_class = ImageUploadSerializer
+    permission_classes = (IsAuthenticated,)
+    lookup_field = 'token'
+
+    def get_queryset(self):
+        """Limit uploads to the current user."""
+        return ImageUpload.objects.filter(user=self.request.user)
+
+    def initialize_request(self, request, *args, **kwargs):
+        """Stream multipart files straight to disk up to the size limit."""
+        self.upload_handler = uploads.LimitedUploadHandler(request)
+        request.upload_handlers = [self.upload_handler]
+        return super().initialize_request(request, *args, **kwargs)
+
+    def create(self, request):
+        """Accept a whole file or open a session for a resumable upload."""
+        enqueue_unique('api.prune_uploads', delay=settings.UPLOADS_EXPIRY)
+        try:
+            files = request.FILES
+            if self.upload_handler.exceeded:
+                raise uploads.UploadError('Upload is too large')
+            if 'file' in files:
+                upload = uploads.adopt(request.user, files['file'])
+            else:
+                serializer = self.get_serializer(data=request.data)
+                serializer.is_valid(raise_exception=True)
+                upload = uploads.start(
+                    request.user,
+                    serializer.validated_data['filename'],
+                    serializer.validated_data['size'],
+                )
+        except uploads.UploadError as error:
+            return Response({'errors': str(error)},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(self.get_serializer(upload).data,
+                        status=status.HTTP_201_CREATED)
+
+    def retrieve(self, request, token):
+        """Report how much of the upload has arrived."""
+        return Response(self.get_serializer(self.get_object()).data)
+
+    def partial_update(self, request, token):
+        """Append the raw request body at the offset given in the header."""
+        upload = self.get_object()
+        try:
+            offset = int(request.headers['Upload-Offset'])
+            length = int(request.headers['Content-Length'])
+        except (KeyError, ValueError):
+            return Response(
+                {'errors': 'Upload-Offset and Content-Length are required'},
+                status=status.HTTP_400_BAD_REQUEST)
+        try:
+            upload = uploads.append(upload, request.stream, offset, length)
+        except uploads.InvalidImage as error:
+            return Response({'errors': str(error)},
+                            status=status.HTTP_400_BAD_REQUEST)
+        except uploads.UploadError as error:
+            return Response({'errors': str(error),
+                             'offset': upload.received},
+                            status=status.HTTP_409_CONFLICT)
+        return Response(self.get_serializer(upload).data)
+
+    def destroy(self, request, token):
+        """Cancel an upload."""
+        uploads.discard(self.get_object().pk)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class SyncViewSet(ProfiledViewMixin, GenericViewSet):
+    """Changes of recipes and of the user's lists since a version token."""
+
+    permission_classes = (IsAuthenticated,)
+
+    def list(self, request):
+        """Return the changes after the token along with a new token."""
+        writebehind.settle(request.user)
+        try:
+            changes = sync.collect(request, request.query_params.get('token'))
+        except sync.TokenExpired as error:
+            return Response({'errors': str(error)},
+                            status=status.HTTP_410_GONE)
+        except (signing.BadSignature, ValueError, TypeError, KeyError):
+            return Response({'errors': 'Invalid sync token'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        return Response(changes)
+
+
+class EventTicketViewSet(GenericViewSet):
+    """Tickets opening the event stream without a token in the URL."""
+
+    permission_classes = (IsAuthenticated,)
+
+    def create(self, request):
+        """Issue a ticket for the current user."""
+        return Response({
+            'ticket': streams.ticket(request.user),
+            'expires_in': settings.PUSH_TICKET_MAX_AGE,
+        }, status=status.HTTP_201_CREATED)
+
+
+class BatchViewSet(GenericViewSet):
+    """Several GET requests answered in one round trip."""
+
+    serializer_class = BatchSerializer
+
+    def create(self, request):
+        """Run the requests with the batch's authentication."""
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response({'responses': batch.run(
+            request, serializer.validated_data['requests'])})
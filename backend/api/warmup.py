@@ -0,0 +1,116 @@
+"""Warmup.py."""
+import logging
+import time
+
+from django.conf import settings
+from django.contrib.auth.models import AnonymousUser
+from django.core.wsgi import get_wsgi_application
+from django.db import close_old_connections, connection
+from django.test import RequestFactory
+from django.urls import get_resolver, resolve, reverse
+from djoser.conf import settings as djoser_settings
+from rest_framework.request import Request
+from rest_framework.settings import IMPORT_STRINGS, api_settings
+
+from . import snapshots
+from .serializers import (CustomUserSerializer, IngredientsSerializer,
+                          RecipeReadSerializer, RecipeShortenedSerializer,
+                          RecipeWriteSerializer, SubscribeSerializer,
+                          TagsSerializer)
+
+logger = logging.getLogger(__name__)
+
+SERIALIZERS = (
+    RecipeReadSerializer,
+    RecipeWriteSerializer,
+    RecipeShortenedSerializer,
+    SubscribeSerializer,
+    CustomUserSerializer,
+    IngredientsSerializer,
+    TagsSerializer,
+)
+
+REQUESTS = ('/api/tags/', '/api/ingredients/')
+
+
+def _host():
+    """Return a host name the project accepts."""
+    for host in settings.ALLOWED_HOSTS:
+        if host != '*':
+            return host.lstrip('.')
+    return 'localhost'
+
+
+def _request(path):
+    """Build an anonymous GET request for the path."""
+    request = RequestFactory(SERVER_NAME=_host()).get(path)
+    request.user = AnonymousUser()
+    return request
+
+
+def resolve_urls():
+    """Populate the URL resolver and its reverse lookup tables."""
+    get_resolver()._populate()
+    reverse('api:recipe-list')
+    resolve('/api/recipes/')
+
+
+def build_serializers():
+    """Construct serializer fields so model metadata caches are filled."""
+    request = Request(_request('/api/recipes/'))
+    for serializer_class in SERIALIZERS:
+        serializer_class(context={'request': request}).fields
+
+
+def load_settings():
+    """Resolve the lazily imported DRF and djoser settings."""
+    for name in IMPORT_STRINGS:
+        getattr(api_settings, name)
+    for group in (djoser_settings.SERIALIZERS, djoser_settings.PERMISSIONS):
+        for name in list(group):
+            getattr(group, name)
+
+
+def connect_database():
+    """Open the first database connection of the process."""
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT 1')
+
+
+def load_snapshots():
+    """Read the reference data snapshots into memory."""
+    for name in snapshots.SOURCES:
+        snapshots.get(name)
+
+
+def serve_requests(application=None):
+    """Pass reference data requests through the full handler once."""
+    application = application or get_wsgi_application()
+    for path in REQUESTS:
+        application.get_response(_request(path))
+
+
+STEPS = (
+    resolve_urls,
+    load_settings,
+    build_serializers,
+    connect_database,
+    load_snapshots,
+)
+
+
+def warm_up(application=None):
+    """Prime per-process state without touching user data."""
+    timings = {}
+    for step in STEPS:
+        started = time.perf_counter()
+        step()
+        timings[step.__name__] = time.perf_counter() - started
+    started = time.perf_counter()
+    serve_requests(application)
+    timings[serve_requests.__name__] = time.perf_counter() - started
+    close_old_connections()
+    logger.info('Warm-up finished in %.3f s: %s', sum(timings.values()),
+                ', '.join(f'{name} {spent * 1000:.1f} ms'
+                          for name, spent in timings.items()))
+    return timings
@@ -0,0 +1,261 @@
+"""Writebehind.py."""
+import atexit
+import logging
+import os
+import threading
+import time
+import uuid
+
+from django.conf import settings
+from django.db import close_old_connections, connection
+from django.db.models import Exists, OuterRef
+from recipes.models import Recipe
+
+from . import links, localcache
+
+logger = logging.getLogger(__name__)
+
+CHANNEL = 'writebehind'
+PENDING = 'pending'
+FLUSHED = 'flushed'
+POLL_INTERVAL = 0.01
+
+_process = uuid.uuid4().hex
+_lock = threading.Lock()
+_flush_lock = threading.Lock()
+_wake = threading.Event()
+_pending = {}
+_flushing = {}
+_owned = set()
+_claims = {}
+_flusher_pid = None
+
+
+class Entry:
+    """Unflushed link state of one recipe of one user."""
+
+    __slots__ = ('user', 'recipe', 'initial', 'linked')
+
+    def __init__(self, user, recipe, initial, linked):
+        """Remember the stored state and the state asked for."""
+        self.user = user
+        self.recipe = recipe
+        self.initial = initial
+        self.linked = linked
+
+
+def enabled():
+    """Tell whether favorite and cart toggles are buffered."""
+    return settings.WRITE_BEHIND
+
+
+def _token():
+    """Return the id of this worker in notifications."""
+    return f'{_process}-{os.getpid()}'
+
+
+def _notify(state, user_id):
+    """Tell the other workers whether the user has unflushed toggles here."""
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        cursor.execute('SELECT pg_notify(%s, %s)',
+                       [CHANNEL, f'{_token()}:{state}:{user_id}'])
+
+
+def _claimed(payload):
+    """Track which users have unflushed toggles in other workers."""
+    token, state, user_id = payload.split(':')
+    if token == _token():
+        return
+    if state == PENDING:
+        _claims[int(user_id)] = (
+            time.monotonic() + settings.WRITE_BEHIND_MAX_WAIT)
+    else:
+        _claims.pop(int(user_id), None)
+
+
+localcache.subscribe(CHANNEL, _claimed)
+
+
+def wait_for_others(user_id):
+    """Wait until other workers have flushed the user's toggles."""
+    deadline = _claims.get(user_id)
+    while deadline is not None and time.monotonic() < deadline:
+        time.sleep(POLL_INTERVAL)
+        deadline = _claims.get(user_id)
+    _claims.pop(user_id, None)
+
+
+def _entry(key, recipe_id):
+    """Return the newest unsaved entry of a recipe, if any."""
+    for entries in (_pending, _flushing):
+        entry = entries.get(key, {}).get(recipe_id)
+        if entry is not None:
+            return entry
+    return None
+
+
+def changes(model, user):
+    """Return the unflushed link states of a user by recipe id."""
+    if not enabled():
+        return {}
+    wait_for_others(user.id)
+    key = (model, user.id)
+    with _lock:
+        result = {
+            recipe_id: entry.linked
+            for recipe_id, entry in _flushing.get(key, {}).items()
+        }
+        result.update(
+            (recipe_id, entry.linked)
+            for recipe_id, entry in _pending.get(key, {}).items())
+    return result
+
+
+def overlay(linked, pending):
+    """Apply unflushed states to a set of linked recipe ids."""
+    if not pending:
+        return linked
+    return {recipe_id for recipe_id in linked
+            if pending.get(recipe_id, True)} | {
+        recipe_id for recipe_id, state in pending.items() if state}
+
+
+def state(model, user, recipe_id):
+    """Return the recipe and whether the user has it linked.
+
+    The recipe is None when it does not exist.
+    """
+    wait_for_others(user.id)
+    with _lock:
+        entry = _entry((model, user.id), recipe_id)
+    if entry is not None:
+        return entry.recipe, entry.linked
+    recipe = Recipe.objects.filter(id=recipe_id).annotate(
+        linked=Exists(model.objects.filter(user=user, recipe=OuterRef('pk')))
+    ).first()
+    if recipe is None:
+        return None, False
+    return recipe, recipe.linked
+
+
+def change(model, user, recipe, linked):
+    """Buffer linking or unlinking a recipe the user has the other way."""
+    key = (model, user.id)
+    with _lock:
+        first = user.id not in _owned
+        _owned.add(user.id)
+        entries = _pending.setdefault(key, {})
+        entry = entries.get(recipe.id)
+        if entry is None:
+            flushing = _flushing.get(key, {}).get(recipe.id)
+            initial = flushing.linked if flushing else not linked
+            entries[recipe.id] = Entry(user, recipe, initial, linked)
+        else:
+            entry.linked = linked
+            if entry.linked == entry.initial:
+                del entries[recipe.id]
+                if not entries:
+                    del _pending[key]
+        total = sum(len(entries) for entries in _pending.values())
+    if first:
+        _notify(PENDING, user.id)
+    _start_flusher()
+    if total >= settings.WRITE_BEHIND_MAX_PENDING:
+        _wake.set()
+
+
+def _restore(key, failed):
+    """Put back entries whose flush failed under any newer toggles."""
+    entries = _pending.setdefault(key, {})
+    for recipe_id, entry in failed.items():
+        newer = entries.get(recipe_id)
+        if newer is None:
+            entries[recipe_id] = entry
+            continue
+        # The newer toggle assumed the failed one was stored.
+        newer.initial = entry.initial
+        if newer.linked == newer.initial:
+            del entries[recipe_id]
+    if not entries:
+        del _pending[key]
+
+
+def flush(user_id=None):
+    """Save the net toggles of one user, or of everyone, in batches.
+
+    Toggles that fail to save stay buffered and are retried by the next
+    flush.
+    """
+    with _flush_lock:
+        with _lock:
+            keys = [key for key in _pending
+                    if user_id is None or key[1] == user_id]
+            for key in keys:
+                _flushing[key] = _pending.pop(key)
+            batch = dict(_flushing)
+        failures = {}
+        for key, entries in batch.items():
+            model = key[0]
+            user = next(iter(entries.values())).user
+            for linked, save in ((True, links.link_recipes),
+                                 (False, links.unlink_recipes)):
+                part = {recipe_id: entry
+                        for recipe_id, entry in entries.items()
+                        if entry.linked == linked}
+                if not part:
+                    continue
+                try:
+                    save(model, user, list(part))
+                except Exception:
+                    logger.exception('Write-behind flush of user %s failed',
+                                     user.id)
+                    failures.setdefault(key, {}).update(part)
+        with _lock:
+            _flushing.clear()
+            for key, failed in failures.items():
+                _restore(key, failed)
+            done = {key[1] for key in batch} - {key[1] for key in _pending}
+            _owned.difference_update(done)
+    for done_id in done:
+        _notify(FLUSHED, done_id)
+
+
+def settle(user):
+    """Save the user's toggles before a read that cannot overlay them."""
+    if not enabled() or not user.is_authenticated:
+        return
+    wait_for_others(user.id)
+    with _lock:
+        owned = user.id in _owned
+    if owned:
+        flush(user.id)
+
+
+def _flush_forever():
+    """Flush buffered toggles every WRITE_BEHIND_DELAY seconds."""
+    while True:
+        _wake.wait(settings.WRITE_BEHIND_DELAY)
+        _wake.clear()
+        try:
+            flush()
+        except Exception:
+            logger.exception('Write-behind flush failed')
+        finally:
+            close_old_connections()
+
+
+def _start_flusher():
+    """Start the flusher and the exit flush once in every worker process."""
+    global _flusher_pid
+    if _flusher_pid == os.getpid():
+        return
+    with _lock:
+        if _flusher_pid == os.getpid():
+            return
+        _flusher_pid = os.getpid()
+    atexit.register(flush)
+    threading.Thread(
+        target=_flush_forever, name='write-behind-flusher',
+        daemon=True).start()
@@ -18,6 +18,7 @@ INSTALLED_APPS = [
     'api.apps.ApiConfig',
     'recipes.apps.RecipesConfig',
     'users.apps.UsersConfig',
+    'jobs.apps.JobsConfig',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -73,6 +74,27 @@ DATABASES = {
     }
 }
 
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'foodgram',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 10000,
+        },
+    },
+}
+
+CACHE_LOCK_TIMEOUT = 10
+CACHE_STALE_TTL = 60
+CACHE_EARLY_BETA = 1.0
+CACHE_NEGATIVE_TTL = 30
+
+LOCAL_CACHES = {
+    'tokens': {'MAX_SIZE': 10000, 'TTL': 60 * 5},
+    'follows': {'MAX_SIZE': 10000, 'TTL': 60 * 5},
+}
+
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -101,7 +123,7 @@ REST_FRAMEWORK = {
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'users.caches.CachedTokenAuthentication',
     ],
     'DEFAULT_PAGINATION_CLASS': 'rest_framework.pagination.'
                                 'LimitOffsetPagination',
@@ -109,6 +131,15 @@ REST_FRAMEWORK = {
     'DEFAULT_FILTER_BACKENDS': [
         'django_filters.rest_framework.DjangoFilterBackend',
     ],
+    'DEFAULT_RENDERER_CLASSES': [
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+    'DEFAULT_PARSER_CLASSES': [
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ],
     'SEARCH_PARAM': 'name'
 }
 
@@ -154,3 +185,72 @@ EMAIL_FILE_PATH = os.path.join(BASE_DIR, 'sent_emails')
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+
+FAST_SERIALIZERS = True
+
+SNAPSHOTS_DIR = os.path.join(BASE_DIR, 'snapshots')
+SNAPSHOTS_MAX_AGE = 60 * 60 * 24
+
+JOBS_QUEUES = {
+    'default': 4,
+    'images': 2,
+    'reports': 2,
+}
+JOBS_TIMEOUT = 60 * 10
+JOBS_RETRY_DELAY = 10
+JOBS_RETRY_MAX_DELAY = 60 * 60
+
+ADMIN_COUNT_ESTIMATE_THRESHOLD = 100000
+
+INGREDIENT_SEARCH_LIMIT = 50
+INGREDIENT_SEARCH_THRESHOLD = 0.4
+
+FOLLOW_SUGGESTIONS_LIMIT = 20
+FOLLOW_SUGGESTIONS_INTERVAL = 60 * 60 * 6
+
+RECIPE_IMAGE_MAX_SIZE = 1280
+RECIPE_UPLOAD_MAX_SIZE = 20 * 1024 * 1024
+RECIPE_INGEST_MAX_ITEMS = 1000
+RECIPE_PAGE_CACHE_TTL = 60
+UPLOADS_DIR = os.path.join(BASE_DIR, 'uploads')
+UPLOADS_EXPIRY = 60 * 60 * 24
+RECIPE_SCORES_INTERVAL = 60 * 15
+RECIPE_TRENDING_HALF_LIFE = 60 * 60 * 24 * 2
+RECIPE_TRENDING_WINDOW = 60 * 60 * 24 * 14
+
+STATS_REFRESH_INTERVAL = 60 * 60
+STATS_TOP_LIMIT = 20
+
+OUTBOX_BATCH_SIZE = 500
+OUTBOX_SETTLE = 60
+OUTBOX_RETENTION = 60 * 60 * 24 * 7
+OUTBOX_PRUNE_INTERVAL = 60 * 60
+
+SYNC_LIMIT = 200
+SYNC_SETTLE = 60
+SYNC_TOKEN_MAX_AGE = 60 * 60 * 24 * 30
+SYNC_PRUNE_INTERVAL = 60 * 60 * 24
+BATCH_MAX_REQUESTS = 10
+BATCH_TIMEOUT = 5
+
+WRITE_BEHIND = False
+WRITE_BEHIND_DELAY = 0.5
+WRITE_BEHIND_MAX_PENDING = 1000
+WRITE_BEHIND_MAX_WAIT = 2
+
+PUSH_PATH = '/api/events/'
+PUSH_HEARTBEAT = 25
+PUSH_QUEUE_SIZE = 100
+PUSH_RETRY = 5000
+PUSH_TICKET_MAX_AGE = 60
+
+PROFILE_HEADER = 'HTTP_X_PROFILE'
+PROFILE_QUERY_PARAM = 'profile'
+PROFILE_SAMPLE_RATE = 0
+PROFILE_INTERVAL = 0.001
+PROFILES_DIR = os.path.join(BASE_DIR, 'profiles')
+PROFILES_KEEP = 200
+
+SHOPPING_LISTS_DIR = os.path.join(BASE_DIR, 'shopping_lists')
+SHOPPING_LISTS_EXPIRY = 60 * 60
+SHOPPING_LIST_FONT = '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
@@ -0,0 +1,25 @@
+"""Gunicorn.conf.py."""
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+def post_worker_init(worker):
+    """Warm a freshly forked worker up before it accepts connections."""
+    if not hasattr(worker.wsgi, 'get_response'):
+        # ASGI workers serve the event stream, which needs no warm-up.
+        return
+    from api.warmup import warm_up
+    try:
+        warm_up(worker.wsgi)
+    except Exception:
+        logger.exception('Worker warm-up failed')
+
+
+def worker_exit(server, worker):
+    """Save buffered favorite and cart toggles before the worker exits."""
+    from api import writebehind
+    try:
+        writebehind.flush()
+    except Exception:
+        logger.exception('Write-behind flush on exit failed')
@@ -0,0 +1,43 @@
+"""Jobs admin."""
+from django.contrib import admin
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+from recipes.paginators import LargeTableAdmin
+
+from .models import Job
+
+
+@admin.register(Job)
+class JobAdmin(LargeTableAdmin, admin.ModelAdmin):
+    """Job status inspection in admin."""
+
+    list_display = (
+        'id',
+        'name',
+        'queue',
+        'status',
+        'attempts',
+        'run_at',
+        'locked_by',
+        'finished_at',
+    )
+    list_filter = ('status', 'queue')
+    search_fields = ('name',)
+    readonly_fields = (
+        'name',
+        'queue',
+        'payload',
+        'attempts',
+        'locked_by',
+        'locked_at',
+        'finished_at',
+        'last_error',
+        'created',
+    )
+    actions = ('retry',)
+
+    @admin.action(description=_('Retry selected jobs'))
+    def retry(self, request, queryset):
+        """Put failed or finished jobs back into their queue."""
+        queryset.exclude(status=Job.RUNNING).update(
+            status=Job.PENDING, attempts=0, run_at=timezone.now())
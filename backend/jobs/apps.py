@@ -0,0 +1,15 @@
+"""Apps.py."""
+from django.apps import AppConfig
+from django.utils.module_loading import autodiscover_modules
+from django.utils.translation import gettext_lazy as _
+
+
+class JobsConfig(AppConfig):
+    """Background jobs app activation."""
+
+    name = 'jobs'
+    verbose_name = _('Jobs')
+
+    def ready(self):
+        """Register job handlers declared in the tasks modules."""
+        autodiscover_modules('tasks')
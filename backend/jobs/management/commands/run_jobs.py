@@ -0,0 +1,80 @@
+"""Run_jobs.py."""
+import os
+import signal
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.management import BaseCommand
+from django.db import close_old_connections, connection
+from jobs import queue
+
+
+class Command(BaseCommand):
+    """Background job worker."""
+
+    help = 'Run background jobs'
+
+    def add_arguments(self, parser):
+        """Add command arguments."""
+        parser.add_argument(
+            '--queue', action='append', dest='queues',
+            help='Queue to serve, may be repeated; all configured by default')
+        parser.add_argument('--threads', type=int, default=4)
+        parser.add_argument('--poll', type=float, default=1.0)
+        parser.add_argument(
+            '--once', action='store_true',
+            help='Exit as soon as no job is due')
+
+    def run(self, job):
+        """Execute a job in a pool thread."""
+        close_old_connections()
+        try:
+            queue.execute(job)
+        finally:
+            with self.lock:
+                self.busy -= 1
+            connection.close()
+
+    def stop(self, *args):
+        """Finish running jobs and exit."""
+        self.stopping.set()
+
+    def handle(self, *args, **options):
+        """Claim due jobs and run them until stopped."""
+        queues = options['queues'] or list(settings.JOBS_QUEUES)
+        threads = options['threads']
+        worker = f'{socket.gethostname()}:{os.getpid()}'
+        self.lock = threading.Lock()
+        self.busy = 0
+        self.stopping = threading.Event()
+        signal.signal(signal.SIGTERM, self.stop)
+        signal.signal(signal.SIGINT, self.stop)
+        self.stdout.write(f'Worker {worker} serving {", ".join(queues)}')
+        swept = 0
+        with ThreadPoolExecutor(max_workers=threads) as pool:
+            while not self.stopping.is_set():
+                if time.monotonic() - swept > settings.JOBS_TIMEOUT / 2:
+                    queue.requeue_stale()
+                    swept = time.monotonic()
+                claimed = 0
+                for name in queues:
+                    with self.lock:
+                        free = threads - self.busy
+                    if free <= 0:
+                        break
+                    for job in queue.claim(name, worker, free):
+                        with self.lock:
+                            self.busy += 1
+                        pool.submit(self.run, job)
+                        claimed += 1
+                if claimed:
+                    continue
+                with self.lock:
+                    idle = self.busy == 0
+                if options['once'] and idle:
+                    break
+                self.stopping.wait(options['poll'])
+        self.stdout.write(f'Worker {worker} stopped')
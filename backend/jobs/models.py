@@ -0,0 +1,89 @@
+"""Jobs models."""
+from django.db import models
+from django.utils import timezone
+from django.utils.translation import gettext_lazy as _
+
+
+class Job(models.Model):
+    """Unit of background work stored in the database."""
+
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUSES = (
+        (PENDING, _('Pending')),
+        (RUNNING, _('Running')),
+        (DONE, _('Done')),
+        (FAILED, _('Failed')),
+    )
+
+    name = models.CharField(
+        max_length=100,
+        verbose_name=_('Name'),
+    )
+    queue = models.CharField(
+        max_length=50,
+        verbose_name=_('Queue'),
+    )
+    payload = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name=_('Payload'),
+    )
+    status = models.CharField(
+        max_length=10,
+        choices=STATUSES,
+        default=PENDING,
+        verbose_name=_('Status'),
+    )
+    attempts = models.PositiveSmallIntegerField(
+        default=0,
+        verbose_name=_('Attempts'),
+    )
+    max_attempts = models.PositiveSmallIntegerField(
+        default=5,
+        verbose_name=_('Max attempts'),
+    )
+    run_at = models.DateTimeField(
+        default=timezone.now,
+        verbose_name=_('Run at'),
+    )
+    locked_by = models.CharField(
+        max_length=100,
+        blank=True,
+        verbose_name=_('Worker'),
+    )
+    locked_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_('Started'),
+    )
+    finished_at = models.DateTimeField(
+        null=True,
+        blank=True,
+        verbose_name=_('Finished'),
+    )
+    last_error = models.TextField(
+        blank=True,
+        verbose_name=_('Last error'),
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name=_('Created'),
+    )
+
+    class Meta:
+        """Job Meta."""
+
+        ordering = ('-id',)
+        verbose_name = _('Job')
+        verbose_name_plural = _('Jobs')
+        indexes = (
+            models.Index(fields=('queue', 'status', 'run_at'),
+                         name='job_claim_idx'),
+        )
+
+    def __str__(self):
+        """Str."""
+        return f'{self.name} #{self.pk} ({self.status})'
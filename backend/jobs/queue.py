@@ -0,0 +1,149 @@
+"""Queue.py."""
+import logging
+import random
+import traceback
+import zlib
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUEUE = 'default'
+
+_handlers = {}
+
+
+class Handler:
+    """Registered job function with its queue and retry policy."""
+
+    def __init__(self, func, name, queue, max_attempts):
+        """Init."""
+        self.func = func
+        self.name = name
+        self.queue = queue
+        self.max_attempts = max_attempts
+
+
+def register(name, queue=DEFAULT_QUEUE, max_attempts=5):
+    """Register a function as a job handler under the given name."""
+    def decorator(func):
+        _handlers[name] = Handler(func, name, queue, max_attempts)
+        return func
+    return decorator
+
+
+def enqueue(name, delay=0, **payload):
+    """Store a job in the current transaction and return it."""
+    handler = _handlers[name]
+    return Job.objects.create(
+        name=name,
+        queue=handler.queue,
+        payload=payload,
+        max_attempts=handler.max_attempts,
+        run_at=timezone.now() + timedelta(seconds=delay),
+    )
+
+
+def enqueue_many(name, payloads):
+    """Store one job per payload with a single insert."""
+    handler = _handlers[name]
+    now = timezone.now()
+    return Job.objects.bulk_create([
+        Job(name=name, queue=handler.queue, payload=payload,
+            max_attempts=handler.max_attempts, run_at=now)
+        for payload in payloads
+    ])
+
+
+def enqueue_unique(name, delay=0, **payload):
+    """Enqueue a job unless one with the same name is already pending."""
+    if Job.objects.filter(name=name, status=Job.PENDING).exists():
+        return None
+    return enqueue(name, delay=delay, **payload)
+
+
+def queue_limit(queue):
+    """Return how many jobs of the queue may run at once across workers."""
+    return settings.JOBS_QUEUES.get(queue, 1)
+
+
+def backoff(attempts):
+    """Return the delay before the next attempt with a little jitter."""
+    delay = min(settings.JOBS_RETRY_DELAY * 2 ** (attempts - 1),
+                settings.JOBS_RETRY_MAX_DELAY)
+    return timedelta(seconds=delay * random.uniform(0.8, 1.2))
+
+
+def _lock_queue(queue):
+    """Serialize claims on one queue so its limit is respected."""
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute('SELECT pg_advisory_xact_lock(%s)',
+                           [zlib.crc32(f'jobs:{queue}'.encode())])
+
+
+@transaction.atomic
+def claim(queue, worker, limit):
+    """Lock up to limit due jobs of a queue for the worker."""
+    _lock_queue(queue)
+    running = Job.objects.filter(queue=queue, status=Job.RUNNING).count()
+    limit = min(limit, queue_limit(queue) - running)
+    if limit <= 0:
+        return []
+    now = timezone.now()
+    jobs = list(
+        Job.objects.select_for_update(skip_locked=True).filter(
+            queue=queue, status=Job.PENDING, run_at__lte=now,
+        ).order_by('run_at', 'id')[:limit]
+    )
+    Job.objects.filter(pk__in=[job.pk for job in jobs]).update(
+        status=Job.RUNNING,
+        locked_by=worker,
+        locked_at=now,
+        attempts=F('attempts') + 1,
+    )
+    for job in jobs:
+        job.status = Job.RUNNING
+        job.locked_by = worker
+        job.locked_at = now
+        job.attempts += 1
+    return jobs
+
+
+def execute(job):
+    """Run a claimed job and record its outcome."""
+    try:
+        _handlers[job.name].func(**job.payload)
+    except Exception:
+        logger.exception('Job %s failed', job)
+        job.last_error = traceback.format_exc()
+        if job.attempts >= job.max_attempts:
+            job.status = Job.FAILED
+            job.finished_at = timezone.now()
+        else:
+            job.status = Job.PENDING
+            job.run_at = timezone.now() + backoff(job.attempts)
+    else:
+        job.status = Job.DONE
+        job.finished_at = timezone.now()
+    job.save(update_fields=(
+        'status', 'run_at', 'finished_at', 'last_error'))
+
+
+def requeue_stale():
+    """Return jobs of crashed workers to the queue as failed attempts."""
+    now = timezone.now()
+    stale = Job.objects.filter(
+        status=Job.RUNNING,
+        locked_at__lt=now - timedelta(seconds=settings.JOBS_TIMEOUT),
+    )
+    stale.filter(attempts__gte=F('max_attempts')).update(
+        status=Job.FAILED, finished_at=now, last_error='Worker timed out')
+    return stale.update(
+        status=Job.PENDING, run_at=now, last_error='Worker timed out')
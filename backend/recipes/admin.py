@@ -1,16 +1,28 @@
 """Admin.py."""
+import os
+
+from api import profiling
+from django.conf import settings
 from django.contrib import admin
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse, Http404
+from django.shortcuts import get_object_or_404
+from django.template.response import TemplateResponse
+from django.urls import path, reverse
+from django.utils.html import format_html
 from django.utils.translation import gettext_lazy as _
 
-from .models import (Cart, Favorite, IngredientInRecipe, Ingredients, Recipe,
-                     Tag)
+from . import shopping, statistics
+from .models import (Cart, CartItem, Favorite, IngredientInRecipe, Ingredients,
+                     Recipe, RequestProfile, Statistics, Tag)
+from .paginators import LargeTableAdmin
 
 
 class IngredientsAdmin(admin.ModelAdmin):
     """Ingredients model in admin."""
 
     list_display = ('name', 'measurement_unit',)
-    search_fields = ('name',)
+    search_fields = ('^name',)
     empty_value_display = _('-empty-')
 
 
@@ -24,43 +36,179 @@ class TagsAdmin(admin.ModelAdmin):
     empty_value_display = _('-empty-')
 
 
-class RecipeAdmin(admin.ModelAdmin):
+class RecipeAdmin(LargeTableAdmin, admin.ModelAdmin):
     """Recipe model in admin."""
 
     list_display = (
         'name',
-        'text',
         'author',
         'cooking_time',
         'image',
     )
-    list_editable = ('text', 'author', 'cooking_time', 'image',)
-    search_fields = ('name', 'text', 'author',)
-    list_filter = ('name', 'author', 'tags',)
+    list_editable = ('cooking_time',)
+    list_select_related = ('author',)
+    search_fields = ('^name', '^author__username', '^author__email',)
+    list_filter = ('tags',)
+    autocomplete_fields = ('author', 'tags',)
     empty_value_display = _('-empty-')
 
 
-class CartAdmin(admin.ModelAdmin):
+class CartAdmin(LargeTableAdmin, admin.ModelAdmin):
     """Cart model in Admin."""
 
     list_display = ('user', 'recipe',)
+    list_select_related = ('user', 'recipe',)
+    search_fields = ('^user__username', '^recipe__name',)
+    autocomplete_fields = ('user', 'recipe',)
+
+
+class CartItemAdmin(LargeTableAdmin, admin.ModelAdmin):
+    """Shopping cart summary in admin."""
 
+    list_display = ('user', 'name', 'measurement_unit', 'amount',)
+    list_select_related = ('user',)
+    search_fields = ('^user__username', '^name',)
+    autocomplete_fields = ('user',)
 
-class FavoriteAdmin(admin.ModelAdmin):
+
+class FavoriteAdmin(LargeTableAdmin, admin.ModelAdmin):
     """Favorite model in admin."""
 
     list_display = ('user', 'recipe',)
+    list_select_related = ('user', 'recipe',)
+    search_fields = ('^user__username', '^recipe__name',)
+    autocomplete_fields = ('user', 'recipe',)
 
 
-class IngredientInRecipeAdmin(admin.ModelAdmin):
+class IngredientInRecipeAdmin(LargeTableAdmin, admin.ModelAdmin):
     """IngredientInRecipe model in admin."""
 
     list_display = ('recipe', 'ingredient', 'amount',)
+    list_select_related = ('recipe', 'ingredient',)
+    search_fields = ('^recipe__name', '^ingredient__name',)
+    autocomplete_fields = ('recipe', 'ingredient',)
+
+    def save_model(self, request, obj, form, change):
+        """Save the row and update the carts of its old and new recipe."""
+        recipe_ids = {obj.recipe_id}
+        if change:
+            recipe_ids.update(IngredientInRecipe.objects.filter(
+                pk=obj.pk).values_list('recipe_id', flat=True))
+        with shopping.tracking(recipe_ids):
+            super().save_model(request, obj, form, change)
+
+    def delete_model(self, request, obj):
+        """Delete the row and update the carts holding its recipe."""
+        with shopping.tracking([obj.recipe_id]):
+            super().delete_model(request, obj)
+
+    def delete_queryset(self, request, queryset):
+        """Delete the rows and update the carts holding their recipes."""
+        with shopping.tracking(
+                queryset.values_list('recipe_id', flat=True)):
+            super().delete_queryset(request, queryset)
+
+
+class StatisticsAdmin(admin.ModelAdmin):
+    """Read-only dashboard over the statistics materialized views."""
+
+    def has_add_permission(self, request):
+        """Statistics are computed, never entered."""
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        """Statistics are computed, never edited."""
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        """Statistics are computed, never deleted."""
+        return False
+
+    def changelist_view(self, request, extra_context=None):
+        """Render the dashboard from the materialized views only."""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        context = {
+            **self.admin_site.each_context(request),
+            'opts': self.model._meta,
+            'title': _('Statistics'),
+            'available': statistics.available(),
+        }
+        if context['available']:
+            context.update(statistics.report(settings.STATS_TOP_LIMIT))
+        context.update(extra_context or {})
+        return TemplateResponse(
+            request, 'admin/recipes/statistics.html', context)
+
+
+class RequestProfileAdmin(admin.ModelAdmin):
+    """Profiled API requests with their flamegraph and query files."""
+
+    list_display = (
+        'created',
+        'method',
+        'path',
+        'status',
+        'duration',
+        'queries',
+        'query_time',
+        'user',
+        'reason',
+        'files',
+    )
+    list_filter = ('reason', 'method', 'status')
+    list_select_related = ('user',)
+    search_fields = ('path',)
+    readonly_fields = list_display
+
+    def has_add_permission(self, request):
+        """Profiles are recorded by requests, never entered."""
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        """Profiles are recorded by requests, never edited."""
+        return False
+
+    @admin.display(description=_('Files'))
+    def files(self, obj):
+        """Link the flamegraph stacks and the query log."""
+        return format_html(
+            '<a href="{}">{}</a> / <a href="{}">{}</a>',
+            reverse('admin:recipes_requestprofile_file',
+                    args=(obj.pk, profiling.FOLDED)), _('flamegraph'),
+            reverse('admin:recipes_requestprofile_file',
+                    args=(obj.pk, profiling.QUERIES)), _('queries'))
+
+    def get_urls(self):
+        """Add the download of profile files."""
+        return [
+            path('<int:pk>/file/<str:kind>/',
+                 self.admin_site.admin_view(self.file_view),
+                 name='recipes_requestprofile_file'),
+            *super().get_urls(),
+        ]
+
+    def file_view(self, request, pk, kind):
+        """Send one file of a profile."""
+        if not self.has_view_permission(request):
+            raise PermissionDenied
+        if kind not in (profiling.FOLDED, profiling.QUERIES):
+            raise Http404
+        profile = get_object_or_404(RequestProfile, pk=pk)
+        filename = profiling.path(profile.token, kind)
+        if not os.path.exists(filename):
+            raise Http404
+        return FileResponse(
+            open(filename, 'rb'), as_attachment=True,
+            filename=os.path.basename(filename))
 
 
 admin.site.register(Ingredients, IngredientsAdmin)
 admin.site.register(Tag, TagsAdmin)
 admin.site.register(Recipe, RecipeAdmin)
 admin.site.register(Cart, CartAdmin)
+admin.site.register(CartItem, CartItemAdmin)
 admin.site.register(Favorite, FavoriteAdmin)
 admin.site.register(IngredientInRecipe, IngredientInRecipeAdmin)
+admin.site.register(Statistics, StatisticsAdmin)
+admin.site.register(RequestProfile, RequestProfileAdmin)
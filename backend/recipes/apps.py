@@ -1,5 +1,6 @@
 """Apps.py."""
 from django.apps import AppConfig
+from django.db.models.signals import post_migrate
 
 
 class RecipesConfig(AppConfig):
@@ -7,3 +8,9 @@ class RecipesConfig(AppConfig):
 
     name = 'recipes'
     verbose_name = 'Recipes App'
+
+    def ready(self):
+        """Connect signal receivers."""
+        from . import signals  # noqa: F401
+        from .sql import create_postgres_objects
+        post_migrate.connect(create_postgres_objects, sender=self)
@@ -0,0 +1,198 @@
+"""Dataset.py."""
+import json
+import os
+from contextlib import contextmanager
+
+import orjson
+from django.contrib.auth import get_user_model
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from users.models import Follow
+
+from . import versions
+from .models import (Cart, Favorite, IngredientInRecipe, Ingredients, Recipe,
+                     Tag)
+
+User = get_user_model()
+
+MANIFEST = 'manifest.json'
+RESTORE_STATE = 'restore.json'
+CHUNK_SIZE = 10000
+BATCH_SIZE = 1000
+
+
+def exported_models():
+    """Return the exported models, parents before their children."""
+    return (
+        User, Tag, Ingredients, Recipe, Recipe.tags.through,
+        IngredientInRecipe, Follow, Favorite, Cart,
+    )
+
+
+def label(model):
+    """Return the name a model is stored under."""
+    return model._meta.label_lower
+
+
+def columns(model):
+    """Return the stored column names of a model."""
+    return [field.attname for field in model._meta.concrete_fields]
+
+
+def read_json(path, default=None):
+    """Load a JSON state file, returning default when it does not exist."""
+    try:
+        with open(path, 'rb') as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return default
+
+
+def write_json(path, data):
+    """Replace a JSON state file atomically."""
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(data, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def chunk_name(model, index):
+    """Return the file name of one chunk of a model."""
+    return f'{label(model)}.{index:06d}.ndjson'
+
+
+def start_export(directory):
+    """Load the manifest of an export or start a new one."""
+    manifest = read_json(os.path.join(directory, MANIFEST))
+    if manifest is not None:
+        return manifest
+    manifest = {'chunk_size': CHUNK_SIZE, 'models': {}}
+    for model in exported_models():
+        high_water = model.objects.order_by('-pk').values_list(
+            'pk', flat=True).first()
+        manifest['models'][label(model)] = {
+            'columns': columns(model),
+            'high_water': high_water or 0,
+            'last_pk': 0,
+            'chunks': [],
+            'rows': 0,
+        }
+    write_json(os.path.join(directory, MANIFEST), manifest)
+    return manifest
+
+
+def export_chunk(directory, manifest, model):
+    """Write the next chunk of a model and return its row count."""
+    state = manifest['models'][label(model)]
+    queryset = model.objects.filter(
+        pk__gt=state['last_pk'], pk__lte=state['high_water'],
+    ).order_by('pk').values_list(*state['columns'])
+    name = chunk_name(model, len(state['chunks']))
+    path = os.path.join(directory, name)
+    rows = 0
+    last_pk = state['last_pk']
+    with open(f'{path}.tmp', 'wb') as f:
+        for row in queryset[:manifest['chunk_size']].iterator(
+                chunk_size=BATCH_SIZE):
+            f.write(orjson.dumps(row, option=orjson.OPT_APPEND_NEWLINE))
+            last_pk = row[0]
+            rows += 1
+    if not rows:
+        os.remove(f'{path}.tmp')
+        return 0
+    os.replace(f'{path}.tmp', path)
+    state['chunks'].append(name)
+    state['last_pk'] = last_pk
+    state['rows'] += rows
+    write_json(os.path.join(directory, MANIFEST), manifest)
+    return rows
+
+
+def export(directory, log=None):
+    """Stream every model into chunk files, continuing a previous run."""
+    os.makedirs(directory, exist_ok=True)
+    manifest = start_export(directory)
+    for model in exported_models():
+        while export_chunk(directory, manifest, model):
+            if log:
+                state = manifest['models'][label(model)]
+                log(f'{label(model)}: {state["rows"]} rows')
+    return manifest
+
+
+def read_rows(path, model, names):
+    """Yield model instances stored in a chunk file."""
+    fields = [model._meta.get_field(name) for name in names]
+    with open(path, 'rb') as f:
+        for line in f:
+            values = orjson.loads(line)
+            yield model(**{
+                field.attname: field.to_python(value)
+                for field, value in zip(fields, values)
+            })
+
+
+@contextmanager
+def stored_timestamps(model, names):
+    """Insert the stored auto_now and auto_now_add values as they are.
+
+    bulk_create would replace them with the time of the restore. The
+    flags are switched off only while the single-threaded restore runs.
+    """
+    fields = [
+        (field, field.auto_now, field.auto_now_add)
+        for field in model._meta.concrete_fields
+        if field.attname in names and (
+            getattr(field, 'auto_now', False)
+            or getattr(field, 'auto_now_add', False))
+    ]
+    for field, _, _ in fields:
+        field.auto_now = field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, auto_now, auto_now_add in fields:
+            field.auto_now = auto_now
+            field.auto_now_add = auto_now_add
+
+
+def restore_chunk(path, model, names):
+    """Insert one chunk keeping the stored primary keys and timestamps."""
+    batch = []
+    with transaction.atomic(), stored_timestamps(model, names):
+        for instance in read_rows(path, model, names):
+            batch.append(instance)
+            if len(batch) == BATCH_SIZE:
+                model.objects.bulk_create(batch, ignore_conflicts=True)
+                batch = []
+        model.objects.bulk_create(batch, ignore_conflicts=True)
+
+
+def reset_sequences():
+    """Move the primary key and version sequences past the restored rows."""
+    statements = connection.ops.sequence_reset_sql(
+        no_style(), exported_models())
+    with connection.cursor() as cursor:
+        for sql in statements:
+            cursor.execute(sql)
+    versions.reset()
+
+
+def restore(directory, log=None):
+    """Load an export chunk by chunk, skipping chunks already restored."""
+    manifest = read_json(os.path.join(directory, MANIFEST))
+    state_path = os.path.join(directory, RESTORE_STATE)
+    done = set(read_json(state_path, []))
+    for model in exported_models():
+        state = manifest['models'][label(model)]
+        for name in state['chunks']:
+            if name in done:
+                continue
+            restore_chunk(
+                os.path.join(directory, name), model, state['columns'])
+            done.add(name)
+            write_json(state_path, sorted(done))
+            if log:
+                log(f'{name} restored')
+    reset_sequences()
+    return manifest
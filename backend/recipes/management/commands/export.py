@@ -0,0 +1,20 @@
+"""Export.py."""
+from django.core.management import BaseCommand
+from recipes import dataset
+
+
+class Command(BaseCommand):
+    """Stream the recipe dataset into NDJSON chunk files."""
+
+    help = ('Export users, recipes and their relations as NDJSON chunks; '
+            'rerun with the same directory to resume')
+
+    def add_arguments(self, parser):
+        """Add command arguments."""
+        parser.add_argument('directory')
+
+    def handle(self, *args, **options):
+        """Export the dataset into the directory."""
+        manifest = dataset.export(options['directory'], log=self.stdout.write)
+        total = sum(state['rows'] for state in manifest['models'].values())
+        self.stdout.write(self.style.SUCCESS(f'Exported {total} rows'))
@@ -1,11 +1,13 @@
 """Import.py."""
 import csv
 
+from api import snapshots
 from django.core.management import BaseCommand
+from django.db import transaction
 from recipes.models import Ingredients
 
 SOURCES = {
-    Ingredients: 'ingredients.csv',
+    Ingredients: ('ingredients.csv', 'ingredients'),
 }
 
 
@@ -16,12 +18,15 @@ class Command(BaseCommand):
 
     def handle(self, *args, **options):
         """Import CSVs when the command is entered."""
-        for model, source in SOURCES.items():
+        for model, (source, snapshot) in SOURCES.items():
             with open(
                 f'/app/static/data/{source}',
                     encoding='utf-8') as f:
                 """Reading object as a dictionary."""
                 reader = csv.DictReader(f)
-                model.objects.bulk_create(
-                    model.create(**data) for data in reader
-                    )
+                with transaction.atomic():
+                    model.objects.bulk_create(
+                        (model(**data) for data in reader),
+                        ignore_conflicts=True,
+                        )
+            snapshots.rebuild(snapshot)
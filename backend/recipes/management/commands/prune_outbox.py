@@ -0,0 +1,24 @@
+"""Prune_outbox.py."""
+from django.core.management import BaseCommand
+from jobs.queue import enqueue_unique
+from recipes import outbox
+
+
+class Command(BaseCommand):
+    """Delete outbox events past their retention."""
+
+    help = 'Prune the recipe outbox'
+
+    def add_arguments(self, parser):
+        """Add command arguments."""
+        parser.add_argument(
+            '--schedule', action='store_true',
+            help='Also start the periodic pruning job')
+
+    def handle(self, *args, **options):
+        """Prune now and optionally keep pruning."""
+        deleted = outbox.prune()
+        if options['schedule']:
+            enqueue_unique('recipes.prune_outbox')
+        self.stdout.write(self.style.SUCCESS(
+            f'{deleted} outbox events pruned'))
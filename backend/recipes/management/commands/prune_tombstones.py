@@ -0,0 +1,24 @@
+"""Prune_tombstones.py."""
+from django.core.management import BaseCommand
+from jobs.queue import enqueue_unique
+from recipes import versions
+
+
+class Command(BaseCommand):
+    """Delete sync tombstones past the token lifetime."""
+
+    help = 'Prune sync tombstones'
+
+    def add_arguments(self, parser):
+        """Add command arguments."""
+        parser.add_argument(
+            '--schedule', action='store_true',
+            help='Also start the periodic pruning job')
+
+    def handle(self, *args, **options):
+        """Prune now and optionally keep pruning."""
+        deleted = versions.prune()
+        if options['schedule']:
+            enqueue_unique('recipes.prune_tombstones')
+        self.stdout.write(self.style.SUCCESS(
+            f'{deleted} sync tombstones pruned'))
@@ -0,0 +1,18 @@
+"""Rebuild_cart_summary.py."""
+from django.core.management import BaseCommand
+from recipes import shopping
+
+
+class Command(BaseCommand):
+    """Recompute shopping cart summaries from the carts."""
+
+    help = 'Rebuild shopping cart summaries'
+
+    def add_arguments(self, parser):
+        """Add command arguments."""
+        parser.add_argument('--user', type=int, nargs='*', dest='users')
+
+    def handle(self, *args, **options):
+        """Rebuild the summaries of the given users or of everyone."""
+        shopping.rebuild(options['users'])
+        self.stdout.write(self.style.SUCCESS('Cart summaries rebuilt'))
@@ -0,0 +1,23 @@
+"""Refresh_scores.py."""
+from django.core.management import BaseCommand
+from jobs.queue import enqueue_unique
+from recipes import scores
+
+
+class Command(BaseCommand):
+    """Recompute popularity and trending scores of recipes."""
+
+    help = 'Refresh recipe scores'
+
+    def add_arguments(self, parser):
+        """Add command arguments."""
+        parser.add_argument(
+            '--schedule', action='store_true',
+            help='Also start the periodic refresh job')
+
+    def handle(self, *args, **options):
+        """Refresh the scores now and optionally keep them refreshed."""
+        scores.refresh()
+        if options['schedule']:
+            enqueue_unique('recipes.refresh_scores')
+        self.stdout.write(self.style.SUCCESS('Recipe scores refreshed'))
@@ -0,0 +1,25 @@
+"""Refresh_stats.py."""
+from django.core.management import BaseCommand, CommandError
+from jobs.queue import enqueue_unique
+from recipes import statistics
+
+
+class Command(BaseCommand):
+    """Recompute the materialized views behind the admin statistics."""
+
+    help = 'Refresh admin statistics'
+
+    def add_arguments(self, parser):
+        """Add command arguments."""
+        parser.add_argument(
+            '--schedule', action='store_true',
+            help='Also start the periodic refresh job')
+
+    def handle(self, *args, **options):
+        """Refresh the views now and optionally keep them refreshed."""
+        if not statistics.available():
+            raise CommandError('Statistics views require PostgreSQL')
+        statistics.refresh()
+        if options['schedule']:
+            enqueue_unique('recipes.refresh_stats')
+        self.stdout.write(self.style.SUCCESS('Statistics refreshed'))
@@ -0,0 +1,41 @@
+"""Restore.py."""
+import os
+
+from django.core.management import BaseCommand, CommandError
+from jobs.queue import enqueue, enqueue_unique
+from recipes import dataset
+
+
+class Command(BaseCommand):
+    """Load a dataset written by the export command."""
+
+    help = ('Restore an export keeping primary keys; '
+            'rerun with the same directory to resume')
+
+    def add_arguments(self, parser):
+        """Add command arguments."""
+        parser.add_argument('directory')
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Restore into a database that already has data')
+
+    def handle(self, *args, **options):
+        """Restore the dataset and schedule rebuilding of derived data."""
+        directory = options['directory']
+        if not os.path.exists(os.path.join(directory, dataset.MANIFEST)):
+            raise CommandError(f'No export found in {directory}')
+        started = os.path.exists(
+            os.path.join(directory, dataset.RESTORE_STATE))
+        if not started and not options['force'] and any(
+                model.objects.exists()
+                for model in dataset.exported_models()):
+            raise CommandError(
+                'The database is not empty, use --force to merge into it')
+        manifest = dataset.restore(directory, log=self.stdout.write)
+        enqueue('recipes.rebuild_cart_summary')
+        enqueue('api.rebuild_documents')
+        enqueue_unique('recipes.refresh_scores')
+        for name in ('tags', 'ingredients'):
+            enqueue('api.rebuild_snapshot', snapshot=name)
+        total = sum(state['rows'] for state in manifest['models'].values())
+        self.stdout.write(self.style.SUCCESS(f'Restored {total} rows'))
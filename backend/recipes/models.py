@@ -1,4 +1,6 @@
 """Recipe models."""
+import uuid
+
 from django.contrib.auth import get_user_model
 from django.core.validators import MinValueValidator, RegexValidator
 from django.db import models
@@ -133,6 +135,17 @@ class Recipe(models.Model):
         related_name='recipes',
         verbose_name=_('Tags'),
     )
+    updated_at = models.DateTimeField(
+        auto_now=True,
+        db_index=True,
+        verbose_name=_('Updated'),
+    )
+    version = models.BigIntegerField(
+        default=0,
+        db_index=True,
+        editable=False,
+        verbose_name=_('Version'),
+    )
 
     class Meta():
         """Recipe Meta."""
@@ -146,6 +159,75 @@ class Recipe(models.Model):
         return self.name
 
 
+class RecipeDocument(models.Model):
+    """Pre-serialized read representation of a recipe."""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='document',
+        verbose_name=_('Recipe'),
+    )
+    data = models.JSONField(
+        verbose_name=_('Document'),
+    )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name=_('Updated'),
+    )
+
+    class Meta:
+        """RecipeDocument Meta."""
+
+        verbose_name = _('Recipe document')
+        verbose_name_plural = _('Recipe documents')
+
+    def __str__(self):
+        """Str."""
+        return f'{self.recipe_id}'
+
+
+class RecipeScore(models.Model):
+    """Periodically recomputed popularity of a recipe."""
+
+    recipe = models.OneToOneField(
+        Recipe,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='score',
+        verbose_name=_('Recipe'),
+    )
+    popularity = models.FloatField(
+        default=0,
+        verbose_name=_('Popularity'),
+    )
+    trending = models.FloatField(
+        default=0,
+        verbose_name=_('Trending'),
+    )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name=_('Updated'),
+    )
+
+    class Meta:
+        """RecipeScore Meta."""
+
+        indexes = (
+            models.Index(fields=('-popularity', '-recipe'),
+                         name='recipe_score_popular_idx'),
+            models.Index(fields=('-trending', '-recipe'),
+                         name='recipe_score_trending_idx'),
+        )
+        verbose_name = _('Recipe score')
+        verbose_name_plural = _('Recipe scores')
+
+    def __str__(self):
+        """Str."""
+        return f'{self.recipe_id}: {self.popularity} / {self.trending}'
+
+
 class IngredientInRecipe(models.Model):
     """Recipe ingredients model."""
 
@@ -194,6 +276,16 @@ class Cart(models.Model):
         related_name='shopping_cart',
         verbose_name=_('Recipe'),
     )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name=_('Created'),
+    )
+    version = models.BigIntegerField(
+        default=0,
+        editable=False,
+        verbose_name=_('Version'),
+    )
 
     class Meta:
         """Cart Meta."""
@@ -204,6 +296,10 @@ class Cart(models.Model):
             UniqueConstraint(fields=['user', 'recipe'],
                              name='unique_cart')
         ]
+        indexes = (
+            models.Index(fields=('user', 'version'),
+                         name='cart_version_idx'),
+        )
 
     def __str__(self):
         """Str."""
@@ -225,6 +321,16 @@ class Favorite(models.Model):
         related_name='favorites',
         verbose_name=_('Recipe'),
     )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name=_('Created'),
+    )
+    version = models.BigIntegerField(
+        default=0,
+        editable=False,
+        verbose_name=_('Version'),
+    )
 
     class Meta:
         """Favorite Meta."""
@@ -235,7 +341,353 @@ class Favorite(models.Model):
             UniqueConstraint(fields=['user', 'recipe'],
                              name='unique_fav')
         ]
+        indexes = (
+            models.Index(fields=('user', 'version'),
+                         name='favorite_version_idx'),
+        )
 
     def __str__(self):
         """Str."""
         return f'{self.user} {self.recipe}'
+
+
+class CartItem(models.Model):
+    """Shopping cart summary row in canonical units."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='cart_items',
+        verbose_name=_('User'),
+    )
+    name = models.CharField(
+        max_length=200,
+        verbose_name=_('Name'),
+    )
+    measurement_unit = models.CharField(
+        max_length=50,
+        verbose_name=_('Measurement unit'),
+    )
+    amount = models.IntegerField(
+        default=0,
+        verbose_name=_('Qty'),
+    )
+
+    class Meta:
+        """CartItem Meta."""
+
+        ordering = ('name',)
+        verbose_name = _('Cart item')
+        verbose_name_plural = _('Cart items')
+        constraints = [
+            UniqueConstraint(fields=['user', 'name', 'measurement_unit'],
+                             name='unique_cart_item')
+        ]
+
+    def __str__(self):
+        """Str."""
+        return f'{self.name} - {self.amount} {self.measurement_unit}'
+
+
+class ImageUpload(models.Model):
+    """Recipe image uploaded ahead of the recipe, possibly in parts."""
+
+    token = models.UUIDField(
+        default=uuid.uuid4,
+        unique=True,
+        editable=False,
+        verbose_name=_('Token'),
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='image_uploads',
+        verbose_name=_('User'),
+    )
+    filename = models.CharField(
+        max_length=255,
+        verbose_name=_('File name'),
+    )
+    size = models.PositiveIntegerField(
+        verbose_name=_('Size'),
+    )
+    received = models.PositiveIntegerField(
+        default=0,
+        verbose_name=_('Received'),
+    )
+    complete = models.BooleanField(
+        default=False,
+        verbose_name=_('Complete'),
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name=_('Created'),
+    )
+
+    class Meta:
+        """ImageUpload Meta."""
+
+        verbose_name = _('Image upload')
+        verbose_name_plural = _('Image uploads')
+
+    def __str__(self):
+        """Str."""
+        return f'{self.filename} ({self.received}/{self.size})'
+
+
+class OutboxEvent(models.Model):
+    """Change of a recipe-domain row, numbered in write order."""
+
+    CREATED = 'created'
+    UPDATED = 'updated'
+    DELETED = 'deleted'
+    ACTIONS = (
+        (CREATED, _('Created')),
+        (UPDATED, _('Updated')),
+        (DELETED, _('Deleted')),
+    )
+
+    id = models.BigAutoField(primary_key=True)
+    topic = models.CharField(
+        max_length=30,
+        verbose_name=_('Topic'),
+    )
+    action = models.CharField(
+        max_length=10,
+        choices=ACTIONS,
+        verbose_name=_('Action'),
+    )
+    object_id = models.BigIntegerField(
+        verbose_name=_('Object'),
+    )
+    data = models.JSONField(
+        default=dict,
+        blank=True,
+        verbose_name=_('Data'),
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name=_('Created'),
+    )
+
+    class Meta:
+        """OutboxEvent Meta."""
+
+        ordering = ('id',)
+        verbose_name = _('Outbox event')
+        verbose_name_plural = _('Outbox events')
+
+    def __str__(self):
+        """Str."""
+        return f'#{self.id} {self.topic} {self.object_id} {self.action}'
+
+
+class OutboxCheckpoint(models.Model):
+    """Last outbox event a consumer has processed."""
+
+    consumer = models.CharField(
+        max_length=100,
+        primary_key=True,
+        verbose_name=_('Consumer'),
+    )
+    position = models.BigIntegerField(
+        default=0,
+        verbose_name=_('Position'),
+    )
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name=_('Updated'),
+    )
+
+    class Meta:
+        """OutboxCheckpoint Meta."""
+
+        verbose_name = _('Outbox checkpoint')
+        verbose_name_plural = _('Outbox checkpoints')
+
+    def __str__(self):
+        """Str."""
+        return f'{self.consumer} @ {self.position}'
+
+
+class SyncTombstone(models.Model):
+    """Deleted row kept so sync clients learn about the deletion."""
+
+    RECIPE = 'recipe'
+    FAVORITE = 'favorite'
+    CART = 'cart'
+    FOLLOW = 'follow'
+    KINDS = (
+        (RECIPE, _('Recipe')),
+        (FAVORITE, _('Favorite')),
+        (CART, _('Cart')),
+        (FOLLOW, _('Subscribe')),
+    )
+
+    kind = models.CharField(
+        max_length=10,
+        choices=KINDS,
+        verbose_name=_('Kind'),
+    )
+    object_id = models.BigIntegerField(
+        verbose_name=_('Object'),
+    )
+    # A plain column: tombstones are written while their user may be
+    # deleted in the same transaction.
+    user_id = models.BigIntegerField(
+        null=True,
+        blank=True,
+        verbose_name=_('User'),
+    )
+    version = models.BigIntegerField(
+        verbose_name=_('Version'),
+    )
+    deleted = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name=_('Deleted'),
+    )
+
+    class Meta:
+        """SyncTombstone Meta."""
+
+        verbose_name = _('Sync tombstone')
+        verbose_name_plural = _('Sync tombstones')
+        indexes = (
+            models.Index(fields=('user_id', 'version'),
+                         name='sync_tombstone_version_idx'),
+        )
+
+    def __str__(self):
+        """Str."""
+        return f'{self.kind} {self.object_id} @ {self.version}'
+
+
+class SyncCounter(models.Model):
+    """Change version counter for databases without sequences."""
+
+    value = models.BigIntegerField(
+        default=0,
+        verbose_name=_('Value'),
+    )
+
+    class Meta:
+        """SyncCounter Meta."""
+
+        verbose_name = _('Sync counter')
+        verbose_name_plural = _('Sync counters')
+
+    def __str__(self):
+        """Str."""
+        return f'{self.value}'
+
+
+class RequestProfile(models.Model):
+    """Flamegraph and queries recorded for one profiled API request."""
+
+    REQUESTED = 'requested'
+    SAMPLED = 'sampled'
+    REASONS = (
+        (REQUESTED, _('Requested')),
+        (SAMPLED, _('Sampled')),
+    )
+
+    token = models.UUIDField(
+        default=uuid.uuid4,
+        unique=True,
+        editable=False,
+        verbose_name=_('Token'),
+    )
+    reason = models.CharField(
+        max_length=10,
+        choices=REASONS,
+        verbose_name=_('Reason'),
+    )
+    method = models.CharField(
+        max_length=10,
+        verbose_name=_('Method'),
+    )
+    path = models.CharField(
+        max_length=255,
+        verbose_name=_('Path'),
+    )
+    user = models.ForeignKey(
+        User,
+        on_delete=models.SET_NULL,
+        null=True,
+        blank=True,
+        related_name='request_profiles',
+        verbose_name=_('User'),
+    )
+    status = models.PositiveSmallIntegerField(
+        verbose_name=_('Status'),
+    )
+    duration = models.FloatField(
+        verbose_name=_('Duration, ms'),
+    )
+    samples = models.PositiveIntegerField(
+        verbose_name=_('Samples'),
+    )
+    queries = models.PositiveIntegerField(
+        verbose_name=_('Queries'),
+    )
+    query_time = models.FloatField(
+        verbose_name=_('Query time, ms'),
+    )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        db_index=True,
+        verbose_name=_('Created'),
+    )
+
+    class Meta:
+        """RequestProfile Meta."""
+
+        ordering = ('-created',)
+        verbose_name = _('Request profile')
+        verbose_name_plural = _('Request profiles')
+
+    def __str__(self):
+        """Str."""
+        return f'{self.method} {self.path} ({self.duration:.0f} ms)'
+
+
+class Statistics(models.Model):
+    """Site totals kept in the stats_summary materialized view."""
+
+    id = models.IntegerField(primary_key=True)
+    users = models.BigIntegerField(verbose_name=_('Users'))
+    recipes = models.BigIntegerField(verbose_name=_('Recipes'))
+    favorites = models.BigIntegerField(verbose_name=_('Favorites'))
+    carts = models.BigIntegerField(verbose_name=_('Carts'))
+    users_with_favorites = models.BigIntegerField(
+        verbose_name=_('Users with favorites'))
+    users_with_cart = models.BigIntegerField(
+        verbose_name=_('Users with a cart'))
+    favorites_in_cart = models.BigIntegerField(
+        verbose_name=_('Favorites in a cart'))
+    refreshed = models.DateTimeField(verbose_name=_('Refreshed'))
+
+    class Meta:
+        """Statistics Meta."""
+
+        managed = False
+        db_table = 'stats_summary'
+        verbose_name = _('Statistics')
+        verbose_name_plural = _('Statistics')
+
+    def __str__(self):
+        """Str."""
+        return f'{self.refreshed}'
+
+    @property
+    def cart_conversion(self):
+        """Share of favorites the users also put into their carts."""
+        return self.favorites_in_cart / self.favorites if self.favorites else 0
+
+    @property
+    def cart_users_share(self):
+        """Share of users with a non-empty cart."""
+        return self.users_with_cart / self.users if self.users else 0
@@ -0,0 +1,129 @@
+"""Outbox.py."""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import transaction
+from django.dispatch import Signal
+from django.utils import timezone
+from users.models import Follow
+
+from .models import (Cart, Favorite, IngredientInRecipe, OutboxCheckpoint,
+                     OutboxEvent, Recipe)
+
+PRUNE_BATCH_SIZE = 10000
+
+recorded = Signal()
+
+TOPICS = {
+    Recipe: ('recipe', ('author_id',)),
+    Recipe.tags.through: ('recipe_tag', ('recipe_id', 'tag_id')),
+    IngredientInRecipe: ('recipe_ingredient', ('recipe_id', 'ingredient_id')),
+    Favorite: ('favorite', ('user_id', 'recipe_id')),
+    Cart: ('cart', ('user_id', 'recipe_id')),
+    Follow: ('follow', ('user_id', 'author_id')),
+}
+
+
+def event(topic, action, object_id, **data):
+    """Build an unsaved event."""
+    return OutboxEvent(
+        topic=topic, action=action, object_id=object_id, data=data)
+
+
+def change(instance, action):
+    """Build the event of a tracked row, keeping only its foreign keys."""
+    topic, fields = TOPICS[type(instance)]
+    return event(topic, action, instance.pk, **{
+        field[:-len('_id')]: getattr(instance, field) for field in fields
+    })
+
+
+def record(topic, action, object_id, **data):
+    """Append an event in the transaction of the write it describes."""
+    item = event(topic, action, object_id, **data)
+    item.save()
+    recorded.send(sender=OutboxEvent, events=[item])
+    return item
+
+
+def record_many(events):
+    """Append events for rows written without model signals."""
+    if events:
+        OutboxEvent.objects.bulk_create(events)
+        recorded.send(sender=OutboxEvent, events=events)
+
+
+def record_created(queryset):
+    """Append creation events of bulk inserted rows."""
+    record_many([
+        change(instance, OutboxEvent.CREATED) for instance in queryset])
+
+
+def record_deleted(queryset):
+    """Append removal events of rows about to be deleted in bulk."""
+    record_many([
+        change(instance, OutboxEvent.DELETED) for instance in queryset])
+
+
+def position(consumer):
+    """Return the last event id the consumer has processed."""
+    return OutboxCheckpoint.objects.filter(consumer=consumer).values_list(
+        'position', flat=True).first() or 0
+
+
+def read(consumer, limit=None):
+    """Return the next events of the consumer in sequence order.
+
+    Ids are taken when rows are inserted, not when they commit, so a gap
+    may still be filled by a running transaction. The batch stops at a
+    gap until the events after it are older than OUTBOX_SETTLE, after
+    which the gap is taken for a rolled back insert.
+    """
+    limit = limit or settings.OUTBOX_BATCH_SIZE
+    expected = position(consumer) + 1
+    settled = timezone.now() - timedelta(seconds=settings.OUTBOX_SETTLE)
+    batch = []
+    for item in OutboxEvent.objects.filter(
+            id__gte=expected).order_by('id')[:limit]:
+        if item.id != expected and item.created > settled:
+            break
+        batch.append(item)
+        expected = item.id + 1
+    return batch
+
+
+def acknowledge(consumer, last_id):
+    """Move the checkpoint of the consumer past the given event."""
+    OutboxCheckpoint.objects.update_or_create(
+        consumer=consumer, defaults={'position': last_id})
+
+
+def consume(consumer, handler, limit=None):
+    """Pass the next batch to the handler and checkpoint it atomically.
+
+    Returns the number of handled events; zero means the consumer is
+    caught up.
+    """
+    with transaction.atomic():
+        OutboxCheckpoint.objects.get_or_create(consumer=consumer)
+        OutboxCheckpoint.objects.select_for_update().get(consumer=consumer)
+        batch = read(consumer, limit)
+        if batch:
+            handler(batch)
+            acknowledge(consumer, batch[-1].id)
+    return len(batch)
+
+
+def prune():
+    """Delete events older than OUTBOX_RETENTION in short batches."""
+    cutoff = timezone.now() - timedelta(seconds=settings.OUTBOX_RETENTION)
+    deleted = 0
+    while True:
+        ids = list(OutboxEvent.objects.filter(
+            created__lt=cutoff,
+        ).order_by('id').values_list('id', flat=True)[:PRUNE_BATCH_SIZE])
+        if ids:
+            deleted += OutboxEvent.objects.filter(
+                id__lte=ids[-1], created__lt=cutoff).delete()[0]
+        if len(ids) < PRUNE_BATCH_SIZE:
+            return deleted
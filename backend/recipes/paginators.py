@@ -0,0 +1,32 @@
+"""Paginators.py."""
+from django.conf import settings
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """Paginator using the planner row estimate on large unfiltered tables."""
+
+    @cached_property
+    def count(self):
+        """Return the estimated number of rows when an exact one is costly."""
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor == 'postgresql' and not queryset.query.where:
+            with connection.cursor() as cursor:
+                cursor.execute(
+                    'SELECT reltuples FROM pg_class WHERE oid = %s::regclass',
+                    [queryset.model._meta.db_table],
+                )
+                row = cursor.fetchone()
+            if row and row[0] > settings.ADMIN_COUNT_ESTIMATE_THRESHOLD:
+                return int(row[0])
+        return super().count
+
+
+class LargeTableAdmin:
+    """Admin mixin for changelists of tables with millions of rows."""
+
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
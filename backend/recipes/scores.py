@@ -0,0 +1,103 @@
+"""Scores.py."""
+import math
+from collections import defaultdict
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import Count
+from django.utils import timezone
+
+from .models import Cart, Favorite, Recipe, RecipeScore
+
+FAVORITE_WEIGHT = 1.0
+CART_WEIGHT = 2.0
+
+ORDERINGS = {
+    'popular': 'score__popularity',
+    'trending': 'score__trending',
+}
+
+REFRESH_SQL = '''
+INSERT INTO {score} (recipe_id, popularity, trending, updated)
+SELECT recipe.id,
+       COALESCE(SUM(activity.weight), 0),
+       COALESCE(SUM(activity.weight * exp(
+           ln(0.5) * extract(epoch FROM %(now)s - activity.created)
+           / %(half_life)s
+       )) FILTER (WHERE activity.created > %(since)s), 0),
+       %(now)s
+FROM {recipe} recipe
+LEFT JOIN (
+    SELECT recipe_id, created, %(favorite_weight)s::float8 AS weight
+    FROM {favorite}
+    UNION ALL
+    SELECT recipe_id, created, %(cart_weight)s::float8
+    FROM {cart}
+) activity ON activity.recipe_id = recipe.id
+GROUP BY recipe.id
+ON CONFLICT (recipe_id) DO UPDATE SET
+    popularity = EXCLUDED.popularity,
+    trending = EXCLUDED.trending,
+    updated = EXCLUDED.updated
+WHERE {score}.popularity IS DISTINCT FROM EXCLUDED.popularity
+   OR {score}.trending IS DISTINCT FROM EXCLUDED.trending
+'''
+
+
+def _params(now):
+    """Return the parameters of a refresh at the given moment."""
+    return {
+        'now': now,
+        'since': now - timedelta(seconds=settings.RECIPE_TRENDING_WINDOW),
+        'half_life': settings.RECIPE_TRENDING_HALF_LIFE,
+        'favorite_weight': FAVORITE_WEIGHT,
+        'cart_weight': CART_WEIGHT,
+    }
+
+
+def _refresh_postgres(params):
+    """Upsert the scores of every recipe with a single statement."""
+    sql = REFRESH_SQL.format(
+        score=RecipeScore._meta.db_table,
+        recipe=Recipe._meta.db_table,
+        favorite=Favorite._meta.db_table,
+        cart=Cart._meta.db_table,
+    )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+
+
+@transaction.atomic
+def _refresh_portable(params):
+    """Compute the scores in Python for databases other than Postgres."""
+    scores = defaultdict(lambda: [0.0, 0.0])
+    for model, weight in ((Favorite, params['favorite_weight']),
+                          (Cart, params['cart_weight'])):
+        totals = model.objects.values('recipe_id').annotate(
+            total=Count('id')).values_list('recipe_id', 'total')
+        for recipe_id, total in totals:
+            scores[recipe_id][0] += weight * total
+        recent = model.objects.filter(
+            created__gt=params['since']).values_list('recipe_id', 'created')
+        for recipe_id, created in recent.iterator():
+            age = (params['now'] - created).total_seconds()
+            scores[recipe_id][1] += weight * math.pow(
+                0.5, age / params['half_life'])
+    RecipeScore.objects.all().delete()
+    RecipeScore.objects.bulk_create(
+        [RecipeScore(recipe_id=recipe_id,
+                     popularity=scores[recipe_id][0],
+                     trending=scores[recipe_id][1])
+         for recipe_id in Recipe.objects.values_list('id', flat=True)],
+        batch_size=1000,
+    )
+
+
+def refresh():
+    """Recompute popularity and time-decayed trending scores."""
+    params = _params(timezone.now())
+    if connection.vendor == 'postgresql':
+        _refresh_postgres(params)
+    else:
+        _refresh_portable(params)
@@ -0,0 +1,119 @@
+"""Shopping.py."""
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from functools import reduce
+from operator import or_
+
+from django.db import transaction
+from django.db.models import Case, F, Q, Value, When
+
+from .models import Cart, CartItem, IngredientInRecipe
+from .units import normalize
+
+
+def recipe_totals(recipe_ids):
+    """Return canonical ingredient totals keyed by recipe id."""
+    totals = defaultdict(Counter)
+    rows = IngredientInRecipe.objects.filter(
+        recipe_id__in=recipe_ids
+    ).values_list(
+        'recipe_id',
+        'ingredient__name',
+        'ingredient__measurement_unit',
+        'amount',
+    )
+    for recipe_id, name, measurement_unit, amount in rows:
+        unit, amount = normalize(measurement_unit, amount)
+        totals[recipe_id][(name, unit)] += amount
+    return totals
+
+
+def _combined(totals, recipe_ids):
+    """Sum the totals of several recipes."""
+    combined = Counter()
+    for recipe_id in recipe_ids:
+        combined.update(totals.get(recipe_id, {}))
+    return combined
+
+
+@transaction.atomic
+def apply_delta(user_ids, delta):
+    """Shift the summaries of the users by the given amounts."""
+    delta = {key: amount for key, amount in delta.items() if amount}
+    if not user_ids or not delta:
+        return
+    CartItem.objects.bulk_create(
+        [CartItem(user_id=user_id, name=name, measurement_unit=unit)
+         for user_id in user_ids
+         for (name, unit), amount in delta.items() if amount > 0],
+        ignore_conflicts=True,
+    )
+    lines = [Q(name=name, measurement_unit=unit) for name, unit in delta]
+    CartItem.objects.filter(
+        reduce(or_, lines), user_id__in=user_ids
+    ).update(amount=F('amount') + Case(
+        *[When(name=name, measurement_unit=unit, then=Value(amount))
+          for (name, unit), amount in delta.items()],
+        default=Value(0),
+    ))
+    if any(amount < 0 for amount in delta.values()):
+        CartItem.objects.filter(user_id__in=user_ids, amount__lte=0).delete()
+
+
+def add_recipes(user_id, recipe_ids):
+    """Add the ingredients of recipes put into the cart."""
+    totals = recipe_totals(recipe_ids)
+    apply_delta([user_id], _combined(totals, recipe_ids))
+
+
+def remove_recipes(user_id, recipe_ids):
+    """Subtract the ingredients of recipes taken out of the cart."""
+    totals = recipe_totals(recipe_ids)
+    combined = _combined(totals, recipe_ids)
+    apply_delta([user_id], {key: -amount for key, amount in combined.items()})
+
+
+def recipe_changed(recipe_id, old_totals):
+    """Apply the difference of an edited recipe to every cart holding it."""
+    new_totals = recipe_totals([recipe_id]).get(recipe_id, Counter())
+    delta = Counter(new_totals)
+    delta.subtract(old_totals)
+    user_ids = list(
+        Cart.objects.filter(recipe_id=recipe_id).values_list(
+            'user_id', flat=True))
+    apply_delta(user_ids, delta)
+
+
+@contextmanager
+def tracking(recipe_ids):
+    """Follow the ingredient rows changed inside the block in every cart."""
+    recipe_ids = set(recipe_ids)
+    with transaction.atomic():
+        old_totals = recipe_totals(recipe_ids)
+        yield
+        for recipe_id in recipe_ids:
+            recipe_changed(recipe_id, old_totals.get(recipe_id, Counter()))
+
+
+@transaction.atomic
+def rebuild(user_ids=None):
+    """Recompute summaries from scratch, for all users by default."""
+    carts = Cart.objects.all()
+    items = CartItem.objects.all()
+    if user_ids is not None:
+        carts = carts.filter(user_id__in=user_ids)
+        items = items.filter(user_id__in=user_ids)
+    items.delete()
+    recipes_by_user = defaultdict(list)
+    for user_id, recipe_id in carts.values_list('user_id', 'recipe_id'):
+        recipes_by_user[user_id].append(recipe_id)
+    totals = recipe_totals(
+        {recipe_id for recipes in recipes_by_user.values()
+         for recipe_id in recipes})
+    CartItem.objects.bulk_create(
+        [CartItem(user_id=user_id, name=name, measurement_unit=unit,
+                  amount=amount)
+         for user_id, recipes in recipes_by_user.items()
+         for (name, unit), amount in _combined(totals, recipes).items()],
+        batch_size=1000,
+    )
@@ -0,0 +1,136 @@
+"""Signals.py."""
+from functools import partial
+
+from django.db import transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete, pre_save)
+from django.dispatch import receiver
+from users.models import Follow
+
+from . import outbox, shopping, versions
+from .models import (Cart, Favorite, Ingredients, OutboxEvent, Recipe,
+                     RecipeScore, SyncTombstone, Tag)
+
+TOMBSTONES = {
+    Favorite: (SyncTombstone.FAVORITE, 'recipe_id'),
+    Cart: (SyncTombstone.CART, 'recipe_id'),
+    Follow: (SyncTombstone.FOLLOW, 'author_id'),
+}
+
+
+@receiver(post_save, sender=Recipe)
+def recipe_created(sender, instance, created, **kwargs):
+    """Give a new recipe a score row so score ordering includes it."""
+    if created:
+        RecipeScore.objects.get_or_create(recipe=instance)
+
+
+@receiver(post_save, sender=Cart)
+def cart_added(sender, instance, created, **kwargs):
+    """Add the recipe to the shopping cart summary."""
+    if created:
+        shopping.add_recipes(instance.user_id, [instance.recipe_id])
+
+
+@receiver(pre_delete, sender=Cart)
+def cart_removed(sender, instance, **kwargs):
+    """Subtract the recipe while its ingredients still exist."""
+    shopping.remove_recipes(instance.user_id, [instance.recipe_id])
+
+
+def _affected_users(ingredient):
+    """Return users whose carts contain the ingredient."""
+    return list(Cart.objects.filter(
+        recipe__ingredients_in_recipe__ingredient=ingredient
+    ).values_list('user_id', flat=True).distinct())
+
+
+@receiver(post_save, sender=Ingredients)
+def ingredient_changed(sender, instance, created, **kwargs):
+    """Rename or re-unit the ingredient in the summaries holding it."""
+    if not created:
+        shopping.rebuild(_affected_users(instance))
+
+
+@receiver(pre_delete, sender=Ingredients)
+def ingredient_removed(sender, instance, **kwargs):
+    """Drop the ingredient from summaries once it is deleted."""
+    transaction.on_commit(
+        partial(shopping.rebuild, _affected_users(instance)))
+
+
+def outbox_saved(sender, instance, created, **kwargs):
+    """Record the write of a tracked row in the outbox."""
+    outbox.record_many([outbox.change(
+        instance, OutboxEvent.CREATED if created else OutboxEvent.UPDATED)])
+
+
+def outbox_deleted(sender, instance, **kwargs):
+    """Record the removal of a tracked row in the outbox."""
+    outbox.record_many([outbox.change(instance, OutboxEvent.DELETED)])
+
+
+# Django sends no save or delete signals for auto-created through models,
+# so tag links are tracked by the receivers below.
+for model in outbox.TOPICS:
+    if not model._meta.auto_created:
+        post_save.connect(outbox_saved, sender=model)
+        post_delete.connect(outbox_deleted, sender=model)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipe_tags_linked(sender, instance, action, reverse, pk_set, **kwargs):
+    """Record tag links changed through the related managers."""
+    if action not in ('post_add', 'pre_remove', 'pre_clear'):
+        return
+    links = sender.objects.filter(**{'tag' if reverse else 'recipe': instance})
+    if action != 'pre_clear':
+        if not pk_set:
+            return
+        links = links.filter(
+            **{'recipe_id__in' if reverse else 'tag_id__in': pk_set})
+    if action == 'post_add':
+        outbox.record_created(links)
+    else:
+        outbox.record_deleted(links)
+
+
+@receiver(pre_delete, sender=Recipe)
+@receiver(pre_delete, sender=Tag)
+def tagged_deleted(sender, instance, **kwargs):
+    """Record tag links removed along with their recipe or tag."""
+    outbox.record_deleted(Recipe.tags.through.objects.filter(
+        **{'recipe' if sender is Recipe else 'tag': instance}))
+
+
+@receiver(pre_save, sender=Recipe)
+def recipe_versioned(sender, instance, **kwargs):
+    """Give every saved recipe a new sync version."""
+    instance.version = versions.next_version()
+
+
+@receiver(post_delete, sender=Recipe)
+def recipe_tombstone(sender, instance, **kwargs):
+    """Remember a deleted recipe for sync clients."""
+    SyncTombstone.objects.create(
+        kind=SyncTombstone.RECIPE, object_id=instance.id,
+        version=versions.next_version())
+
+
+def link_versioned(sender, instance, **kwargs):
+    """Give a new favorite, cart entry or follow a sync version."""
+    if instance._state.adding:
+        instance.version = versions.next_version()
+
+
+def link_tombstone(sender, instance, **kwargs):
+    """Remember a removed favorite, cart entry or follow for its user."""
+    kind, field = TOMBSTONES[sender]
+    SyncTombstone.objects.create(
+        kind=kind, object_id=getattr(instance, field),
+        user_id=instance.user_id, version=versions.next_version())
+
+
+for model in TOMBSTONES:
+    pre_save.connect(link_versioned, sender=model)
+    post_delete.connect(link_tombstone, sender=model)
@@ -0,0 +1,36 @@
+"""Sql.py."""
+from django.db import connections
+
+from .statistics import DDL as STATISTICS
+
+EXTENSIONS = (
+    'CREATE EXTENSION IF NOT EXISTS pg_trgm',
+)
+
+SEQUENCES = (
+    'CREATE SEQUENCE IF NOT EXISTS sync_version_seq',
+)
+
+INDEXES = (
+    'CREATE INDEX IF NOT EXISTS recipes_recipe_name_prefix '
+    'ON recipes_recipe (UPPER(name) varchar_pattern_ops)',
+    'CREATE INDEX IF NOT EXISTS recipes_ingredients_name_prefix '
+    'ON recipes_ingredients (UPPER(name) varchar_pattern_ops)',
+    'CREATE INDEX IF NOT EXISTS users_user_username_prefix '
+    'ON users_user (UPPER(username) varchar_pattern_ops)',
+    'CREATE INDEX IF NOT EXISTS users_user_email_prefix '
+    'ON users_user (UPPER(email) varchar_pattern_ops)',
+    'CREATE INDEX IF NOT EXISTS recipes_ingredients_name_trgm '
+    "ON recipes_ingredients USING gin "
+    "(replace(lower(name), 'ё', 'е') gin_trgm_ops)",
+)
+
+
+def create_postgres_objects(using='default', **kwargs):
+    """Create the Postgres-only extensions, sequences, indexes and views."""
+    connection = connections[using]
+    if connection.vendor != 'postgresql':
+        return
+    with connection.cursor() as cursor:
+        for statement in EXTENSIONS + SEQUENCES + INDEXES + STATISTICS:
+            cursor.execute(statement)
@@ -0,0 +1,129 @@
+"""Statistics.py."""
+from django.db import connection
+
+from .models import Statistics
+
+VIEWS = {
+    'stats_summary': '''
+        SELECT 1 AS id,
+               (SELECT count(*) FROM users_user) AS users,
+               (SELECT count(*) FROM recipes_recipe) AS recipes,
+               (SELECT count(*) FROM recipes_favorite) AS favorites,
+               (SELECT count(*) FROM recipes_cart) AS carts,
+               (SELECT count(DISTINCT user_id) FROM recipes_favorite)
+                   AS users_with_favorites,
+               (SELECT count(DISTINCT user_id) FROM recipes_cart)
+                   AS users_with_cart,
+               (SELECT count(*) FROM recipes_favorite favorite
+                JOIN recipes_cart cart ON cart.user_id = favorite.user_id
+                    AND cart.recipe_id = favorite.recipe_id)
+                   AS favorites_in_cart,
+               now() AS refreshed
+    ''',
+    'stats_top_ingredients': '''
+        SELECT ingredient.id AS ingredient_id, ingredient.name,
+               ingredient.measurement_unit, count(*) AS recipes,
+               sum(item.amount) AS total_amount
+        FROM recipes_ingredientinrecipe item
+        JOIN recipes_ingredients ingredient
+            ON ingredient.id = item.ingredient_id
+        GROUP BY ingredient.id
+    ''',
+    'stats_top_favorited': '''
+        SELECT recipe.id AS recipe_id, recipe.name, count(*) AS favorites
+        FROM recipes_favorite favorite
+        JOIN recipes_recipe recipe ON recipe.id = favorite.recipe_id
+        GROUP BY recipe.id
+    ''',
+    'stats_top_authors': '''
+        SELECT author.id AS author_id, author.username,
+               count(*) AS followers
+        FROM users_follow follow
+        JOIN users_user author ON author.id = follow.author_id
+        GROUP BY author.id
+    ''',
+    'stats_recipes_per_tag': '''
+        SELECT tag.id AS tag_id, tag.name, tag.slug,
+               count(link.recipe_id) AS recipes
+        FROM recipes_tag tag
+        LEFT JOIN recipes_recipe_tags link ON link.tag_id = tag.id
+        GROUP BY tag.id
+    ''',
+}
+
+KEYS = {
+    'stats_summary': 'id',
+    'stats_top_ingredients': 'ingredient_id',
+    'stats_top_favorited': 'recipe_id',
+    'stats_top_authors': 'author_id',
+    'stats_recipes_per_tag': 'tag_id',
+}
+
+RANKINGS = {
+    'ingredients': ('stats_top_ingredients', 'recipes'),
+    'favorited': ('stats_top_favorited', 'favorites'),
+    'authors': ('stats_top_authors', 'followers'),
+    'tags': ('stats_recipes_per_tag', 'recipes'),
+}
+
+DDL = tuple(
+    statement
+    for name, query in VIEWS.items()
+    for statement in (
+        f'CREATE MATERIALIZED VIEW IF NOT EXISTS {name} AS {query} '
+        f'WITH NO DATA',
+        f'CREATE UNIQUE INDEX IF NOT EXISTS {name}_key '
+        f'ON {name} ({KEYS[name]})',
+    )
+) + tuple(
+    f'CREATE INDEX IF NOT EXISTS {view}_{column} ON {view} ({column} DESC)'
+    for view, column in RANKINGS.values()
+)
+
+
+def available():
+    """Tell whether the statistics views can exist on this database."""
+    return connection.vendor == 'postgresql'
+
+
+def _populated(cursor):
+    """Return the names of the views that hold data."""
+    cursor.execute('SELECT matviewname FROM pg_matviews WHERE ispopulated')
+    return {row[0] for row in cursor.fetchall()}
+
+
+def refresh():
+    """Recompute every view without blocking readers once populated."""
+    with connection.cursor() as cursor:
+        populated = _populated(cursor)
+        for name in VIEWS:
+            concurrently = 'CONCURRENTLY ' if name in populated else ''
+            cursor.execute(
+                f'REFRESH MATERIALIZED VIEW {concurrently}{name}')
+
+
+def _rows(cursor, sql):
+    """Run a query and return its rows as dictionaries."""
+    cursor.execute(sql)
+    columns = [column[0] for column in cursor.description]
+    return [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+
+def report(limit=20):
+    """Return the totals and the top rows of every ranking view."""
+    with connection.cursor() as cursor:
+        populated = _populated(cursor)
+        summary = None
+        if 'stats_summary' in populated:
+            summary = Statistics.objects.first()
+        return {
+            'summary': summary,
+            **{
+                name: _rows(
+                    cursor,
+                    f'SELECT * FROM {view} '
+                    f'ORDER BY {column} DESC LIMIT {int(limit)}',
+                ) if view in populated else []
+                for name, (view, column) in RANKINGS.items()
+            },
+        }
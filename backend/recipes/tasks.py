@@ -0,0 +1,88 @@
+"""Tasks.py."""
+import io
+from functools import partial
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import transaction
+from jobs.queue import enqueue_unique, register
+from PIL import Image
+
+from . import outbox, scores, shopping, statistics, versions
+from .models import OutboxEvent, Recipe, RecipeDocument
+
+
+@register('recipes.optimize_image', queue='images')
+def optimize_image(recipe_id):
+    """Downscale an oversized recipe image."""
+    recipe = Recipe.objects.filter(id=recipe_id).first()
+    if recipe is None or not recipe.image:
+        return
+    with recipe.image.open('rb') as f:
+        image = Image.open(f)
+        image_format = image.format
+        image.load()
+    size = settings.RECIPE_IMAGE_MAX_SIZE
+    if max(image.size) <= size:
+        return
+    image.thumbnail((size, size))
+    buffer = io.BytesIO()
+    image.save(buffer, format=image_format, optimize=True)
+    old_name = recipe.image.name
+    storage = recipe.image.storage
+    # The copy gets a free name next to the original, which stays until
+    # it is replaced.
+    new_name = storage.save(old_name, ContentFile(buffer.getvalue()))
+    with transaction.atomic():
+        replaced = Recipe.objects.filter(
+            id=recipe_id, image=old_name).update(image=new_name)
+        if replaced:
+            recipe.image.name = new_name
+            versions.touch(Recipe.objects.filter(id=recipe_id))
+            outbox.record_many(
+                [outbox.change(recipe, OutboxEvent.UPDATED)])
+            transaction.on_commit(partial(storage.delete, old_name))
+    if not replaced:
+        # The author changed the image while it was being downscaled.
+        storage.delete(new_name)
+        return
+    RecipeDocument.objects.filter(recipe_id=recipe_id).delete()
+
+
+@register('recipes.rebuild_cart_summary')
+def rebuild_cart_summary(user_ids=None):
+    """Recompute shopping cart summaries."""
+    shopping.rebuild(user_ids)
+
+
+@register('recipes.refresh_scores')
+def refresh_scores():
+    """Recompute recipe scores and schedule the next refresh."""
+    enqueue_unique('recipes.refresh_scores',
+                   delay=settings.RECIPE_SCORES_INTERVAL)
+    scores.refresh()
+
+
+@register('recipes.refresh_stats')
+def refresh_stats():
+    """Refresh the admin statistics views and schedule the next refresh."""
+    enqueue_unique('recipes.refresh_stats',
+                   delay=settings.STATS_REFRESH_INTERVAL)
+    if statistics.available():
+        statistics.refresh()
+
+
+@register('recipes.prune_outbox')
+def prune_outbox():
+    """Drop expired outbox events and schedule the next pruning."""
+    enqueue_unique('recipes.prune_outbox',
+                   delay=settings.OUTBOX_PRUNE_INTERVAL)
+    outbox.prune()
+
+
+@register('recipes.prune_tombstones')
+def prune_tombstones():
+    """Drop expired sync tombstones and schedule the next pruning."""
+    enqueue_unique('recipes.prune_tombstones',
+                   delay=settings.SYNC_PRUNE_INTERVAL)
+    versions.prune()
@@ -0,0 +1,33 @@
+"""Units.py."""
+from decimal import Decimal
+
+CONVERSIONS = {
+    'г': ('г', 1),
+    'кг': ('г', 1000),
+    'мл': ('мл', 1),
+    'л': ('мл', 1000),
+    'ч. л.': ('мл', 5),
+    'ст. л.': ('мл', 15),
+    'стакан': ('мл', 250),
+}
+
+LARGER_UNITS = {
+    'г': ('кг', 1000),
+    'мл': ('л', 1000),
+}
+
+
+def normalize(measurement_unit, amount):
+    """Convert an amount into the canonical unit of its dimension."""
+    unit = ' '.join(measurement_unit.lower().split())
+    canonical, factor = CONVERSIONS.get(unit, (unit, 1))
+    return canonical, amount * factor
+
+
+def humanize(measurement_unit, amount):
+    """Show large canonical amounts in the bigger unit, e.g. 1500 г."""
+    larger, factor = LARGER_UNITS.get(measurement_unit, (None, None))
+    if larger is None or amount < factor:
+        return measurement_unit, amount
+    value = Decimal(amount) / factor
+    return larger, int(value) if value == value.to_integral() else float(value)
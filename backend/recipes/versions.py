@@ -0,0 +1,78 @@
+"""Versions.py."""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models import F, Max
+from django.db.models.expressions import RawSQL
+from django.utils import timezone
+from users.models import Follow
+
+from .models import Cart, Favorite, Recipe, SyncCounter, SyncTombstone
+
+SEQUENCE = 'sync_version_seq'
+
+
+def allocate(count):
+    """Return count new change versions in increasing order."""
+    if not count:
+        return []
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT nextval('{SEQUENCE}') FROM generate_series(1, %s)",
+                [count])
+            return sorted(row[0] for row in cursor.fetchall())
+    with transaction.atomic():
+        SyncCounter.objects.get_or_create(id=1)
+        SyncCounter.objects.filter(id=1).update(value=F('value') + count)
+        last = SyncCounter.objects.get(id=1).value
+    return list(range(last - count + 1, last + 1))
+
+
+def next_version():
+    """Return a new change version."""
+    return allocate(1)[0]
+
+
+def touch(recipes):
+    """Give recipes whose rendering changed new versions."""
+    now = timezone.now()
+    if connection.vendor == 'postgresql':
+        recipes.update(
+            version=RawSQL(f"nextval('{SEQUENCE}')", ()), updated_at=now)
+        return
+    ids = list(recipes.values_list('id', flat=True))
+    for recipe_id, version in zip(ids, allocate(len(ids))):
+        Recipe.objects.filter(id=recipe_id).update(
+            version=version, updated_at=now)
+
+
+def recipes_version():
+    """Return a value that changes whenever any recipe changes or goes."""
+    return (
+        Recipe.objects.aggregate(last=Max('version'))['last'],
+        SyncTombstone.objects.filter(
+            user_id=None, kind=SyncTombstone.RECIPE,
+        ).aggregate(last=Max('version'))['last'],
+    )
+
+
+def prune():
+    """Delete tombstones no accepted sync token can still need."""
+    cutoff = timezone.now() - timedelta(
+        seconds=settings.SYNC_TOKEN_MAX_AGE + settings.SYNC_SETTLE)
+    return SyncTombstone.objects.filter(deleted__lt=cutoff).delete()[0]
+
+
+def reset():
+    """Move the version counter past every stored version."""
+    last = max(
+        model.objects.aggregate(last=Max('version'))['last'] or 0
+        for model in (Recipe, Favorite, Cart, Follow, SyncTombstone))
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f"SELECT setval('{SEQUENCE}', %s)", [max(last, 1)])
+        return
+    SyncCounter.objects.update_or_create(id=1, defaults={'value': last})
@@ -1,12 +1,13 @@
 """Users admin."""
 from django.contrib import admin
 from django.contrib.auth.admin import UserAdmin
+from recipes.paginators import LargeTableAdmin
 
 from .models import Follow, User
 
 
 @admin.register(User)
-class UserAdmin(UserAdmin):
+class UserAdmin(LargeTableAdmin, UserAdmin):
     """Users admin."""
 
     list_display = (
@@ -17,16 +18,32 @@ class UserAdmin(UserAdmin):
         'last_name',
     )
     list_filter = (
-        'email',
-        'first_name'
+        'is_staff',
+        'is_active',
+        )
+    search_fields = (
+        '^username',
+        '^email',
         )
 
 
 @admin.register(Follow)
-class SubscribeAdmin(admin.ModelAdmin):
+class SubscribeAdmin(LargeTableAdmin, admin.ModelAdmin):
     """Subscribe admin."""
 
     list_display = (
         'user',
         'author',
         )
+    list_select_related = (
+        'user',
+        'author',
+        )
+    search_fields = (
+        '^user__username',
+        '^author__username',
+        )
+    autocomplete_fields = (
+        'user',
+        'author',
+        )
@@ -8,3 +8,7 @@ class UsersConfig(AppConfig):
 
     name = 'users'
     verbose_name = _('Users')
+
+    def ready(self):
+        """Connect signal receivers."""
+        from . import signals  # noqa: F401
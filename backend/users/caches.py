@@ -0,0 +1,40 @@
+"""Caches.py."""
+import copy
+
+from api.localcache import LocalCache
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import AuthenticationFailed
+
+from .models import Follow
+
+tokens = LocalCache('tokens')
+follows = LocalCache('follows')
+
+
+def following(user_id):
+    """Return the ids of the authors the user follows."""
+    return follows.get_or_set(user_id, lambda: frozenset(
+        Follow.objects.filter(user_id=user_id).values_list(
+            'author_id', flat=True)))
+
+
+def _token(key):
+    """Load a token together with its user."""
+    return Token.objects.select_related('user').filter(key=key).first()
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """Token authentication that remembers tokens in worker memory."""
+
+    def authenticate_credentials(self, key):
+        """Return the user of the token without a query on a cache hit."""
+        token = tokens.get_or_set(key, lambda: _token(key))
+        if token is None:
+            raise AuthenticationFailed('Invalid token.')
+        if not token.user.is_active:
+            raise AuthenticationFailed('User inactive or deleted.')
+        # Requests may change their user; keep the cached one intact.
+        token = copy.copy(token)
+        token.user = copy.copy(token.user)
+        return token.user, token
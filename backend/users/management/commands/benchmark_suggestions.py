@@ -0,0 +1,58 @@
+"""Benchmark_suggestions.py."""
+import random
+import statistics
+import time
+
+from django.core.management import BaseCommand
+from users.suggestions import FollowGraph, rank
+
+
+class Command(BaseCommand):
+    """Time the suggestion scoring on a synthetic follow graph."""
+
+    help = 'Follow suggestions benchmark'
+
+    def add_arguments(self, parser):
+        """Add command arguments."""
+        parser.add_argument('--edges', type=int, default=1000000)
+        parser.add_argument('--users', type=int, default=100000)
+        parser.add_argument('--samples', type=int, default=2000)
+        parser.add_argument('--seed', type=int, default=0)
+
+    def edges(self, users, count, rng):
+        """Generate sorted unique edges with a few very popular authors."""
+        weights = [1 / (rank + 1) for rank in range(users)]
+        authors = rng.choices(range(1, users + 1), weights=weights, k=count)
+        pairs = {
+            (rng.randint(1, users), author_id) for author_id in authors
+        }
+        return sorted(
+            (user_id, author_id) for user_id, author_id in pairs
+            if user_id != author_id
+        )
+
+    def handle(self, *args, **options):
+        """Build the graph and rank a sample of users."""
+        rng = random.Random(options['seed'])
+        users = options['users']
+        edges = self.edges(users, options['edges'], rng)
+        started = time.perf_counter()
+        graph = FollowGraph(edges)
+        built = time.perf_counter() - started
+        memory = sum(
+            part.itemsize * len(part)
+            for part in (graph.users, graph.offsets, graph.authors))
+        self.stdout.write(
+            f'graph: {len(graph)} edges packed in {built:.2f} s, '
+            f'{memory / 2 ** 20:.1f} MiB')
+        timings = []
+        for user_id in rng.sample(range(1, users + 1), options['samples']):
+            started = time.perf_counter()
+            rank(graph, user_id)
+            timings.append(time.perf_counter() - started)
+        timings.sort()
+        p95 = timings[int(len(timings) * 0.95)]
+        self.stdout.write(
+            f'rank: mean {statistics.mean(timings) * 1000:.2f} ms, '
+            f'p95 {p95 * 1000:.2f} ms, '
+            f'all users ~{statistics.mean(timings) * users:.0f} s')
@@ -0,0 +1,23 @@
+"""Build_follow_suggestions.py."""
+from django.core.management import BaseCommand
+from jobs.queue import enqueue_unique
+from users import suggestions
+
+
+class Command(BaseCommand):
+    """Recompute "authors you may want to follow" for every user."""
+
+    help = 'Build follow suggestions'
+
+    def add_arguments(self, parser):
+        """Add command arguments."""
+        parser.add_argument(
+            '--schedule', action='store_true',
+            help='Also start the periodic rebuild job')
+
+    def handle(self, *args, **options):
+        """Build the suggestions now and optionally keep them fresh."""
+        suggestions.build()
+        if options['schedule']:
+            enqueue_unique('users.build_follow_suggestions')
+        self.stdout.write(self.style.SUCCESS('Follow suggestions built'))
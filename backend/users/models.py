@@ -71,6 +71,15 @@ class Follow(models.Model):
         related_name='following',
         verbose_name=_('Author'),
     )
+    created = models.DateTimeField(
+        auto_now_add=True,
+        verbose_name=_('Created'),
+    )
+    version = models.BigIntegerField(
+        default=0,
+        editable=False,
+        verbose_name=_('Version'),
+    )
 
     class Meta:
         """Follow Meta."""
@@ -87,6 +96,54 @@ class Follow(models.Model):
                 name='self_follow',
             ),
         )
+        indexes = (
+            models.Index(fields=('user', 'version'),
+                         name='follow_version_idx'),
+        )
+
+    def __str__(self):
+        """Str."""
+        return f'{self.user} - {self.author}'
+
+
+class FollowSuggestion(models.Model):
+    """Precomputed author suggestion for a user."""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='follow_suggestions',
+        verbose_name=_('User'),
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='suggested_to',
+        verbose_name=_('Author'),
+    )
+    score = models.FloatField(
+        verbose_name=_('Score'),
+    )
+    position = models.PositiveSmallIntegerField(
+        verbose_name=_('Position'),
+    )
+
+    class Meta:
+        """FollowSuggestion Meta."""
+
+        verbose_name = _('Follow suggestion')
+        verbose_name_plural = _('Follow suggestions')
+        ordering = ('user', 'position')
+        constraints = (
+            models.UniqueConstraint(
+                fields=('user', 'author'),
+                name='unique_follow_suggestion',
+            ),
+        )
+        indexes = (
+            models.Index(fields=('user', 'position'),
+                         name='follow_suggestion_user_idx'),
+        )
 
     def __str__(self):
         """Str."""
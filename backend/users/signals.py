@@ -0,0 +1,30 @@
+"""Signals.py."""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from . import caches
+from .models import Follow
+
+User = get_user_model()
+
+
+@receiver((post_save, post_delete), sender=Token)
+def token_changed(sender, instance, **kwargs):
+    """Forget a token that was replaced or revoked."""
+    caches.tokens.invalidate(instance.key)
+
+
+@receiver(post_save, sender=User)
+def user_changed(sender, instance, **kwargs):
+    """Forget the cached token of a changed user."""
+    for key in Token.objects.filter(user=instance).values_list(
+            'key', flat=True):
+        caches.tokens.invalidate(key)
+
+
+@receiver((post_save, post_delete), sender=Follow)
+def follow_changed(sender, instance, **kwargs):
+    """Forget the follow set of the follower."""
+    caches.follows.invalidate(instance.user_id)
@@ -0,0 +1,139 @@
+"""Suggestions.py."""
+import heapq
+from array import array
+from bisect import bisect_left
+from collections import Counter, defaultdict
+
+from django.conf import settings
+from django.db import transaction
+from recipes.models import Favorite, IngredientInRecipe
+
+from .models import Follow, FollowSuggestion, User
+
+FRIEND_WEIGHT = 1.0
+FAVORITE_AUTHOR_WEIGHT = 2.0
+INGREDIENT_WEIGHT = 3.0
+TOP_INGREDIENTS = 20
+MAX_FANOUT = 500
+CHUNK_SIZE = 1000
+
+EMPTY = frozenset()
+
+
+class FollowGraph:
+    """Follow edges packed into compressed sparse row arrays."""
+
+    def __init__(self, edges):
+        """Pack (user_id, author_id) pairs sorted by user_id."""
+        self.users = array('q')
+        self.offsets = array('q')
+        self.authors = array('q')
+        for user_id, author_id in edges:
+            if not self.users or self.users[-1] != user_id:
+                self.users.append(user_id)
+                self.offsets.append(len(self.authors))
+            self.authors.append(author_id)
+        self.offsets.append(len(self.authors))
+
+    def __len__(self):
+        """Return the number of edges."""
+        return len(self.authors)
+
+    def following(self, user_id):
+        """Return the authors the user follows."""
+        index = bisect_left(self.users, user_id)
+        if index == len(self.users) or self.users[index] != user_id:
+            return self.authors[:0]
+        return self.authors[self.offsets[index]:self.offsets[index + 1]]
+
+
+def rank(graph, user_id, favorite_authors=None, ingredients=EMPTY,
+         profiles=None, excluded=EMPTY, limit=20):
+    """Return the best (author_id, score) candidates for the user."""
+    following = graph.following(user_id)
+    scores = defaultdict(float)
+    for friend_id in following:
+        for author_id in graph.following(friend_id)[:MAX_FANOUT]:
+            scores[author_id] += FRIEND_WEIGHT
+    for author_id, count in (favorite_authors or {}).items():
+        scores[author_id] += FAVORITE_AUTHOR_WEIGHT * count
+    if ingredients and profiles:
+        for author_id in scores:
+            shared = len(ingredients & profiles.get(author_id, EMPTY))
+            scores[author_id] += INGREDIENT_WEIGHT * shared / len(ingredients)
+    for author_id in (user_id, *following):
+        scores.pop(author_id, None)
+    return heapq.nlargest(
+        limit,
+        ((author_id, score) for author_id, score in scores.items()
+         if author_id not in excluded),
+        key=lambda item: (item[1], -item[0]),
+    )
+
+
+def load_graph():
+    """Stream the follow table into a FollowGraph."""
+    edges = Follow.objects.order_by('user_id', 'author_id').values_list(
+        'user_id', 'author_id')
+    return FollowGraph(edges.iterator(chunk_size=10000))
+
+
+def load_profiles():
+    """Return the set of ingredients every author cooks with."""
+    profiles = defaultdict(set)
+    rows = IngredientInRecipe.objects.values_list(
+        'recipe__author_id', 'ingredient_id').distinct()
+    for author_id, ingredient_id in rows.iterator(chunk_size=10000):
+        profiles[author_id].add(ingredient_id)
+    return {author_id: frozenset(ingredients)
+            for author_id, ingredients in profiles.items()}
+
+
+def _tastes(user_ids):
+    """Return favorite authors and top ingredients of the users."""
+    authors = defaultdict(Counter)
+    ingredients = defaultdict(Counter)
+    favorites = Favorite.objects.filter(user_id__in=user_ids)
+    for user_id, author_id in favorites.values_list(
+            'user_id', 'recipe__author_id'):
+        authors[user_id][author_id] += 1
+    for user_id, ingredient_id in favorites.values_list(
+            'user_id', 'recipe__ingredients_in_recipe__ingredient_id'):
+        if ingredient_id is not None:
+            ingredients[user_id][ingredient_id] += 1
+    top = {
+        user_id: frozenset(
+            ingredient_id
+            for ingredient_id, _ in counts.most_common(TOP_INGREDIENTS))
+        for user_id, counts in ingredients.items()
+    }
+    return authors, top
+
+
+def build(limit=None):
+    """Recompute the stored suggestions of every active user."""
+    limit = limit or settings.FOLLOW_SUGGESTIONS_LIMIT
+    graph = load_graph()
+    profiles = load_profiles()
+    excluded = frozenset(User.objects.filter(
+        is_active=False).values_list('id', flat=True))
+    last_id = 0
+    while True:
+        user_ids = list(User.objects.filter(
+            id__gt=last_id, is_active=True,
+        ).order_by('id').values_list('id', flat=True)[:CHUNK_SIZE])
+        if not user_ids:
+            return
+        last_id = user_ids[-1]
+        authors, ingredients = _tastes(user_ids)
+        suggestions = [
+            FollowSuggestion(user_id=user_id, author_id=author_id,
+                             score=score, position=position)
+            for user_id in user_ids
+            for position, (author_id, score) in enumerate(rank(
+                graph, user_id, authors.get(user_id),
+                ingredients.get(user_id, EMPTY), profiles, excluded, limit))
+        ]
+        with transaction.atomic():
+            FollowSuggestion.objects.filter(user_id__in=user_ids).delete()
+            FollowSuggestion.objects.bulk_create(suggestions)
@@ -0,0 +1,13 @@
+"""Tasks.py."""
+from django.conf import settings
+from jobs.queue import enqueue_unique, register
+
+from . import suggestions
+
+
+@register('users.build_follow_suggestions')
+def build_follow_suggestions():
+    """Recompute follow suggestions and schedule the next run."""
+    enqueue_unique('users.build_follow_suggestions',
+                   delay=settings.FOLLOW_SUGGESTIONS_INTERVAL)
+    suggestions.build()
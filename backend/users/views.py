@@ -1,6 +1,9 @@
 """Users views.py."""
+from api import cached, compiled
 from api.pagination import CustomPagination
+from api.profiling import ProfiledViewMixin
 from api.serializers import CustomUserSerializer, SubscribeSerializer
+from django.db import transaction
 from django.shortcuts import get_object_or_404
 from djoser import utils
 from djoser.views import TokenDestroyView, UserViewSet
@@ -12,7 +15,7 @@ from rest_framework.response import Response
 from .models import Follow, User
 
 
-class CustomUserViewSet(UserViewSet):
+class CustomUserViewSet(ProfiledViewMixin, UserViewSet):
     """Custom User viewset."""
 
     queryset = User.objects.all()
@@ -27,13 +30,15 @@ class CustomUserViewSet(UserViewSet):
     def subscribe(self, request, **kwargs):
         """Subscribe func."""
         user = request.user
-        author = get_object_or_404(User, id=self.kwargs.get('id'))
+        author = cached.get_object_or_404(
+            User.objects.all(), self.kwargs.get('id'))
         if request.method == 'POST':
             subscription = SubscribeSerializer(author,
                                                data=request.data,
                                                context={"request": request})
             subscription.is_valid(raise_exception=True)
-            Follow.objects.create(user=user, author=author)
+            with transaction.atomic():
+                Follow.objects.create(user=user, author=author)
             return Response(subscription.data, status=status.HTTP_201_CREATED)
         if request.method == 'DELETE':
             subscription = get_object_or_404(Follow,
@@ -52,11 +57,34 @@ class CustomUserViewSet(UserViewSet):
         user = request.user
         queryset = User.objects.filter(following__user=user).order_by('id')
         pages = self.paginate_queryset(queryset)
+        limit = compiled.recipes_limit(request)
+        if limit is not False and compiled.enabled(SubscribeSerializer):
+            return self.get_paginated_response(
+                compiled.subscriptions(pages, request, limit))
         serializer = SubscribeSerializer(pages,
                                          many=True,
                                          context={'request': request})
         return self.get_paginated_response(serializer.data)
 
+    @action(
+        detail=False,
+        permission_classes=[IsAuthenticated]
+    )
+    def suggestions(self, request):
+        """Authors the user may want to follow, best match first."""
+        user = request.user
+        queryset = User.objects.filter(
+            suggested_to__user=user,
+            is_active=True,
+        ).exclude(
+            following__user=user,
+        ).order_by('suggested_to__position')
+        pages = self.paginate_queryset(queryset)
+        serializer = CustomUserSerializer(pages,
+                                          many=True,
+                                          context={'request': request})
+        return self.get_paginated_response(serializer.data)
+
 
 class CustomTokenDestroyView(TokenDestroyView):
     """Logout."""